@@ -11,6 +11,9 @@ from routes.billing import billing_bp
 from routes.customers import customers_bp
 from routes.vehicles import vehicles_bp
 from routes.service_requests import service_requests_bp
+from routes.events import events_bp
+from routes.search import search_bp
+from routes.analytics import analytics_bp
 from seed_inventory import seed_inventory
 
 
@@ -48,6 +51,9 @@ def create_app(config_class=Config):
     app.register_blueprint(customers_bp)
     app.register_blueprint(vehicles_bp)
     app.register_blueprint(service_requests_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(analytics_bp)
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
@@ -76,7 +82,8 @@ def create_app(config_class=Config):
                 'jobs': '/api/jobs',
                 'inventory': '/api/inventory',
                 'job_parts': '/api/job-parts',
-                'billing': '/api/billing'
+                'billing': '/api/billing',
+                'events': 'GET /api/events/stream'
             }
         }), 200
     
@@ -112,6 +119,7 @@ if __name__ == '__main__':
     print("")
     print("Dashboard Endpoints (JWT protected):")
     print("  GET  /api/dashboard            - Dashboard stats")
+    print("  GET  /api/dashboard/timeseries - Revenue/workload over time")
     print("  GET  /api/dashboard/customers  - All customers")
     print("  GET  /api/dashboard/vehicles   - All vehicles")
     print("  GET  /api/dashboard/service-requests - Service requests")
@@ -128,16 +136,24 @@ if __name__ == '__main__':
     print("")
     print("Service Jobs API (JWT protected):")
     print("  GET  /api/jobs             - List all jobs")
+    print("  GET  /api/jobs/board       - Job board (per-status columns + counts)")
     print("  GET  /api/jobs/:id         - Get job details")
     print("  POST /api/jobs             - Create job")
     print("  PUT  /api/jobs/:id/assign  - Assign employee")
+    print("  POST /api/jobs/:id/auto-assign - Assign least-loaded technician")
+    print("  POST /api/jobs/auto-assign  - Assign all unassigned jobs")
+    print("  GET  /api/jobs/workload    - Technician workload")
+    print("  POST /api/jobs/next        - Claim next unassigned job")
     print("  PUT  /api/jobs/:id/status  - Update status")
     print("  PUT  /api/jobs/:id/labor   - Update labor charge")
+    print("  GET  /api/jobs/:id/history - Status history")
     print("")
     print("Inventory API (JWT protected):")
     print("  GET  /api/inventory           - List all items")
     print("  GET  /api/inventory/low-stock - Low stock items")
     print("  GET  /api/inventory/:id       - Get item")
+    print("  GET  /api/inventory/code/:code - Get item by part code")
+    print("  GET  /api/inventory/cache-stats - Catalog cache counters")
     print("  POST /api/inventory           - Add item")
     print("  PUT  /api/inventory/:id       - Update item")
     print("  PUT  /api/inventory/:id/stock - Update stock")
@@ -145,6 +161,7 @@ if __name__ == '__main__':
     print("Job Parts API (JWT protected):")
     print("  GET    /api/job-parts/job/:id       - Parts for job")
     print("  POST   /api/job-parts               - Add part to job")
+    print("  POST   /api/job-parts/batch         - Add several parts to job")
     print("  DELETE /api/job-parts/:id           - Remove part")
     print("  GET    /api/job-parts/job/:id/total - Parts total")
     print("")
@@ -156,6 +173,16 @@ if __name__ == '__main__':
     print("  PUT  /api/billing/:id/pay     - Mark as paid")
     print("  PUT  /api/billing/:id         - Update bill")
     print("")
+    print("Events API (JWT protected, Server-Sent Events):")
+    print("  GET  /api/events/stream   - Live change events (?token= for EventSource)")
+    print("")
+    print("Search API (JWT protected):")
+    print("  GET  /api/search?q=       - Customers, vehicles, requests, parts, bills")
+    print("")
+    print("Analytics API (JWT protected):")
+    print("  GET  /api/analytics/jobs  - Job cycle times, throughput, WIP, bottlenecks")
+    print("  GET  /api/analytics/time-in-status - Time spent per request/job status")
+    print("")
     print("Utility:")
     print("  GET  /api/health  - Health check")
     print("=" * 60)
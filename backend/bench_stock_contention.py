@@ -0,0 +1,174 @@
+"""
+Contention benchmark for adding one hot part to a job, plain vs striped.
+Creates a throw-away customer, vehicle, request, job and part, has N
+threads call add_part_to_job() for 1 unit at a time, then deletes them
+again. Use more threads than stripes so takers also queue on busy stripes.
+The 'consumption' rows written to stock_movements stay (the ledger is
+append-only). Run from the backend folder against a test database:
+
+  python bench_stock_contention.py                       # 32 threads, 10 s per mode, 8 stripes
+  python bench_stock_contention.py --threads 64 --stripes 16
+"""
+import sys
+import os
+import argparse
+import logging
+import threading
+import time
+import uuid
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db.connection import get_connection
+from controllers.job_parts import add_part_to_job
+
+SCHEMA = 'vehicle_service'
+
+START_STOCK = 10_000_000
+
+
+def create_fixture():
+    """Insert the benchmark customer, vehicle, request, job and part; returns (job_id, part_id)."""
+    tag = uuid.uuid4().hex[:12]
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                WITH customer AS (
+                    INSERT INTO {SCHEMA}.customers (name, phone, email, address)
+                    VALUES ('Benchmark', %(phone)s, %(email)s, 'Benchmark')
+                    RETURNING customer_id
+                ),
+                vehicle AS (
+                    INSERT INTO {SCHEMA}.vehicles (plate_no, brand, model, year, color, customer_id)
+                    SELECT %(plate)s, 'Benchmark', 'Benchmark', 2000, 'None', customer_id FROM customer
+                    RETURNING vehicle_id
+                ),
+                request AS (
+                    INSERT INTO {SCHEMA}.service_requests (service_type, status, vehicle_id)
+                    SELECT 'Benchmark', 'In Progress', vehicle_id FROM vehicle
+                    RETURNING request_id
+                ),
+                job AS (
+                    INSERT INTO {SCHEMA}.service_jobs (request_id, start_time)
+                    SELECT request_id, CURRENT_TIMESTAMP FROM request
+                    RETURNING job_id
+                ),
+                part AS (
+                    INSERT INTO {SCHEMA}.inventory (part_name, part_code, brand, unit_price, quantity_in_stock, reorder_level)
+                    VALUES ('Benchmark part', %(code)s, 'Benchmark', 1.00, %(stock)s, 0)
+                    RETURNING part_id
+                )
+                SELECT job.job_id, part.part_id FROM job, part
+            """, {'phone': tag[:15], 'email': f"bench-{tag}@example.invalid", 'plate': f"B-{tag[:12]}",
+                  'code': f"BENCH-{tag}", 'stock': START_STOCK})
+            job_id, part_id = cur.fetchone()
+        conn.commit()
+        return job_id, part_id
+    finally:
+        conn.close()
+
+
+def drop_fixture(job_id, part_id):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DELETE FROM {SCHEMA}.job_parts_used WHERE job_id = %s", (job_id,))
+            cur.execute(f"DELETE FROM {SCHEMA}.inventory WHERE part_id = %s", (part_id,))
+            cur.execute(f"""
+                WITH job AS (
+                    DELETE FROM {SCHEMA}.service_jobs WHERE job_id = %s RETURNING request_id
+                ),
+                request AS (
+                    DELETE FROM {SCHEMA}.service_requests
+                    WHERE request_id = (SELECT request_id FROM job)
+                    RETURNING vehicle_id
+                ),
+                vehicle AS (
+                    DELETE FROM {SCHEMA}.vehicles
+                    WHERE vehicle_id = (SELECT vehicle_id FROM request)
+                    RETURNING customer_id
+                )
+                DELETE FROM {SCHEMA}.customers WHERE customer_id = (SELECT customer_id FROM vehicle)
+            """, (job_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_sql(sql, params):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+        conn.commit()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def worker(job_id, part_id, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            _, error = add_part_to_job(job_id, part_id, 1)
+        except Exception:
+            error = 'failed'
+        if error:
+            errors.append(error)
+            continue
+        latencies.append(time.monotonic() - started)
+
+
+def run_mode(job_id, part_id, stripes, threads, seconds):
+    """Run one mode and return (transactions per second, p50 ms, p99 ms, errors)."""
+    run_sql(f"SELECT {SCHEMA}.set_stock_stripes(%s, %s)", (part_id, stripes))
+    latencies, errors = [], []
+    deadline = time.monotonic() + seconds
+    pool = [threading.Thread(target=worker, args=(job_id, part_id, deadline, latencies, errors))
+            for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    latencies.sort()
+    count = len(latencies)
+    p50 = latencies[count // 2] * 1000 if count else 0.0
+    p99 = latencies[min(count - 1, int(count * 0.99))] * 1000 if count else 0.0
+    return count / seconds, p50, p99, len(errors)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark adding one hot part to a job.')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--stripes', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.DEBUG)
+    job_id, part_id = create_fixture()
+    print(f"Benchmark job {job_id}, part {part_id}: {args.threads} threads, {args.seconds:g}s per mode, "
+          f"{args.stripes} stripes")
+    try:
+        results = {}
+        for label, stripes in (('plain', 0), (f"{args.stripes} stripes", args.stripes)):
+            tps, p50, p99, errors = run_mode(job_id, part_id, stripes, args.threads, args.seconds)
+            results[label] = tps
+            print(f"  {label:>12}: {tps:9.1f} tx/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   errors {errors}")
+
+        expected = START_STOCK - sum(round(tps * args.seconds) for tps in results.values())
+        total = run_sql(f"SELECT quantity_in_stock FROM {SCHEMA}.inventory_levels WHERE part_id = %s", (part_id,))
+        print(f"  Stock left: {total} (expected {expected})")
+        plain = results['plain']
+        if plain:
+            print(f"  Speed-up: {results[f'{args.stripes} stripes'] / plain:.2f}x")
+    finally:
+        drop_fixture(job_id, part_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
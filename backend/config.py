@@ -27,5 +27,36 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'your-super-secret-jwt-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=12)
     
+    # Seconds the computed /api/dashboard stats are served from memory
+    DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL') or 5)
+    
+    # Seconds a computed /api/analytics/jobs result is served from memory
+    ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL') or 60)
+    
+    # Inventory catalog cache: max parts kept per process and seconds between
+    # checks for changes made by other processes
+    INVENTORY_CACHE_MAX_ITEMS = int(os.environ.get('INVENTORY_CACHE_MAX_ITEMS') or 5000)
+    INVENTORY_CACHE_CHECK_SECONDS = float(os.environ.get('INVENTORY_CACHE_CHECK_SECONDS') or 1)
+    
+    # Default number of stock sub-rows for a part marked hot
+    STOCK_STRIPES = int(os.environ.get('STOCK_STRIPES') or 8)
+    
+    # Stock updates arriving within this many ms share one transaction
+    # (0 = flush each call immediately), at most STOCK_WRITE_MAX_BATCH per flush
+    STOCK_WRITE_WINDOW_MS = float(os.environ.get('STOCK_WRITE_WINDOW_MS') or 5)
+    STOCK_WRITE_MAX_BATCH = int(os.environ.get('STOCK_WRITE_MAX_BATCH') or 500)
+    
+    # Seconds between keep-alive comments on /api/events/stream
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS') or 15)
+    
+    # Milliseconds GET /api/search may spend in the database before giving up
+    SEARCH_TIMEOUT_MS = int(os.environ.get('SEARCH_TIMEOUT_MS') or 300)
+    
+    # Background worker (worker.py): poll interval, tasks per claim and
+    # seconds a claimed task stays leased before another worker may retry it
+    WORKER_POLL_SECONDS = float(os.environ.get('WORKER_POLL_SECONDS') or 2)
+    WORKER_BATCH_SIZE = int(os.environ.get('WORKER_BATCH_SIZE') or 10)
+    WORKER_VISIBILITY_TIMEOUT = int(os.environ.get('WORKER_VISIBILITY_TIMEOUT') or 300)
+    
     # Application secret key
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-change-in-production'
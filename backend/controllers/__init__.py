@@ -7,6 +7,14 @@ from controllers import billing
 from controllers import customers
 from controllers import vehicles
 from controllers import service_requests
+from controllers import dashboard
+from controllers import rollups
+from controllers import tasks
+from controllers import search
+from controllers import history_import
+from controllers import assignment
+from controllers import analytics
+from controllers import status_history
 
 __all__ = [
     'employees',
@@ -16,5 +24,13 @@ __all__ = [
     'billing',
     'customers',
     'vehicles',
-    'service_requests'
+    'service_requests',
+    'dashboard',
+    'rollups',
+    'tasks',
+    'search',
+    'history_import',
+    'assignment',
+    'analytics',
+    'status_history'
 ]
@@ -0,0 +1,206 @@
+"""
+Analytics controller - Job cycle-time and bottleneck analytics.
+
+Job start/end times for the requested window are pulled in one query as
+arrays and all statistics (duration percentiles, per-day throughput and
+work in progress, per-service-type bottlenecks) are computed with NumPy
+over whole arrays instead of row by row in Python. Results are cached
+briefly per table versions, window and filter set.
+"""
+import calendar
+from datetime import datetime, timedelta
+import numpy as np
+from config import Config
+from db.connection import get_db_cursor
+from utils.cache import TTLCache
+from utils.http_cache import get_table_versions
+
+SCHEMA = 'vehicle_service'
+
+SECONDS_PER_DAY = 86400
+
+PERCENTILES = (50, 75, 90, 95, 99)
+
+# Longest window one call may cover
+MAX_RANGE_DAYS = 366 * 3
+
+# Tables the analytics are computed from (also the route's ETag tables)
+JOB_TABLES = ('service_jobs', 'service_requests')
+
+_analytics_cache = TTLCache(ttl=Config.ANALYTICS_CACHE_TTL)
+
+# Every job overlapping [start, end), as parallel arrays. Epochs are the
+# timestamps' wall-clock seconds, matching _epoch() below. end_ts is NULL
+# for jobs that are not completed; completed jobs without an end_time are
+# left out. Each OR arm matches one index (see database/schema.sql,
+# section 22).
+JOB_TIMES_QUERY = f"""
+    SELECT COALESCE(array_agg(EXTRACT(EPOCH FROM sj.start_time)::float8), ARRAY[]::float8[]) AS start_ts,
+           COALESCE(array_agg(CASE WHEN sj.job_status = 'Completed'
+                                   THEN EXTRACT(EPOCH FROM sj.end_time)::float8 END),
+                    ARRAY[]::float8[]) AS end_ts,
+           COALESCE(array_agg(COALESCE(sr.service_type, 'Unknown')::text), ARRAY[]::text[]) AS service_type
+    FROM {SCHEMA}.service_jobs sj
+    LEFT JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
+    WHERE sj.start_time IS NOT NULL
+      AND sj.start_time < %(end)s
+      AND (sj.job_status <> 'Completed'
+           OR (sj.job_status = 'Completed' AND sj.end_time >= %(start)s))
+      {{filters}}
+"""
+
+FILTER_CLAUSES = {
+    'service_type': "sr.service_type = ANY(%(service_type)s)",
+    'priority': "sr.priority = ANY(%(priority)s)",
+    'employee_id': "sj.employee_id = ANY(%(employee_id)s::int[])"
+}
+
+
+def _epoch(value):
+    """Seconds since 1970-01-01 of a date (midnight) or naive datetime, as EXTRACT(EPOCH) sees it."""
+    seconds = float(calendar.timegm(value.timetuple()))
+    return seconds + getattr(value, 'microsecond', 0) / 1e6
+
+
+def _hours(seconds):
+    """Round seconds to hours for JSON; NaN becomes None."""
+    value = float(seconds) / 3600.0
+    return None if np.isnan(value) else round(value, 2)
+
+
+def _fetch_job_times(date_from, date_to, filters):
+    """Pull the window's job times into NumPy arrays."""
+    clauses = [f"AND {FILTER_CLAUSES[name]}" for name in FILTER_CLAUSES if filters.get(name)]
+    params = {name: list(values) for name, values in filters.items() if values}
+    params['start'] = date_from
+    params['end'] = date_to + timedelta(days=1)
+
+    with get_db_cursor() as cur:
+        cur.execute(JOB_TIMES_QUERY.format(filters='\n      '.join(clauses)), params)
+        row = cur.fetchone()
+
+    # None (open job) becomes NaN
+    starts = np.array(row['start_ts'], dtype=np.float64)
+    ends = np.array(row['end_ts'], dtype=np.float64)
+    service_types = np.array(row['service_type'], dtype=object)
+    return starts, ends, service_types
+
+
+def _duration_summary(durations):
+    """Count, mean, max and percentiles (hours) of an array of durations in seconds."""
+    if durations.size == 0:
+        return {'count': 0, 'mean_hours': None, 'max_hours': None,
+                **{f"p{p}_hours": None for p in PERCENTILES}}
+    values = np.percentile(durations, PERCENTILES)
+    return {
+        'count': int(durations.size),
+        'mean_hours': _hours(durations.mean()),
+        'max_hours': _hours(durations.max()),
+        **{f"p{p}_hours": _hours(v) for p, v in zip(PERCENTILES, values)}
+    }
+
+
+def compute_job_analytics(date_from, date_to, filters=None, now=None):
+    """
+    Compute job analytics for [date_from, date_to] (dates, inclusive).
+
+    Args:
+        filters: {'service_type': [...], 'priority': [...], 'employee_id': [...]}
+        now: Reference time for the age of open jobs (default: current time)
+
+    Returns:
+        {
+            'summary': cycle time stats of jobs completed in the window,
+            'daily': [{'day', 'opened', 'completed', 'wip'}] where wip is the
+                     number of open jobs at the end of the day,
+            'bottlenecks': per service type cycle times and open job ages,
+                           slowest p90 first
+        }
+    """
+    filters = filters or {}
+    now = now or datetime.now()
+    starts, ends, service_types = _fetch_job_times(date_from, date_to, filters)
+
+    window_start = _epoch(date_from)
+    days = (date_to - date_from).days + 1
+    window_end = window_start + days * SECONDS_PER_DAY
+
+    completed = ~np.isnan(ends)
+    in_window = completed & (ends >= window_start) & (ends < window_end)
+    durations = np.clip(ends[in_window] - starts[in_window], 0, None)
+
+    # Per-day counts: bucket each timestamp by its day offset in the window
+    started_in = (starts >= window_start) & (starts < window_end)
+    opened = np.bincount(((starts[started_in] - window_start) // SECONDS_PER_DAY).astype(np.int64),
+                         minlength=days)
+    closed = np.bincount(((ends[in_window] - window_start) // SECONDS_PER_DAY).astype(np.int64),
+                         minlength=days)
+
+    # WIP at each day's end = jobs started by then - jobs completed by then
+    boundaries = window_start + SECONDS_PER_DAY * np.arange(1, days + 1, dtype=np.float64)
+    started_by = np.searchsorted(np.sort(starts), boundaries, side='right')
+    ended_by = np.searchsorted(np.sort(ends[completed]), boundaries, side='right')
+    wip = started_by - ended_by
+
+    daily = [
+        {
+            'day': (date_from + timedelta(days=i)).isoformat(),
+            'opened': int(opened[i]),
+            'completed': int(closed[i]),
+            'wip': int(wip[i])
+        }
+        for i in range(days)
+    ]
+
+    # Bottlenecks: group by service type with one stable sort
+    now_ts = _epoch(now)
+    open_now = ~completed
+    bottlenecks = []
+    if service_types.size:
+        types, codes = np.unique(service_types, return_inverse=True)
+        done_codes = codes[in_window]
+        order = np.argsort(done_codes, kind='stable')
+        sorted_codes = done_codes[order]
+        sorted_durations = (ends[in_window] - starts[in_window])[order]
+        bounds = np.searchsorted(sorted_codes, np.arange(len(types) + 1))
+        open_counts = np.bincount(codes[open_now], minlength=len(types))
+        oldest_open = np.full(len(types), np.nan)
+        np.fmax.at(oldest_open, codes[open_now], now_ts - starts[open_now])
+
+        for i, service_type in enumerate(types):
+            group = np.clip(sorted_durations[bounds[i]:bounds[i + 1]], 0, None)
+            stats = _duration_summary(group)
+            bottlenecks.append({
+                'service_type': service_type,
+                'completed': stats['count'],
+                'p50_hours': stats['p50_hours'],
+                'p90_hours': stats['p90_hours'],
+                'mean_hours': stats['mean_hours'],
+                'open_jobs': int(open_counts[i]),
+                'oldest_open_hours': _hours(oldest_open[i])
+            })
+        bottlenecks.sort(key=lambda b: (b['p90_hours'] is None, -(b['p90_hours'] or 0), -b['open_jobs']))
+
+    return {
+        'summary': {
+            **_duration_summary(durations),
+            'throughput_per_day': round(float(durations.size) / days, 2),
+            'open_jobs': int(np.count_nonzero(open_now)),
+            'avg_wip': round(float(wip.mean()), 2)
+        },
+        'daily': daily,
+        'bottlenecks': bottlenecks
+    }
+
+
+def get_job_analytics(date_from, date_to, filters=None):
+    """
+    compute_job_analytics() served from memory for ANALYTICS_CACHE_TTL
+    seconds per window and filter set. The table versions are part of the
+    key, so a body is never older than the ETag it is sent with.
+    """
+    filters = {name: tuple(sorted(values)) for name, values in (filters or {}).items() if values}
+    versions = get_table_versions(JOB_TABLES)
+    key = (tuple(versions[table] for table in JOB_TABLES), date_from, date_to, tuple(sorted(filters.items())))
+    return _analytics_cache.get_or_compute(
+        key, lambda: compute_job_analytics(date_from, date_to, filters))
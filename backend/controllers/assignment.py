@@ -0,0 +1,262 @@
+"""
+Assignment controller - Load-balanced automatic technician assignment.
+
+Reads the employee_workload index (open jobs and estimated remaining hours
+per employee), which triggers keep current as jobs are created, reassigned
+and completed (see database/schema.sql, section 20). Picking a technician
+is an index probe per matching position, so it stays O(log n) in the
+number of employees.
+
+Technicians can also pull work themselves with claim_next_job().
+"""
+from db.connection import get_db_cursor
+from controllers.dashboard import apply_counter_deltas, request_status_deltas, invalidate_stats
+from utils.events import publish
+
+SCHEMA = 'vehicle_service'
+
+# Least-loaded available technician whose position can do the service type;
+# when there is none, the least-loaded available technician overall.
+# The chosen workload row is locked (SKIP LOCKED), so concurrent assignments
+# pass over a technician another transaction is assigning to and spread
+# out instead of all picking the same one.
+PICK_TECHNICIAN_QUERY = f"""
+    WITH skilled AS (
+        SELECT w.employee_id, w.position, w.open_jobs, w.remaining_hours
+        FROM {SCHEMA}.technician_skills s
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM {SCHEMA}.employee_workload w
+            WHERE w.available AND w.position = s.position
+            ORDER BY w.remaining_hours, w.open_jobs, w.employee_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        ) w
+        WHERE s.service_type = %(service_type)s
+        ORDER BY w.remaining_hours, w.open_jobs, w.employee_id
+        LIMIT 1
+    ),
+    anyone AS (
+        SELECT employee_id, position, open_jobs, remaining_hours
+        FROM {SCHEMA}.employee_workload
+        WHERE available AND NOT EXISTS (SELECT 1 FROM skilled)
+        ORDER BY remaining_hours, open_jobs, employee_id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    SELECT employee_id, position, open_jobs, remaining_hours, TRUE AS skill_match
+    FROM skilled
+    UNION ALL
+    SELECT employee_id, position, open_jobs, remaining_hours, FALSE
+    FROM anyone
+"""
+
+# Open jobs without a technician, highest priority and oldest first
+# (jobs of Completed / Cancelled requests are left out)
+PENDING_JOBS_QUERY = f"""
+    SELECT sj.job_id, sj.request_id, sj.est_hours, sr.service_type, sr.priority
+    FROM {SCHEMA}.service_jobs sj
+    JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
+    WHERE sr.status IN ('Pending', 'In Progress')
+      AND sj.job_status = 'In Progress' AND sj.employee_id IS NULL
+    ORDER BY {SCHEMA}.priority_rank(sr.priority), sr.request_date, sj.job_id
+    LIMIT %s
+    FOR UPDATE OF sj SKIP LOCKED
+"""
+
+# Work pull: claim the highest-priority, oldest unassigned open job for one
+# technician. SKIP LOCKED lets concurrent pullers pass over a job another
+# puller is claiming instead of waiting on it; a job claimed and committed
+# meanwhile fails the re-checked WHERE and the next one is taken.
+# A Pending request moves to In Progress with its job.
+CLAIM_NEXT_JOB_QUERY = f"""
+    WITH next_job AS (
+        SELECT sj.job_id, sr.request_id, sr.status AS old_status
+        FROM {SCHEMA}.service_requests sr
+        JOIN {SCHEMA}.service_jobs sj ON sj.request_id = sr.request_id
+        WHERE sr.status IN ('Pending', 'In Progress')
+          AND sj.job_status = 'In Progress' AND sj.employee_id IS NULL
+          AND (%(service_types)s::text[] IS NULL OR sr.service_type = ANY(%(service_types)s))
+        ORDER BY {SCHEMA}.priority_rank(sr.priority), sr.request_date, sr.request_id
+        LIMIT 1
+        FOR UPDATE OF sj SKIP LOCKED
+    ),
+    job AS (
+        UPDATE {SCHEMA}.service_jobs sj
+        SET employee_id = %(employee_id)s
+        FROM next_job n
+        WHERE sj.job_id = n.job_id
+        RETURNING sj.*
+    ),
+    req AS (
+        UPDATE {SCHEMA}.service_requests sr
+        SET status = 'In Progress'
+        FROM next_job n
+        WHERE sr.request_id = n.request_id AND sr.status = 'Pending'
+        RETURNING sr.request_id
+    )
+    SELECT job.*,
+           n.old_status AS previous_request_status,
+           CASE WHEN req.request_id IS NULL THEN n.old_status ELSE 'In Progress' END AS request_status,
+           sr.service_type, sr.problem_note, sr.priority, sr.request_date,
+           v.plate_no, v.brand, v.model, v.year, v.color,
+           c.name AS customer_name, c.phone AS customer_phone
+    FROM job
+    JOIN next_job n ON n.job_id = job.job_id
+    LEFT JOIN req ON req.request_id = n.request_id
+    JOIN {SCHEMA}.service_requests sr ON sr.request_id = n.request_id
+    LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
+    LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+"""
+
+
+def pick_technician(cur, service_type):
+    """
+    Pick the best technician for a service type on the caller's transaction.
+
+    Returns:
+        dict with employee_id, position, open_jobs, remaining_hours and
+        skill_match, or None when no technician is available
+    """
+    cur.execute(PICK_TECHNICIAN_QUERY, {'service_type': service_type})
+    row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def _assign(cur, job_id, employee_id):
+    """Assign an open job; the workload trigger updates the index."""
+    cur.execute(f"""
+        UPDATE {SCHEMA}.service_jobs
+        SET employee_id = %s
+        WHERE job_id = %s
+        RETURNING job_id, request_id, employee_id, job_status, est_hours
+    """, (employee_id, job_id))
+    row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def auto_assign_job(job_id):
+    """
+    Assign the best technician to one open, unassigned job.
+
+    Returns:
+        The updated job plus the chosen technician's workload before the
+        assignment, or None when the job is not open and unassigned (or
+        its request is completed or cancelled)
+
+    Raises:
+        LookupError: No technician is available
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT sj.job_id, sr.service_type
+            FROM {SCHEMA}.service_jobs sj
+            JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
+            WHERE sj.job_id = %s AND sr.status IN ('Pending', 'In Progress')
+              AND sj.job_status = 'In Progress' AND sj.employee_id IS NULL
+            FOR UPDATE OF sj
+        """, (job_id,))
+        job = cur.fetchone()
+        if not job:
+            return None
+
+        technician = pick_technician(cur, job['service_type'])
+        if not technician:
+            raise LookupError("No technician is available")
+
+        result = _assign(cur, job_id, technician['employee_id'])
+        result['technician'] = technician
+        publish(cur, 'jobs.assigned', assignments=[
+            {'job_id': job_id, 'employee_id': technician['employee_id']}
+        ])
+
+    return result
+
+
+def auto_assign_pending(limit=100):
+    """
+    Assign technicians to the pending queue (open jobs without one), highest
+    priority and oldest first, in one transaction. Every assignment updates
+    the workload index before the next pick, so the batch spreads evenly.
+    Jobs locked by a concurrent assignment are skipped.
+
+    Returns:
+        {'assigned': [{job_id, request_id, employee_id, ...}], 'unassigned': n}
+        where unassigned counts jobs left over because no technician was available
+    """
+    assigned = []
+    with get_db_cursor() as cur:
+        cur.execute(PENDING_JOBS_QUERY, (limit,))
+        jobs = [dict(row) for row in cur.fetchall()]
+
+        for job in jobs:
+            technician = pick_technician(cur, job['service_type'])
+            if not technician:
+                break
+            _assign(cur, job['job_id'], technician['employee_id'])
+            assigned.append({
+                'job_id': job['job_id'],
+                'request_id': job['request_id'],
+                'service_type': job['service_type'],
+                'priority': job['priority'],
+                'employee_id': technician['employee_id'],
+                'skill_match': technician['skill_match']
+            })
+
+        if assigned:
+            publish(cur, 'jobs.assigned', assignments=[
+                {'job_id': a['job_id'], 'employee_id': a['employee_id']} for a in assigned
+            ])
+
+    return {'assigned': assigned, 'unassigned': len(jobs) - len(assigned)}
+
+
+def claim_next_job(employee_id, service_types=None):
+    """
+    Claim the next job from the unassigned queue for a technician
+    (highest priority, then oldest request). Safe to call from many
+    technicians at once: each job is handed out exactly once and pullers
+    never wait on each other.
+
+    Args:
+        employee_id: Technician taking the job
+        service_types: Only consider these service types (None = any)
+
+    Returns:
+        The claimed job with its request, vehicle and customer details,
+        or None when the queue is empty
+    """
+    with get_db_cursor() as cur:
+        cur.execute(CLAIM_NEXT_JOB_QUERY, {
+            'employee_id': employee_id,
+            'service_types': list(service_types) if service_types else None
+        })
+        row = cur.fetchone()
+        if not row:
+            return None
+
+        job = dict(row)
+        old_status = job['previous_request_status']
+        apply_counter_deltas(cur, **request_status_deltas(old_status, job['request_status']))
+        if old_status != job['request_status']:
+            publish(cur, 'request.updated', request_id=job['request_id'],
+                    status=job['request_status'], old_status=old_status)
+        publish(cur, 'jobs.assigned', assignments=[
+            {'job_id': job['job_id'], 'employee_id': employee_id}
+        ])
+
+    invalidate_stats()
+    return job
+
+
+def get_workload():
+    """Get every employee's current workload, least loaded first."""
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT w.employee_id, e.name, e.position, e.working_status, w.available,
+                   w.open_jobs, w.remaining_hours, w.updated_at
+            FROM {SCHEMA}.employee_workload w
+            JOIN {SCHEMA}.employees e ON w.employee_id = e.id
+            ORDER BY w.available DESC, w.remaining_hours, w.open_jobs, w.employee_id
+        """)
+        return [dict(row) for row in cur.fetchall()]
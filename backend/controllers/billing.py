@@ -1,7 +1,9 @@
 """
 Billing controller - Raw SQL operations for billing management.
 """
-from db.connection import get_db_cursor, execute_returning
+from db.connection import get_db_cursor
+from controllers.dashboard import apply_counter_deltas, bill_deltas, invalidate_stats
+from utils.events import publish
 from datetime import datetime
 
 SCHEMA = 'vehicle_service'
@@ -9,6 +11,19 @@ SCHEMA = 'vehicle_service'
 # Default tax rate (18% GST for example)
 DEFAULT_TAX_RATE = 0.18
 
+# Bill with its job, request, vehicle and customer details (append a WHERE clause)
+BILL_DETAIL_QUERY = f"""
+    SELECT b.*, sj.job_status, sj.labor_charge, sj.start_time, sj.end_time,
+           sr.service_type, sr.problem_note,
+           v.plate_no, v.brand, v.model, v.year,
+           c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email
+    FROM {SCHEMA}.billing b
+    LEFT JOIN {SCHEMA}.service_jobs sj ON b.job_id = sj.job_id
+    LEFT JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
+    LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
+    LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+"""
+
 
 def get_all_bills():
     """Get all billing records with job and customer details."""
@@ -30,18 +45,7 @@ def get_all_bills():
 def get_bill_by_id(bill_id):
     """Get a single bill by ID with full details."""
     with get_db_cursor() as cur:
-        cur.execute(f"""
-            SELECT b.*, sj.job_status, sj.labor_charge, sj.start_time, sj.end_time,
-                   sr.service_type, sr.problem_note,
-                   v.plate_no, v.brand, v.model, v.year,
-                   c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email
-            FROM {SCHEMA}.billing b
-            LEFT JOIN {SCHEMA}.service_jobs sj ON b.job_id = sj.job_id
-            LEFT JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
-            LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
-            LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
-            WHERE b.bill_id = %s
-        """, (bill_id,))
+        cur.execute(BILL_DETAIL_QUERY + "WHERE b.bill_id = %s", (bill_id,))
         row = cur.fetchone()
         return dict(row) if row else None
 
@@ -49,18 +53,7 @@ def get_bill_by_id(bill_id):
 def get_bill_by_job_id(job_id):
     """Get billing details for a specific job."""
     with get_db_cursor() as cur:
-        cur.execute(f"""
-            SELECT b.*, sj.job_status, sj.labor_charge, sj.start_time, sj.end_time,
-                   sr.service_type, sr.problem_note,
-                   v.plate_no, v.brand, v.model, v.year,
-                   c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email
-            FROM {SCHEMA}.billing b
-            LEFT JOIN {SCHEMA}.service_jobs sj ON b.job_id = sj.job_id
-            LEFT JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
-            LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
-            LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
-            WHERE b.job_id = %s
-        """, (job_id,))
+        cur.execute(BILL_DETAIL_QUERY + "WHERE b.job_id = %s", (job_id,))
         row = cur.fetchone()
         
         if not row:
@@ -85,61 +78,113 @@ def generate_bill(job_id, tax_rate=None):
     Generate a bill for a completed job.
     Calculates labor + parts + tax.
     """
+    with get_db_cursor() as cur:
+        result, error = create_bill_for_job(cur, job_id, tax_rate)
+    
+    if result:
+        invalidate_stats()
+    return result, error
+
+
+def create_bill_for_job(cur, job_id, tax_rate=None):
+    """
+    Insert the bill for a job using the caller's cursor (and transaction).
+    
+    Returns:
+        (bill, None) on success or (None, error message)
+    """
     if tax_rate is None:
         tax_rate = DEFAULT_TAX_RATE
     
-    with get_db_cursor() as cur:
-        # Check if bill already exists for this job
-        cur.execute(f"SELECT bill_id FROM {SCHEMA}.billing WHERE job_id = %s", (job_id,))
-        if cur.fetchone():
-            return None, "Bill already exists for this job"
-        
-        # Get labor charge from job
-        cur.execute(f"SELECT labor_charge FROM {SCHEMA}.service_jobs WHERE job_id = %s", (job_id,))
-        job = cur.fetchone()
-        if not job:
-            return None, "Job not found"
-        
-        subtotal_labor = float(job['labor_charge'] or 0)
-        
-        # Calculate parts total
-        cur.execute(f"""
-            SELECT COALESCE(SUM(quantity_used * unit_price_at_time), 0) as total
-            FROM {SCHEMA}.job_parts_used WHERE job_id = %s
-        """, (job_id,))
-        subtotal_parts = float(cur.fetchone()['total'])
-        
-        # Calculate tax and total
-        subtotal = subtotal_labor + subtotal_parts
-        tax = round(subtotal * tax_rate, 2)
-        total_amount = round(subtotal + tax, 2)
+    # Check if bill already exists for this job
+    cur.execute(f"SELECT bill_id FROM {SCHEMA}.billing WHERE job_id = %s", (job_id,))
+    if cur.fetchone():
+        return None, "Bill already exists for this job"
+    
+    # Get labor charge from job
+    cur.execute(f"SELECT labor_charge FROM {SCHEMA}.service_jobs WHERE job_id = %s", (job_id,))
+    job = cur.fetchone()
+    if not job:
+        return None, "Job not found"
+    
+    subtotal_labor = float(job['labor_charge'] or 0)
+    
+    # Calculate parts total
+    cur.execute(f"""
+        SELECT COALESCE(SUM(quantity_used * unit_price_at_time), 0) as total
+        FROM {SCHEMA}.job_parts_used WHERE job_id = %s
+    """, (job_id,))
+    subtotal_parts = float(cur.fetchone()['total'])
+    
+    # Calculate tax and total
+    subtotal = subtotal_labor + subtotal_parts
+    tax = round(subtotal * tax_rate, 2)
+    total_amount = round(subtotal + tax, 2)
     
     # Insert the bill
-    query = f"""
+    cur.execute(f"""
         INSERT INTO {SCHEMA}.billing 
             (job_id, subtotal_labor, subtotal_parts, tax, total_amount, payment_status, bill_date)
         VALUES (%s, %s, %s, %s, %s, 'Unpaid', %s)
         RETURNING *
-    """
-    result = execute_returning(query, (
+    """, (
         job_id, subtotal_labor, subtotal_parts, tax, total_amount, datetime.now()
     ))
+    result = cur.fetchone()
+    if not result:
+        return None, None
     
-    return dict(result) if result else None, None
+    apply_counter_deltas(cur, **bill_deltas(None, result))
+    publish(cur, 'bill.created', bill_id=result['bill_id'], job_id=job_id,
+            total_amount=result['total_amount'])
+    return dict(result), None
+
+
+def _update_with_counters(updates, params, bill_id):
+    """
+    Run a billing UPDATE and adjust the unpaid/revenue dashboard counters
+    in the same transaction, based on the bill's old and new amounts.
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.billing b
+            SET {', '.join(updates)}
+            FROM (
+                SELECT bill_id, total_amount AS old_total_amount, payment_status AS old_payment_status
+                FROM {SCHEMA}.billing
+                WHERE bill_id = %s
+                FOR UPDATE
+            ) old
+            WHERE b.bill_id = old.bill_id
+            RETURNING b.*, old.old_total_amount, old.old_payment_status
+        """, tuple(params) + (bill_id,))
+        result = cur.fetchone()
+        if not result:
+            return None
+        
+        result = dict(result)
+        old_bill = {
+            'total_amount': result.pop('old_total_amount'),
+            'payment_status': result.pop('old_payment_status')
+        }
+        apply_counter_deltas(cur, **bill_deltas(old_bill, result))
+        paid_now = old_bill['payment_status'] != 'Paid' and result['payment_status'] == 'Paid'
+        publish(cur, 'bill.paid' if paid_now else 'bill.updated', bill_id=result['bill_id'],
+                job_id=result['job_id'], payment_status=result['payment_status'],
+                total_amount=result['total_amount'])
+    
+    invalidate_stats()
+    return result
 
 
 def mark_as_paid(bill_id):
     """Mark a bill as paid using raw SQL."""
-    query = f"""
-        UPDATE {SCHEMA}.billing
-        SET payment_status = 'Paid', payment_date = CURRENT_TIMESTAMP
-        WHERE bill_id = %s
-        RETURNING *
-    """
     print(f"[DEBUG] Marking bill {bill_id} as paid")
-    result = execute_returning(query, (bill_id,))
+    result = _update_with_counters(
+        ["payment_status = 'Paid'", "payment_date = CURRENT_TIMESTAMP"], [], bill_id
+    )
     print(f"[DEBUG] mark_as_paid result: {result}")
-    return dict(result) if result else None
+    return result
 
 
 def update_bill(bill_id, subtotal_labor=None, subtotal_parts=None, tax=None):
@@ -154,14 +199,11 @@ def update_bill(bill_id, subtotal_labor=None, subtotal_parts=None, tax=None):
     tax_amount = tax if tax is not None else current_bill['tax']
     total_amount = float(labor) + float(parts) + float(tax_amount)
     
-    query = f"""
-        UPDATE {SCHEMA}.billing
-        SET subtotal_labor = %s, subtotal_parts = %s, tax = %s, total_amount = %s
-        WHERE bill_id = %s
-        RETURNING *
-    """
-    result = execute_returning(query, (labor, parts, tax_amount, total_amount, bill_id))
-    return dict(result) if result else None
+    return _update_with_counters(
+        ["subtotal_labor = %s", "subtotal_parts = %s", "tax = %s", "total_amount = %s"],
+        [labor, parts, tax_amount, total_amount],
+        bill_id
+    )
 
 
 def job_exists(job_id):
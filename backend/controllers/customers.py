@@ -2,6 +2,7 @@
 Customers controller - Raw SQL operations for customer management.
 """
 from db.connection import get_db_cursor, execute_returning
+from controllers.dashboard import apply_counter_deltas, invalidate_stats
 
 SCHEMA = 'vehicle_service'
 
@@ -39,12 +40,18 @@ def get_customer_by_email(email):
 
 def create_customer(name, phone, email, address):
     """Create a new customer. Let SERIAL handle the ID."""
-    query = f"""
-        INSERT INTO {SCHEMA}.customers (name, phone, email, address)
-        VALUES (%s, %s, %s, %s)
-        RETURNING *
-    """
-    result = execute_returning(query, (name, phone, email, address))
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.customers (name, phone, email, address)
+            VALUES (%s, %s, %s, %s)
+            RETURNING *
+        """, (name, phone, email, address))
+        result = cur.fetchone()
+        if result:
+            apply_counter_deltas(cur, customers_count=1)
+    
+    if result:
+        invalidate_stats()
     return dict(result) if result else None
 
 
@@ -92,7 +99,12 @@ def delete_customer(customer_id):
         
         cur.execute(f"DELETE FROM {SCHEMA}.customers WHERE customer_id = %s RETURNING *", (customer_id,))
         row = cur.fetchone()
-        return dict(row) if row else None
+        if row:
+            apply_counter_deltas(cur, customers_count=-1)
+    
+    if row:
+        invalidate_stats()
+    return dict(row) if row else None
 
 
 def customer_exists(customer_id):
@@ -0,0 +1,256 @@
+"""
+Dashboard controller - Summary counters for the dashboard.
+
+The dashboard_counters table holds a single row that the write paths keep
+current inside their own transactions, so reading the dashboard is a
+single-row lookup instead of aggregating whole tables.
+"""
+from decimal import Decimal
+from config import Config
+from db.connection import get_db_cursor
+from utils.cache import TTLCache
+
+SCHEMA = 'vehicle_service'
+
+# Computed stats are shared by every dashboard poll until they expire or a
+# write path calls invalidate_stats()
+_stats_cache = TTLCache(ttl=Config.DASHBOARD_CACHE_TTL)
+
+COUNTER_FIELDS = (
+    'customers_count',
+    'vehicles_count',
+    'pending_requests',
+    'active_jobs',
+    'low_stock_items',
+    'unpaid_total',
+    'total_revenue'
+)
+
+# Request statuses counted by the pending_requests / active_jobs counters
+PENDING_STATUSES = ('Pending',)
+ACTIVE_STATUSES = ('Pending', 'In Progress')
+
+# Recomputes every counter from the base tables (used by reconciliation)
+RECOMPUTE_QUERY = f"""
+    SELECT
+        (SELECT COUNT(*) FROM {SCHEMA}.customers) AS customers_count,
+        (SELECT COUNT(*) FROM {SCHEMA}.vehicles) AS vehicles_count,
+        (SELECT COUNT(*) FROM {SCHEMA}.service_requests
+          WHERE status = 'Pending') AS pending_requests,
+        (SELECT COUNT(*) FROM {SCHEMA}.service_requests
+          WHERE status IN ('Pending', 'In Progress')) AS active_jobs,
+        (SELECT COUNT(*) FROM {SCHEMA}.inventory_levels
+          WHERE quantity_in_stock <= reorder_level) AS low_stock_items,
+        (SELECT COALESCE(SUM(total_amount), 0) FROM {SCHEMA}.billing
+          WHERE payment_status = 'Unpaid') AS unpaid_total,
+        (SELECT COALESCE(SUM(total_amount), 0) FROM {SCHEMA}.billing
+          WHERE payment_status = 'Paid') AS total_revenue
+"""
+
+
+def _empty_stats():
+    """Stats returned when the dashboard cannot be loaded."""
+    return {
+        'customers_count': 0,
+        'vehicles_count': 0,
+        'pending_requests': 0,
+        'active_jobs': 0,
+        'low_stock_items': 0,
+        'unpaid_total': 0.0,
+        'total_revenue': 0.0,
+        'top_employees': []
+    }
+
+
+def _serialize_counters(row):
+    """Convert a counters row to JSON-serializable values."""
+    return {
+        'customers_count': int(row['customers_count'] or 0),
+        'vehicles_count': int(row['vehicles_count'] or 0),
+        'pending_requests': int(row['pending_requests'] or 0),
+        'active_jobs': int(row['active_jobs'] or 0),
+        'low_stock_items': int(row['low_stock_items'] or 0),
+        'unpaid_total': float(row['unpaid_total'] or 0),
+        'total_revenue': float(row['total_revenue'] or 0)
+    }
+
+
+# ---------------------------------------------------------------------------
+# Delta helpers used by the write paths
+# ---------------------------------------------------------------------------
+
+def apply_counter_deltas(cur, **deltas):
+    """
+    Apply counter deltas using the caller's cursor.
+    Must run inside the same transaction as the write it accounts for.
+
+    Usage:
+        apply_counter_deltas(cur, customers_count=1)
+    """
+    changes = {name: value for name, value in deltas.items() if value}
+    if not changes:
+        return
+
+    unknown = set(changes) - set(COUNTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown dashboard counters: {', '.join(sorted(unknown))}")
+
+    assignments = ', '.join(f"{name} = {name} + %s" for name in changes)
+    cur.execute(f"""
+        UPDATE {SCHEMA}.dashboard_counters
+        SET {assignments}, updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    """, tuple(changes.values()))
+
+
+def request_status_deltas(old_status, new_status):
+    """Counter deltas for a service request moving from old_status to new_status (None = absent)."""
+    return {
+        'pending_requests': int(new_status in PENDING_STATUSES) - int(old_status in PENDING_STATUSES),
+        'active_jobs': int(new_status in ACTIVE_STATUSES) - int(old_status in ACTIVE_STATUSES)
+    }
+
+
+def is_low_stock(quantity_in_stock, reorder_level):
+    """Check whether an inventory level counts as low stock."""
+    if quantity_in_stock is None or reorder_level is None:
+        return False
+    return quantity_in_stock <= reorder_level
+
+
+def low_stock_delta(old_quantity, old_reorder_level, new_quantity, new_reorder_level):
+    """Change in the low_stock_items counter for a single part."""
+    return int(is_low_stock(new_quantity, new_reorder_level)) - int(is_low_stock(old_quantity, old_reorder_level))
+
+
+def bill_deltas(old_bill, new_bill):
+    """
+    Counter deltas for a bill changing from old_bill to new_bill.
+    Either side may be None (bill created or deleted).
+    """
+    def amounts(bill):
+        if not bill:
+            return Decimal('0'), Decimal('0')
+        total = Decimal(str(bill.get('total_amount') or 0))
+        if bill.get('payment_status') == 'Paid':
+            return Decimal('0'), total
+        if bill.get('payment_status') == 'Unpaid':
+            return total, Decimal('0')
+        return Decimal('0'), Decimal('0')
+
+    old_unpaid, old_paid = amounts(old_bill)
+    new_unpaid, new_paid = amounts(new_bill)
+    return {
+        'unpaid_total': new_unpaid - old_unpaid,
+        'total_revenue': new_paid - old_paid
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def get_counters():
+    """Get the current counters row, or None if it has not been initialised."""
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT * FROM {SCHEMA}.dashboard_counters WHERE id = 1")
+        row = cur.fetchone()
+        return _serialize_counters(row) if row else None
+
+
+def _compute_dashboard_stats():
+    """Read the counters row and top employees from the database."""
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT * FROM {SCHEMA}.dashboard_counters WHERE id = 1")
+        row = cur.fetchone()
+
+        # Top employees by rating (limit 3)
+        cur.execute(f"""
+            SELECT id, name, position, CAST(rating AS FLOAT) as rating, jobs_done
+            FROM {SCHEMA}.employees
+            WHERE working_status = 'Working'
+            ORDER BY rating DESC, jobs_done DESC
+            LIMIT 3
+        """)
+        top_employees = [dict(r) for r in cur.fetchall()]
+
+    if row:
+        stats = _serialize_counters(row)
+    else:
+        # Counters row missing (fresh database) - build it now
+        stats = reconcile_counters()['counters']
+
+    stats['top_employees'] = top_employees
+    return stats
+
+
+def get_dashboard_stats():
+    """Get summary statistics for the dashboard (served from the TTL cache)."""
+    try:
+        return dict(_stats_cache.get_or_compute('stats', _compute_dashboard_stats))
+
+    except Exception as e:
+        print(f"[DEBUG] ERROR in get_dashboard_stats: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return _empty_stats()
+
+
+def invalidate_stats():
+    """
+    Drop the cached dashboard stats.
+    Call after the write's transaction has committed, otherwise a concurrent
+    poll can cache the pre-commit values again.
+    """
+    _stats_cache.invalidate()
+
+
+# ---------------------------------------------------------------------------
+# Reconciliation
+# ---------------------------------------------------------------------------
+
+def reconcile_counters(fix=True):
+    """
+    Recompute the counters from scratch and compare with the stored row.
+
+    Args:
+        fix: Overwrite the stored counters with the recomputed values
+
+    Returns:
+        dict with 'counters' (recomputed values), 'drift' (field -> {stored, actual})
+        and 'fixed' (whether the row was rewritten)
+    """
+    with get_db_cursor() as cur:
+        # Lock the counters row first so writers cannot bump it while we recount
+        cur.execute(f"SELECT * FROM {SCHEMA}.dashboard_counters WHERE id = 1 FOR UPDATE")
+        stored_row = cur.fetchone()
+        stored = _serialize_counters(stored_row) if stored_row else None
+
+        cur.execute(RECOMPUTE_QUERY)
+        actual = _serialize_counters(cur.fetchone())
+
+        drift = {}
+        for name in COUNTER_FIELDS:
+            stored_value = stored[name] if stored else None
+            if stored_value != actual[name]:
+                drift[name] = {'stored': stored_value, 'actual': actual[name]}
+
+        if fix and drift:
+            columns = ', '.join(COUNTER_FIELDS)
+            placeholders = ', '.join(['%s'] * len(COUNTER_FIELDS))
+            assignments = ', '.join(f"{name} = EXCLUDED.{name}" for name in COUNTER_FIELDS)
+            cur.execute(f"""
+                INSERT INTO {SCHEMA}.dashboard_counters (id, {columns}, updated_at)
+                VALUES (1, {placeholders}, CURRENT_TIMESTAMP)
+                ON CONFLICT (id) DO UPDATE
+                SET {assignments}, updated_at = CURRENT_TIMESTAMP
+            """, tuple(actual[name] for name in COUNTER_FIELDS))
+
+    if fix and drift:
+        invalidate_stats()
+
+    return {
+        'counters': actual,
+        'drift': drift,
+        'fixed': bool(fix and drift)
+    }
@@ -5,6 +5,7 @@ import logging
 from decimal import Decimal
 from datetime import datetime
 from db.connection import get_db_cursor, execute_returning
+from controllers.dashboard import invalidate_stats
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -70,6 +71,7 @@ def create_employee(name, position, salary=0.0, phone=None, email=None, working_
     logger.info(f"==> Executing INSERT with params: {params}")
     result = execute_returning(query, params)
     logger.info(f"==> INSERT result: {result}")
+    invalidate_stats()
     return _serialize_employee(result)
 
 
@@ -128,6 +130,7 @@ def update_employee(employee_id, name=None, role=None, position=None, phone=None
     
     result = execute_returning(query, tuple(params))
     logger.info(f"==> UPDATE result: {result}")
+    invalidate_stats()
     return _serialize_employee(result)
 
 
@@ -140,6 +143,7 @@ def delete_employee(employee_id):
         RETURNING *
     """
     result = execute_returning(query, (employee_id,))
+    invalidate_stats()
     return _serialize_employee(result)
 
 
@@ -153,6 +157,7 @@ def soft_delete_employee(employee_id):
         RETURNING *
     """
     result = execute_returning(query, (employee_id,))
+    invalidate_stats()
     return _serialize_employee(result)
 
 
@@ -0,0 +1,423 @@
+"""
+History import controller - Bulk load of historical service records from CSV.
+
+The CSV is streamed through COPY into a session temp table, validated and
+resolved with set-based statements, then merged into the real tables in
+batches of requests, each committed on its own. Memory use does not grow
+with the file size.
+
+CSV layout: one line per part used (or one line for a request without
+parts). Lines sharing an ext_ref belong to the same request; request,
+customer, vehicle, job and bill values are taken from its first line.
+"""
+import logging
+from psycopg.rows import dict_row
+from db.connection import get_connection
+from controllers.billing import DEFAULT_TAX_RATE
+from controllers.dashboard import reconcile_counters
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = 'vehicle_service'
+
+IMPORT_COLUMNS = (
+    'ext_ref',
+    'customer_name', 'customer_phone', 'customer_email', 'customer_address',
+    'plate_no', 'vehicle_brand', 'vehicle_model', 'vehicle_year', 'vehicle_color',
+    'request_date', 'service_type', 'problem_note', 'priority', 'status',
+    'employee_id', 'job_start', 'job_end', 'labor_charge',
+    'part_code', 'quantity_used', 'unit_price',
+    'bill_date', 'tax', 'payment_status', 'payment_date'
+)
+
+REQUIRED_COLUMNS = ('ext_ref', 'customer_phone', 'plate_no', 'service_type', 'request_date')
+
+MAX_REPORTED_ERRORS = 50
+
+# Report COPY progress every this many bytes
+PROGRESS_BYTES = 16 * 1024 * 1024
+
+DATE_RE = r'^\d{4}-\d{2}-\d{2}$'
+TIMESTAMP_RE = r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$'
+NUMBER_RE = r'^-?\d+(\.\d+)?$'
+INTEGER_RE = r'^\d+$'
+
+# Type each value is cast to by the merge; checked after the format rules so
+# an impossible date or an out-of-range number rejects the line instead of
+# failing the batch
+CAST_TYPES = (
+    ('request_date', 'date', 'a valid date'),
+    ('bill_date', 'date', 'a valid date'),
+    ('job_start', 'timestamp', 'a valid timestamp'),
+    ('job_end', 'timestamp', 'a valid timestamp'),
+    ('payment_date', 'timestamp', 'a valid timestamp'),
+    ('labor_charge', 'numeric(10,2)', 'below 100000000'),
+    ('unit_price', 'numeric(10,2)', 'below 100000000'),
+    ('tax', 'numeric(10,2)', 'below 100000000'),
+    ('quantity_used', 'int', 'within the integer range'),
+    ('vehicle_year', 'int', 'within the integer range'),
+    ('employee_id', 'int', 'within the integer range')
+)
+
+CAST_RULES = '\n'.join(
+    f"        WHEN NOT {SCHEMA}.is_valid_input(s.{column}, '{cast}') THEN '{column} must be {expected}'"
+    for column, cast, expected in CAST_TYPES
+)
+
+# First failing rule wins; every line of a request with a bad line is rejected
+VALIDATE_QUERY = f"""
+    UPDATE import_staging s
+    SET error = CASE
+        WHEN s.ext_ref IS NULL THEN 'ext_ref is required'
+        WHEN s.customer_phone IS NULL THEN 'customer_phone is required'
+        WHEN s.plate_no IS NULL THEN 'plate_no is required'
+        WHEN s.service_type IS NULL THEN 'service_type is required'
+        WHEN s.request_date !~ '{DATE_RE}' THEN 'request_date must be YYYY-MM-DD'
+        WHEN s.bill_date !~ '{DATE_RE}' THEN 'bill_date must be YYYY-MM-DD'
+        WHEN s.job_start !~ '{TIMESTAMP_RE}' THEN 'job_start must be YYYY-MM-DD[ HH:MM[:SS]]'
+        WHEN s.job_end !~ '{TIMESTAMP_RE}' THEN 'job_end must be YYYY-MM-DD[ HH:MM[:SS]]'
+        WHEN s.payment_date !~ '{TIMESTAMP_RE}' THEN 'payment_date must be YYYY-MM-DD[ HH:MM[:SS]]'
+        WHEN s.labor_charge !~ '{NUMBER_RE}' THEN 'labor_charge must be a number'
+        WHEN s.unit_price !~ '{NUMBER_RE}' THEN 'unit_price must be a number'
+        WHEN s.tax !~ '{NUMBER_RE}' THEN 'tax must be a number'
+        WHEN s.quantity_used !~ '{INTEGER_RE}' THEN 'quantity_used must be a whole number'
+        WHEN s.vehicle_year !~ '{INTEGER_RE}' THEN 'vehicle_year must be a whole number'
+        WHEN s.employee_id !~ '{INTEGER_RE}' THEN 'employee_id must be a whole number'
+{CAST_RULES}
+        WHEN s.part_code IS NOT NULL AND s.quantity_used IS NULL THEN 'quantity_used is required with part_code'
+        WHEN s.part_code IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.inventory i WHERE i.part_code = s.part_code)
+             THEN 'unknown part_code'
+        WHEN s.employee_id IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.employees e WHERE e.id = s.employee_id::int)
+             THEN 'unknown employee_id'
+        WHEN NOT EXISTS (SELECT 1 FROM {SCHEMA}.customers c WHERE c.phone = s.customer_phone)
+             AND NOT EXISTS (SELECT 1 FROM import_staging o
+                             WHERE o.customer_phone = s.customer_phone AND o.customer_name IS NOT NULL
+                               AND o.customer_email IS NOT NULL AND o.customer_address IS NOT NULL)
+             THEN 'new customer needs customer_name, customer_email and customer_address'
+        WHEN NOT EXISTS (SELECT 1 FROM {SCHEMA}.vehicles v WHERE v.plate_no = s.plate_no)
+             AND NOT EXISTS (SELECT 1 FROM import_staging o
+                             WHERE o.plate_no = s.plate_no AND o.vehicle_brand IS NOT NULL
+                               AND o.vehicle_model IS NOT NULL AND o.vehicle_year IS NOT NULL
+                               AND o.vehicle_color IS NOT NULL)
+             THEN 'new vehicle needs vehicle_brand, vehicle_model, vehicle_year and vehicle_color'
+    END
+"""
+
+# Statements merging one batch (%(batch)s) of import_requests, in order
+MERGE_STEPS = (
+    ('customers', f"""
+        INSERT INTO {SCHEMA}.customers (name, phone, email, address)
+        SELECT DISTINCT ON (s.customer_phone)
+               s.customer_name, s.customer_phone, s.customer_email, s.customer_address
+        FROM import_staging s
+        JOIN import_requests r ON r.ext_ref = s.ext_ref
+        WHERE r.batch_no = %(batch)s
+          AND s.customer_name IS NOT NULL AND s.customer_email IS NOT NULL AND s.customer_address IS NOT NULL
+        ORDER BY s.customer_phone, s.line_no
+        ON CONFLICT DO NOTHING
+    """),
+    ('vehicles', f"""
+        INSERT INTO {SCHEMA}.vehicles (plate_no, brand, model, year, color, customer_id)
+        SELECT DISTINCT ON (s.plate_no)
+               s.plate_no, s.vehicle_brand, s.vehicle_model, s.vehicle_year::int, s.vehicle_color, c.customer_id
+        FROM import_staging s
+        JOIN import_requests r ON r.ext_ref = s.ext_ref
+        JOIN {SCHEMA}.customers c ON c.phone = s.customer_phone
+        WHERE r.batch_no = %(batch)s
+          AND s.vehicle_brand IS NOT NULL AND s.vehicle_model IS NOT NULL
+          AND s.vehicle_year IS NOT NULL AND s.vehicle_color IS NOT NULL
+        ORDER BY s.plate_no, s.line_no
+        ON CONFLICT DO NOTHING
+    """),
+    ('resolve', f"""
+        UPDATE import_requests r
+        SET vehicle_id = v.vehicle_id,
+            error = CASE WHEN v.vehicle_id IS NULL
+                         THEN 'customer or vehicle could not be created (email or plate already used)' END
+        FROM import_staging s
+        LEFT JOIN {SCHEMA}.vehicles v ON v.plate_no = s.plate_no
+        WHERE s.line_no = r.first_line AND r.batch_no = %(batch)s
+    """),
+    ('allocate', f"""
+        UPDATE import_requests r
+        SET request_id = nextval(pg_get_serial_sequence('{SCHEMA}.service_requests', 'request_id')),
+            job_id = nextval(pg_get_serial_sequence('{SCHEMA}.service_jobs', 'job_id')),
+            bill_id = CASE WHEN s.bill_date IS NOT NULL
+                           THEN nextval(pg_get_serial_sequence('{SCHEMA}.billing', 'bill_id')) END
+        FROM import_staging s
+        WHERE s.line_no = r.first_line AND r.batch_no = %(batch)s AND r.error IS NULL
+    """),
+    ('requests', f"""
+        INSERT INTO {SCHEMA}.service_requests
+            (request_id, request_date, service_type, problem_note, status, priority, vehicle_id)
+        SELECT r.request_id, s.request_date::date, s.service_type, s.problem_note,
+               COALESCE(s.status, 'Completed'), COALESCE(s.priority, 'Normal'), r.vehicle_id
+        FROM import_requests r
+        JOIN import_staging s ON s.line_no = r.first_line
+        WHERE r.batch_no = %(batch)s AND r.error IS NULL
+    """),
+    ('jobs', f"""
+        INSERT INTO {SCHEMA}.service_jobs
+            (job_id, request_id, employee_id, start_time, end_time, labor_charge, job_status)
+        SELECT r.job_id, r.request_id, s.employee_id::int,
+               COALESCE(s.job_start::timestamp, s.request_date::timestamp),
+               s.job_end::timestamp,
+               COALESCE(s.labor_charge::numeric, 0),
+               CASE WHEN COALESCE(s.status, 'Completed') = 'Completed' THEN 'Completed' ELSE 'In Progress' END
+        FROM import_requests r
+        JOIN import_staging s ON s.line_no = r.first_line
+        WHERE r.batch_no = %(batch)s AND r.error IS NULL
+    """),
+    # Back-dated status history (the status triggers are off for the batch):
+    # requests open at request_date and jobs at their start; completions are
+    # dated job_end
+    ('status_events', f"""
+        INSERT INTO {SCHEMA}.status_events (entity_type, entity_id, from_status, to_status, changed_at)
+        SELECT e.entity_type, e.entity_id, {SCHEMA}.status_code(e.from_status),
+               {SCHEMA}.status_code(e.to_status), e.changed_at
+        FROM import_requests r
+        JOIN import_staging s ON s.line_no = r.first_line
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(s.status, 'Completed') AS status,
+                   s.request_date::timestamp AS opened,
+                   COALESCE(s.job_start::timestamp, s.request_date::timestamp) AS started,
+                   COALESCE(s.job_end::timestamp, s.job_start::timestamp, s.request_date::timestamp) AS ended
+        ) t
+        CROSS JOIN LATERAL (VALUES
+            (1, 'R', r.request_id, NULL, 'Pending', t.opened, TRUE),
+            (2, 'R', r.request_id, 'Pending', 'In Progress', t.started, t.status IN ('In Progress', 'Completed')),
+            (3, 'R', r.request_id, 'In Progress', 'Completed', t.ended, t.status = 'Completed'),
+            (3, 'R', r.request_id, 'Pending', t.status, t.ended,
+             t.status NOT IN ('Pending', 'In Progress', 'Completed')),
+            (1, 'J', r.job_id, NULL, 'In Progress', t.started, TRUE),
+            (2, 'J', r.job_id, 'In Progress', 'Completed', t.ended, t.status = 'Completed')
+        ) e(step, entity_type, entity_id, from_status, to_status, changed_at, applies)
+        WHERE r.batch_no = %(batch)s AND r.error IS NULL AND e.applies
+        ORDER BY e.entity_type, e.entity_id, e.step
+    """),
+    ('parts', f"""
+        INSERT INTO {SCHEMA}.job_parts_used (job_id, part_id, quantity_used, unit_price_at_time, used_at)
+        SELECT r.job_id, i.part_id, s.quantity_used::int,
+               COALESCE(s.unit_price::numeric, i.unit_price),
+               COALESCE(f.job_start::timestamp, f.request_date::timestamp)
+        FROM import_requests r
+        JOIN import_staging f ON f.line_no = r.first_line
+        JOIN import_staging s ON s.ext_ref = r.ext_ref
+        JOIN {SCHEMA}.inventory i ON i.part_code = s.part_code
+        WHERE r.batch_no = %(batch)s AND r.error IS NULL
+    """),
+    ('bills', f"""
+        INSERT INTO {SCHEMA}.billing
+            (bill_id, job_id, bill_date, subtotal_labor, subtotal_parts, tax, total_amount,
+             payment_status, payment_date)
+        SELECT t.bill_id, t.job_id, t.bill_date, t.labor, t.parts, t.tax,
+               t.labor + t.parts + t.tax, t.payment_status, t.payment_date
+        FROM (
+            SELECT r.bill_id, r.job_id, s.bill_date::date AS bill_date,
+                   COALESCE(s.labor_charge::numeric, 0) AS labor,
+                   COALESCE(p.parts, 0) AS parts,
+                   COALESCE(s.tax::numeric,
+                            ROUND((COALESCE(s.labor_charge::numeric, 0) + COALESCE(p.parts, 0))
+                                  * %(tax_rate)s::numeric, 2)) AS tax,
+                   COALESCE(s.payment_status, 'Unpaid') AS payment_status,
+                   s.payment_date::timestamp AS payment_date
+            FROM import_requests r
+            JOIN import_staging s ON s.line_no = r.first_line
+            LEFT JOIN (
+                SELECT jpu.job_id, SUM(jpu.quantity_used * jpu.unit_price_at_time) AS parts
+                FROM {SCHEMA}.job_parts_used jpu
+                JOIN import_requests b ON b.job_id = jpu.job_id
+                WHERE b.batch_no = %(batch)s
+                GROUP BY jpu.job_id
+            ) p ON p.job_id = r.job_id
+            WHERE r.batch_no = %(batch)s AND r.error IS NULL AND r.bill_id IS NOT NULL
+        ) t
+    """),
+    ('refs', f"""
+        INSERT INTO {SCHEMA}.history_import_refs (source, ext_ref, request_id)
+        SELECT %(source)s, r.ext_ref, r.request_id
+        FROM import_requests r
+        WHERE r.batch_no = %(batch)s AND r.error IS NULL
+    """)
+)
+
+
+def _read_header(stream):
+    """Read and check the CSV header line; returns the column names in file order."""
+    line = stream.readline()
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig')
+    columns = [name.strip().lower() for name in line.lstrip('\ufeff').strip().split(',')]
+
+    unknown = [name for name in columns if name not in IMPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def _create_work_tables(cur):
+    """Session temp tables holding the raw lines and the requests to merge."""
+    text_columns = ',\n'.join(f"{name} TEXT" for name in IMPORT_COLUMNS)
+    cur.execute(f"""
+        CREATE TEMP TABLE import_staging (
+            line_no BIGSERIAL PRIMARY KEY,
+            {text_columns},
+            error TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TEMP TABLE import_requests (
+            ext_ref TEXT PRIMARY KEY,
+            first_line BIGINT NOT NULL,
+            batch_no INT NOT NULL,
+            vehicle_id INT,
+            request_id INT,
+            job_id INT,
+            bill_id INT,
+            error TEXT
+        )
+    """)
+
+
+def import_history(stream, source, batch_size=5000, chunk_size=1 << 16, progress=None):
+    """
+    Import a service history CSV.
+
+    Args:
+        stream: Binary or text file-like object positioned at the header line
+        source: Name of the import source (e.g. the branch); ext_ref values
+                already imported from the same source are skipped, so an
+                interrupted import can simply be run again
+        batch_size: Requests merged per committed batch
+        progress: Optional callable receiving progress messages
+
+    Returns:
+        Summary dict: lines, requests, imported, skipped (already imported),
+        rejected and the first rejected lines / requests under errors
+
+    Raises:
+        ValueError: Bad header
+    """
+    progress = progress or (lambda message: None)
+    columns = _read_header(stream)
+
+    merged_batches = 0
+    conn = get_connection()
+    try:
+        with conn.cursor(row_factory=dict_row) as cur:
+            _create_work_tables(cur)
+
+            # 1. Stream the file into staging
+            loaded = 0
+            next_report = PROGRESS_BYTES
+            with cur.copy(f"COPY import_staging ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)") as copy:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    copy.write(chunk)
+                    loaded += len(chunk)
+                    if loaded >= next_report:
+                        progress(f"Loaded {loaded // (1024 * 1024)} MB")
+                        next_report += PROGRESS_BYTES
+
+            # 2. Normalise blanks, validate, index for the merge
+            cur.execute("UPDATE import_staging SET " + ', '.join(
+                f"{name} = NULLIF(TRIM({name}), '')" for name in IMPORT_COLUMNS))
+            cur.execute("ANALYZE import_staging")
+            cur.execute(VALIDATE_QUERY)
+            cur.execute("""
+                UPDATE import_staging s
+                SET error = 'another line of this request was rejected'
+                WHERE s.error IS NULL
+                  AND EXISTS (SELECT 1 FROM import_staging o WHERE o.ext_ref = s.ext_ref AND o.error IS NOT NULL)
+            """)
+            cur.execute("CREATE INDEX ON import_staging (ext_ref)")
+
+            # 3. One row per new request, numbered into batches
+            cur.execute(f"""
+                INSERT INTO import_requests (ext_ref, first_line, batch_no)
+                SELECT ext_ref, first_line, ((ROW_NUMBER() OVER (ORDER BY first_line)) - 1) / %s
+                FROM (
+                    SELECT ext_ref, MIN(line_no) AS first_line
+                    FROM import_staging
+                    WHERE error IS NULL
+                    GROUP BY ext_ref
+                ) refs
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {SCHEMA}.history_import_refs h
+                    WHERE h.source = %s AND h.ext_ref = refs.ext_ref
+                )
+            """, (batch_size, source))
+            cur.execute("ANALYZE import_requests")
+
+            cur.execute("""
+                SELECT (SELECT COUNT(*) FROM import_staging) AS lines,
+                       (SELECT COUNT(DISTINCT ext_ref) FROM import_staging) AS requests,
+                       (SELECT COUNT(DISTINCT ext_ref) FROM import_staging WHERE error IS NOT NULL) AS invalid,
+                       (SELECT COUNT(*) FROM import_requests) AS pending,
+                       (SELECT COALESCE(MAX(batch_no) + 1, 0) FROM import_requests) AS batches
+            """)
+            counts = cur.fetchone()
+            cur.execute(f"""
+                SELECT line_no + 1 AS line, ext_ref, error
+                FROM import_staging
+                WHERE error IS NOT NULL
+                ORDER BY line_no
+                LIMIT {MAX_REPORTED_ERRORS}
+            """)
+            errors = [dict(row) for row in cur.fetchall()]
+            conn.commit()
+            progress(f"Staged {counts['lines']} lines: {counts['pending']} new request(s) "
+                     f"in {counts['batches']} batch(es)")
+
+            # 4. Merge batch by batch
+            params = {'source': source, 'tax_rate': DEFAULT_TAX_RATE}
+            for batch in range(counts['batches']):
+                params['batch'] = batch
+                # The status_events step writes the history with the source dates
+                cur.execute("SET LOCAL vehicle_service.skip_status_events = 'on'")
+                for _, statement in MERGE_STEPS:
+                    cur.execute(statement, params)
+                conn.commit()
+                merged_batches += 1
+                progress(f"Batch {batch + 1}/{counts['batches']} merged")
+
+            cur.execute("""
+                SELECT COUNT(*) FILTER (WHERE error IS NULL) AS imported,
+                       COUNT(*) FILTER (WHERE error IS NOT NULL) AS failed
+                FROM import_requests
+            """)
+            merged = cur.fetchone()
+            cur.execute(f"""
+                SELECT NULL::bigint AS line, ext_ref, error
+                FROM import_requests
+                WHERE error IS NOT NULL
+                ORDER BY first_line
+                LIMIT {MAX_REPORTED_ERRORS}
+            """)
+            errors.extend(dict(row) for row in cur.fetchall())
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        # Counters are rebuilt once instead of per row, also when a later
+        # batch failed after earlier ones were committed
+        if merged_batches:
+            reconcile_counters(fix=True)
+
+    return {
+        'lines': counts['lines'],
+        'requests': counts['requests'],
+        'imported': merged['imported'],
+        'skipped': counts['requests'] - counts['invalid'] - counts['pending'],
+        'rejected': counts['invalid'] + merged['failed'],
+        'errors': errors[:MAX_REPORTED_ERRORS]
+    }
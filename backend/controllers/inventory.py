@@ -1,12 +1,45 @@
 """
 Inventory controller - Raw SQL operations for inventory management.
+
+Reads go through an in-process catalog cache keyed by part_id and
+part_code. Every write below updates it after committing; when the
+inventory table version moves, the cache re-reads only the parts whose
+last_updated moved (see _load_changed_items). Writes therefore stamp
+last_updated with the database clock.
+
+Every quantity change is appended to stock_movements in the same
+statement that makes it, and stock never goes below zero: decrements
+only match while enough stock is left (see database/schema.sql,
+section 24).
+
+Hot parts can keep their stock in striped sub-rows (section 25); reads
+go through the inventory_levels view, which adds the stripes up, and
+writes below fold the stripes into the part row first.
 """
-from db.connection import get_db_cursor, execute_returning
+from config import Config
+from db.connection import get_db_cursor
+from controllers.dashboard import apply_counter_deltas, is_low_stock, low_stock_delta, invalidate_stats
+from utils.cache import CatalogCache
+from utils.events import publish
+from utils.group_commit import GroupCommitter
+from utils.http_cache import get_table_versions
 from datetime import datetime
 from decimal import Decimal
 
 SCHEMA = 'vehicle_service'
 
+MOVEMENT_TYPES = ('receipt', 'consumption', 'return', 'adjustment')
+
+
+class InsufficientStock(ValueError):
+    """Raised when a decrement would take a part's stock below zero."""
+
+    def __init__(self, part_id, available, requested):
+        super().__init__(f"Insufficient stock. Available: {available}, Requested: {requested}")
+        self.part_id = part_id
+        self.available = available
+        self.requested = requested
+
 
 def _serialize_item(row):
     """Convert inventory row to JSON-serializable dict."""
@@ -22,70 +55,317 @@ def _serialize_item(row):
     return item
 
 
-def get_all_items():
-    """Get all inventory items."""
+def _load_all_items():
+    """Catalog loader: every inventory item."""
     with get_db_cursor() as cur:
-        cur.execute(f"SELECT * FROM {SCHEMA}.inventory ORDER BY part_name")
+        cur.execute(f"SELECT * FROM {SCHEMA}.inventory_levels ORDER BY part_name")
         return [_serialize_item(row) for row in cur.fetchall()]
 
 
-def get_item_by_id(part_id):
-    """Get a single inventory item by ID."""
+def _load_item(column, value):
+    """Catalog loader: one item by part_id or part_code."""
     with get_db_cursor() as cur:
-        cur.execute(f"SELECT * FROM {SCHEMA}.inventory WHERE part_id = %s", (part_id,))
+        cur.execute(f"SELECT * FROM {SCHEMA}.inventory_levels WHERE {column} = %s", (value,))
         row = cur.fetchone()
         return _serialize_item(row) if row else None
 
 
-def get_low_stock_items():
-    """Get items where quantity is at or below reorder level."""
+def _load_changed_items(since):
+    """
+    Catalog loader: items changed since `since`, every part_id, and the
+    next mark. Striped parts are always returned, since taking from a
+    stripe does not touch the part row.
+
+    The mark is the start of the oldest open transaction: last_updated is
+    that transaction's start time, so a write still uncommitted now is
+    picked up by the next call. It is read before the items, so a write
+    committing in between is either in the items or still counted.
+    """
     with get_db_cursor() as cur:
-        cur.execute(f"""
-            SELECT * FROM {SCHEMA}.inventory 
-            WHERE quantity_in_stock <= reorder_level
-            ORDER BY (quantity_in_stock - reorder_level) ASC
+        cur.execute("""
+            SELECT LEAST(now(), MIN(xact_start)) AS mark
+            FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend'
         """)
-        return [_serialize_item(row) for row in cur.fetchall()]
+        mark = cur.fetchone()['mark']
+        if since is None:
+            return [], None, mark
+        cur.execute(f"""
+            SELECT * FROM {SCHEMA}.inventory_levels
+            WHERE last_updated >= %s OR stock_stripes > 0
+        """, (since,))
+        items = [_serialize_item(row) for row in cur.fetchall()]
+        cur.execute(f"SELECT part_id FROM {SCHEMA}.inventory")
+        keys = [row['part_id'] for row in cur.fetchall()]
+    return items, keys, mark
+
+
+# Tables whose changes can change what inventory reads return
+STOCK_TABLES = ('inventory', 'inventory_stock_stripes')
+
+
+def _inventory_version():
+    versions = get_table_versions(STOCK_TABLES)
+    return tuple(versions[table] for table in STOCK_TABLES)
+
+
+catalog = CatalogCache(
+    _load_all_items, _load_item, _inventory_version,
+    key='part_id', alt_key='part_code', load_changed=_load_changed_items,
+    sort_key=lambda item: (item['part_name'], item['part_id']),
+    max_items=Config.INVENTORY_CACHE_MAX_ITEMS,
+    check_interval=Config.INVENTORY_CACHE_CHECK_SECONDS
+)
+
+
+def catalog_table_versions(tables):
+    """
+    Table versions for inventory ETags. The catalog catches up with them
+    first, so a body served from it is never older than its ETag.
+    """
+    versions = get_table_versions(tables)
+    catalog.sync(tuple(versions[table] for table in STOCK_TABLES))
+    return versions
+
+
+def cache_item(row):
+    """Write an inventory row changed by a committed transaction through to the catalog."""
+    if row is not None:
+        catalog.put(_serialize_item(dict(row)))
+
+
+def get_all_items():
+    """Get all inventory items."""
+    return catalog.all()
+
+
+def get_item_by_id(part_id):
+    """Get a single inventory item by ID."""
+    return catalog.get(part_id)
+
+
+def get_item_by_code(part_code):
+    """Get a single inventory item by part code."""
+    return catalog.get_by_alt(part_code)
+
+
+def get_low_stock_items():
+    """Get items where quantity is at or below reorder level."""
+    items = [item for item in catalog.all()
+             if is_low_stock(item['quantity_in_stock'], item['reorder_level'])]
+    items.sort(key=lambda item: item['quantity_in_stock'] - item['reorder_level'])
+    return items
 
 
 def add_item(part_name, part_code, unit_price, reorder_level, brand=None, quantity_in_stock=0, quantity_label='pcs', description=None, image_url=None):
     """Add a new inventory item."""
-    query = f"""
-        INSERT INTO {SCHEMA}.inventory 
-            (part_name, part_code, brand, unit_price, quantity_in_stock, quantity_label, reorder_level, description, image_url, last_updated)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING *
-    """
-    result = execute_returning(query, (
-        part_name, part_code, brand, unit_price, quantity_in_stock, quantity_label, reorder_level, description, image_url, datetime.now()
-    ))
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            WITH item AS (
+                INSERT INTO {SCHEMA}.inventory 
+                    (part_name, part_code, brand, unit_price, quantity_in_stock, quantity_label, reorder_level, description, image_url, last_updated)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                RETURNING *
+            ),
+            movement AS (
+                INSERT INTO {SCHEMA}.stock_movements (part_id, movement_type, quantity, balance_after, note)
+                SELECT part_id, 'receipt', quantity_in_stock, quantity_in_stock, 'Opening balance'
+                FROM item
+                WHERE quantity_in_stock > 0
+            )
+            SELECT * FROM item
+        """, (
+            part_name, part_code, brand, unit_price, quantity_in_stock, quantity_label, reorder_level, description, image_url
+        ))
+        result = cur.fetchone()
+        if result and is_low_stock(result['quantity_in_stock'], result['reorder_level']):
+            apply_counter_deltas(cur, low_stock_items=1)
+    
+    if result:
+        invalidate_stats()
+        cache_item(result)
     return _serialize_item(result) if result else None
 
 
-def update_stock(part_id, quantity_change):
+def _update_with_counters(updates, params, part_id, movement_type='adjustment', note=None):
     """
-    Update stock quantity by adding/subtracting.
-    Use positive values to add stock, negative to subtract.
+    Run an inventory UPDATE and adjust the low-stock dashboard counter
+    in the same transaction, based on the row's old and new levels.
+    A quantity change is appended to stock_movements by the same statement.
+
+    A striped part's stock is folded into the part row first, so the
+    row holds the whole stock while it is updated, and spread over its
+    stripes again afterwards.
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT {SCHEMA}.fold_stock_stripes(%s)", (part_id,))
+        cur.execute(f"""
+            WITH upd AS (
+                UPDATE {SCHEMA}.inventory i
+                SET {', '.join(updates)}
+                FROM (
+                    SELECT part_id, quantity_in_stock AS old_quantity, reorder_level AS old_reorder_level
+                    FROM {SCHEMA}.inventory
+                    WHERE part_id = %s
+                    FOR UPDATE
+                ) old
+                WHERE i.part_id = old.part_id
+                RETURNING i.*, old.old_quantity, old.old_reorder_level
+            ),
+            movement AS (
+                INSERT INTO {SCHEMA}.stock_movements (part_id, movement_type, quantity, balance_after, note)
+                SELECT part_id, %s, quantity_in_stock - old_quantity, quantity_in_stock, %s
+                FROM upd
+                WHERE quantity_in_stock <> old_quantity
+            )
+            SELECT * FROM upd
+        """, tuple(params) + (part_id,) + (movement_type, note))
+        result = cur.fetchone()
+        if not result:
+            return None
+        
+        result = dict(result)
+        old_quantity = result.pop('old_quantity')
+        old_reorder_level = result.pop('old_reorder_level')
+        if result['stock_stripes']:
+            cur.execute(f"SELECT {SCHEMA}.spread_stock_stripes(%s)", (part_id,))
+        apply_counter_deltas(cur, low_stock_items=low_stock_delta(
+            old_quantity, old_reorder_level, result['quantity_in_stock'], result['reorder_level']
+        ))
+        publish(cur, 'inventory.updated', part_id=part_id,
+                quantity_in_stock=result['quantity_in_stock'],
+                low_stock=is_low_stock(result['quantity_in_stock'], result['reorder_level']))
+    
+    invalidate_stats()
+    cache_item(result)
+    return result
+
+
+def _apply_stock_deltas(deltas):
     """
-    query = f"""
-        UPDATE {SCHEMA}.inventory
-        SET quantity_in_stock = quantity_in_stock + %s, last_updated = %s
-        WHERE part_id = %s
-        RETURNING *
+    Apply a batch of update_stock() calls in one transaction: lock (and
+    fold) the affected parts in part_id order, apply the deltas in arrival
+    order, then write every part with one multi-row UPDATE and every
+    movement with one INSERT. Striped parts are spread over their stripes
+    again before committing, so takers do not have to fold them first.
+
+    Args:
+        deltas: [(part_id, quantity_change, movement_type, note)]
+
+    Returns:
+        One result per delta: the updated item, None when the part does not
+        exist, or an InsufficientStock for a delta that would take the
+        stock below zero (the other deltas still apply)
     """
-    result = execute_returning(query, (quantity_change, datetime.now(), part_id))
-    return _serialize_item(result) if result else None
+    part_ids = sorted({part_id for part_id, _, _, _ in deltas})
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT p.part_id, {SCHEMA}.fold_stock_stripes(p.part_id) AS quantity
+            FROM unnest(%s::int[]) AS p(part_id)
+        """, (part_ids,))
+        old_levels = {row['part_id']: row['quantity'] for row in cur.fetchall() if row['quantity'] is not None}
+        
+        levels = dict(old_levels)
+        outcomes = []
+        movements = []
+        for part_id, quantity_change, movement_type, note in deltas:
+            if part_id not in levels:
+                outcomes.append(None)
+            elif levels[part_id] + quantity_change < 0:
+                outcomes.append(InsufficientStock(part_id, levels[part_id], -quantity_change))
+            else:
+                levels[part_id] += quantity_change
+                if quantity_change:
+                    movements.append((part_id, movement_type, quantity_change, levels[part_id], note))
+                outcomes.append(part_id)
+        
+        updated = sorted({outcome for outcome in outcomes if isinstance(outcome, int)})
+        rows = {}
+        if updated:
+            movement_columns = [list(column) for column in zip(*movements)] or [[], [], [], [], []]
+            cur.execute(f"""
+                WITH upd AS (
+                    UPDATE {SCHEMA}.inventory i
+                    SET quantity_in_stock = v.quantity, last_updated = CURRENT_TIMESTAMP
+                    FROM unnest(%s::int[], %s::int[]) AS v(part_id, quantity)
+                    WHERE i.part_id = v.part_id
+                    RETURNING i.*
+                ),
+                movement AS (
+                    INSERT INTO {SCHEMA}.stock_movements (part_id, movement_type, quantity, balance_after, note)
+                    SELECT * FROM unnest(%s::int[], %s::text[], %s::int[], %s::int[], %s::text[])
+                )
+                SELECT * FROM upd
+            """, (
+                updated, [levels[part_id] for part_id in updated],
+                *movement_columns
+            ))
+            rows = {row['part_id']: dict(row) for row in cur.fetchall()}
+        
+        # Spread every folded striped part again, also when none of its
+        # deltas applied (rows keep the whole stock, as inventory_levels
+        # reports it)
+        cur.execute(f"""
+            SELECT {SCHEMA}.spread_stock_stripes(part_id)
+            FROM {SCHEMA}.inventory
+            WHERE part_id = ANY(%s::int[]) AND stock_stripes > 0
+            ORDER BY part_id
+        """, (sorted(old_levels),))
+        if not rows:
+            return outcomes
+        
+        apply_counter_deltas(cur, low_stock_items=sum(
+            low_stock_delta(old_levels[part_id], row['reorder_level'], row['quantity_in_stock'], row['reorder_level'])
+            for part_id, row in rows.items()
+        ))
+        for part_id, row in rows.items():
+            publish(cur, 'inventory.updated', part_id=part_id,
+                    quantity_in_stock=row['quantity_in_stock'],
+                    low_stock=is_low_stock(row['quantity_in_stock'], row['reorder_level']))
+    
+    invalidate_stats()
+    items = {}
+    for part_id, row in rows.items():
+        cache_item(row)
+        items[part_id] = _serialize_item(row)
+    return [dict(items[outcome]) if isinstance(outcome, int) else outcome for outcome in outcomes]
+
 
+# update_stock() calls arriving within STOCK_WRITE_WINDOW_MS of each other
+# share one transaction (group commit)
+_stock_writes = GroupCommitter(
+    _apply_stock_deltas,
+    window=Config.STOCK_WRITE_WINDOW_MS / 1000,
+    max_batch=Config.STOCK_WRITE_MAX_BATCH
+)
 
-def set_stock(part_id, new_quantity):
-    """Set stock to a specific quantity."""
-    query = f"""
-        UPDATE {SCHEMA}.inventory
-        SET quantity_in_stock = %s, last_updated = %s
-        WHERE part_id = %s
-        RETURNING *
+
+def update_stock(part_id, quantity_change, movement_type=None, note=None):
     """
-    result = execute_returning(query, (new_quantity, datetime.now(), part_id))
+    Update stock quantity by adding/subtracting.
+    Use positive values to add stock, negative to subtract.
+
+    The change is recorded as a 'receipt' (positive) or 'adjustment'
+    (negative) unless movement_type says otherwise. Concurrent calls are
+    coalesced into one transaction; each caller still gets the item as
+    committed.
+
+    Raises:
+        InsufficientStock: If subtracting would take the stock below zero
+    """
+    if movement_type is None:
+        movement_type = 'receipt' if quantity_change > 0 else 'adjustment'
+    return _stock_writes.call((part_id, quantity_change, movement_type, note))
+
+
+def set_stock(part_id, new_quantity, note=None):
+    """Set stock to a specific quantity (recorded as an 'adjustment')."""
+    result = _update_with_counters(
+        ["quantity_in_stock = %s", "last_updated = CURRENT_TIMESTAMP"],
+        [new_quantity],
+        part_id,
+        note=note
+    )
     return _serialize_item(result) if result else None
 
 
@@ -126,40 +406,126 @@ def update_item(part_id, part_name=None, part_code=None, brand=None, unit_price=
     if not updates:
         return get_item_by_id(part_id)
     
-    updates.append("last_updated = %s")
-    params.append(datetime.now())
-    params.append(part_id)
-    
-    query = f"""
-        UPDATE {SCHEMA}.inventory
-        SET {', '.join(updates)}
-        WHERE part_id = %s
-        RETURNING *
-    """
+    updates.append("last_updated = CURRENT_TIMESTAMP")
     
-    result = execute_returning(query, tuple(params))
+    result = _update_with_counters(updates, params, part_id)
     return _serialize_item(result) if result else None
 
 
 def part_exists(part_id):
     """Check if a part exists."""
-    with get_db_cursor() as cur:
-        cur.execute(f"SELECT 1 FROM {SCHEMA}.inventory WHERE part_id = %s", (part_id,))
-        return cur.fetchone() is not None
+    return catalog.get(part_id) is not None
 
 
 def check_stock_available(part_id, quantity_needed):
-    """Check if enough stock is available."""
-    with get_db_cursor() as cur:
-        cur.execute(f"SELECT quantity_in_stock FROM {SCHEMA}.inventory WHERE part_id = %s", (part_id,))
-        row = cur.fetchone()
-        if row:
-            return row['quantity_in_stock'] >= quantity_needed
-        return False
+    """
+    Check if enough stock is available (from the catalog cache).
+    Advisory only: writers re-check the stock in their own transaction.
+    """
+    item = catalog.get(part_id)
+    if item:
+        return item['quantity_in_stock'] >= quantity_needed
+    return False
     
 
 def delete_item(part_id):
     """Delete an inventory item by ID."""
-    query = f"DELETE FROM {SCHEMA}.inventory WHERE part_id = %s RETURNING *"
-    result = execute_returning(query, (part_id,))
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT {SCHEMA}.fold_stock_stripes(%s)", (part_id,))
+        cur.execute(f"""
+            WITH item AS (
+                DELETE FROM {SCHEMA}.inventory WHERE part_id = %s RETURNING *
+            ),
+            movement AS (
+                INSERT INTO {SCHEMA}.stock_movements (part_id, movement_type, quantity, balance_after, note)
+                SELECT part_id, 'adjustment', -quantity_in_stock, 0, 'Part deleted'
+                FROM item
+                WHERE quantity_in_stock > 0
+            )
+            SELECT * FROM item
+        """, (part_id,))
+        result = cur.fetchone()
+        if result and is_low_stock(result['quantity_in_stock'], result['reorder_level']):
+            apply_counter_deltas(cur, low_stock_items=-1)
+    
+    if result:
+        invalidate_stats()
+        catalog.remove(part_id)
     return result is not None
+
+
+def set_stock_stripes(part_id, stripes):
+    """
+    Split a part's stock over `stripes` sub-rows (0 keeps it in the part
+    row). Striping lets concurrent jobs take a hot part without queuing
+    on one row lock; the total stock does not change.
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT {SCHEMA}.set_stock_stripes(%s, %s) AS total", (part_id, stripes))
+        if cur.fetchone()['total'] is None:
+            return None
+        cur.execute(f"SELECT * FROM {SCHEMA}.inventory_levels WHERE part_id = %s", (part_id,))
+        result = cur.fetchone()
+    
+    cache_item(result)
+    return _serialize_item(result)
+
+
+def rebalance_stock_stripes():
+    """
+    Fold every striped part's stock and spread it evenly again, so no
+    stripe runs dry long before the others. Each part is its own short
+    transaction. Returns the number of parts rebalanced.
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT part_id FROM {SCHEMA}.inventory WHERE stock_stripes > 0 ORDER BY part_id")
+        part_ids = [row['part_id'] for row in cur.fetchall()]
+    
+    for part_id in part_ids:
+        with get_db_cursor() as cur:
+            cur.execute(f"SELECT {SCHEMA}.rebalance_stock_stripes(%s)", (part_id,))
+    
+    if part_ids:
+        catalog.invalidate()
+    return len(part_ids)
+
+
+def get_stock_movements(part_id, limit=50, before_id=None, movement_type=None):
+    """
+    Get a part's stock movements, newest first.
+
+    Args:
+        limit: Maximum number of movements to return
+        before_id: Only movements older than this movement_id (next page)
+        movement_type: Only movements of this type
+    """
+    clauses = ["part_id = %s"]
+    params = [part_id]
+    if before_id is not None:
+        clauses.append("movement_id < %s")
+        params.append(before_id)
+    if movement_type:
+        clauses.append("movement_type = %s")
+        params.append(movement_type)
+    params.append(limit)
+
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT movement_id, part_id, movement_type, quantity, balance_after,
+                   job_id, job_part_id, note, created_at
+            FROM {SCHEMA}.stock_movements
+            WHERE {' AND '.join(clauses)}
+            ORDER BY movement_id DESC
+            LIMIT %s
+        """, tuple(params))
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_cache_stats():
+    """Catalog cache counters for this process."""
+    return catalog.stats()
+
+
+def get_stock_write_stats():
+    """Group-commit flush sizes and latencies of update_stock() in this process."""
+    return _stock_writes.stats()
@@ -2,9 +2,178 @@
 Job Parts Used controller - Raw SQL operations for tracking parts used in jobs.
 """
 from db.connection import get_db_cursor, get_db_connection
+from controllers.dashboard import apply_counter_deltas, is_low_stock, low_stock_delta, invalidate_stats
+from controllers.inventory import cache_item, part_exists as _catalog_part_exists
+from utils.events import publish
 
 SCHEMA = 'vehicle_service'
 
+# Take the stock only if enough is left (take_stock() also handles striped
+# hot parts), record the usage and the 'consumption' movement. No row when
+# the part is missing or short.
+ADD_PART_QUERY = f"""
+    WITH taken AS (
+        SELECT {SCHEMA}.take_stock(%(part_id)s, %(quantity)s) AS stock_left
+    ),
+    stock AS (
+        SELECT l.part_id, l.part_name, l.part_code, l.brand, l.unit_price,
+               taken.stock_left AS quantity_in_stock,
+               to_jsonb(l) || jsonb_build_object('quantity_in_stock', taken.stock_left) AS part
+        FROM {SCHEMA}.inventory_levels l, taken
+        WHERE l.part_id = %(part_id)s AND taken.stock_left IS NOT NULL
+    ),
+    used AS (
+        INSERT INTO {SCHEMA}.job_parts_used (job_id, part_id, quantity_used, unit_price_at_time)
+        SELECT %(job_id)s, part_id, %(quantity)s, unit_price
+        FROM stock
+        RETURNING *
+    ),
+    movement AS (
+        INSERT INTO {SCHEMA}.stock_movements
+            (part_id, movement_type, quantity, balance_after, job_id, job_part_id)
+        SELECT used.part_id, 'consumption', -used.quantity_used, stock.quantity_in_stock,
+               used.job_id, used.job_part_id
+        FROM used, stock
+    )
+    SELECT used.*, stock.part_name, stock.part_code, stock.brand, stock.part
+    FROM used, stock
+"""
+
+# Delete the usage, put the stock back and record the 'return' movement
+REMOVE_PART_QUERY = f"""
+    WITH usage AS (
+        DELETE FROM {SCHEMA}.job_parts_used WHERE job_part_id = %s RETURNING *
+    ),
+    put AS (
+        SELECT part_id, {SCHEMA}.put_stock(part_id, quantity_used) AS stock_left
+        FROM usage
+    ),
+    stock AS (
+        SELECT put.part_id, put.stock_left AS quantity_in_stock,
+               to_jsonb(l) || jsonb_build_object('quantity_in_stock', put.stock_left) AS part
+        FROM put
+        JOIN {SCHEMA}.inventory_levels l ON l.part_id = put.part_id
+        WHERE put.stock_left IS NOT NULL
+    ),
+    movement AS (
+        INSERT INTO {SCHEMA}.stock_movements
+            (part_id, movement_type, quantity, balance_after, job_id, job_part_id)
+        SELECT usage.part_id, 'return', usage.quantity_used, stock.quantity_in_stock,
+               usage.job_id, usage.job_part_id
+        FROM usage, stock
+        WHERE usage.quantity_used <> 0
+    )
+    SELECT usage.part_id, usage.quantity_used, stock.part
+    FROM usage
+    LEFT JOIN stock ON TRUE
+"""
+
+
+# Batch version of ADD_PART_QUERY. Parts arrive sorted by part_id, so
+# take_stock() locks their rows in the same order in every batch (no
+# deadlocks between batches). Nothing is inserted when any part is missing
+# or short; one row per requested part is returned either way and the
+# caller rolls back the stock already taken.
+ADD_PARTS_BATCH_QUERY = f"""
+    WITH taken AS MATERIALIZED (
+        SELECT r.part_id, r.quantity, {SCHEMA}.take_stock(r.part_id, r.quantity) AS stock_left
+        FROM unnest(%(part_ids)s::int[], %(quantities)s::int[]) AS r(part_id, quantity)
+    ),
+    stock AS (
+        SELECT l.part_id, l.unit_price, t.quantity, t.stock_left,
+               to_jsonb(l) || jsonb_build_object('quantity_in_stock', t.stock_left) AS part
+        FROM taken t
+        JOIN {SCHEMA}.inventory_levels l ON l.part_id = t.part_id
+        WHERE NOT EXISTS (SELECT 1 FROM taken WHERE stock_left IS NULL)
+    ),
+    used AS (
+        INSERT INTO {SCHEMA}.job_parts_used (job_id, part_id, quantity_used, unit_price_at_time)
+        SELECT %(job_id)s, part_id, quantity, unit_price
+        FROM stock
+        ORDER BY part_id
+        RETURNING *
+    ),
+    movement AS (
+        INSERT INTO {SCHEMA}.stock_movements
+            (part_id, movement_type, quantity, balance_after, job_id, job_part_id)
+        SELECT used.part_id, 'consumption', -used.quantity_used, stock.stock_left,
+               used.job_id, used.job_part_id
+        FROM used
+        JOIN stock ON stock.part_id = used.part_id
+    )
+    SELECT t.part_id, t.quantity, t.stock_left, used.job_part_id, stock.part
+    FROM taken t
+    LEFT JOIN used ON used.part_id = t.part_id
+    LEFT JOIN stock ON stock.part_id = t.part_id
+    ORDER BY t.part_id
+"""
+
+# Shop-floor "use part for vehicle" in one statement: plate (owned by the
+# customer) -> vehicle -> its newest In Progress job, then the part and its
+# stock, and only when all of them check out take the stock and record
+# the usage and the movement. The single row returned tells which step
+# failed.
+USE_FOR_VEHICLE_QUERY = f"""
+    WITH vehicle AS (
+        SELECT v.vehicle_id, v.plate_no, c.customer_id, c.name AS customer_name
+        FROM {SCHEMA}.vehicles v
+        JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+        WHERE LOWER(v.plate_no) = LOWER(%(plate_no)s) AND c.customer_id = %(customer_id)s
+    ),
+    job AS (
+        SELECT sj.job_id, sr.service_type, vehicle.customer_id, vehicle.customer_name, vehicle.plate_no
+        FROM vehicle
+        JOIN {SCHEMA}.service_requests sr ON sr.vehicle_id = vehicle.vehicle_id
+        JOIN {SCHEMA}.service_jobs sj ON sj.request_id = sr.request_id
+        WHERE sj.job_status = 'In Progress'
+        ORDER BY sj.start_time DESC
+        LIMIT 1
+    ),
+    part AS (
+        SELECT part_id, quantity_in_stock
+        FROM {SCHEMA}.inventory_levels
+        WHERE part_id = %(part_id)s
+    ),
+    taken AS MATERIALIZED (
+        SELECT {SCHEMA}.take_stock(part.part_id, %(quantity)s) AS stock_left
+        FROM job, part
+        WHERE part.quantity_in_stock >= %(quantity)s
+    ),
+    stock AS (
+        SELECT l.part_id, l.part_name, l.part_code, l.brand, l.unit_price,
+               taken.stock_left AS quantity_in_stock,
+               to_jsonb(l) || jsonb_build_object('quantity_in_stock', taken.stock_left) AS part
+        FROM {SCHEMA}.inventory_levels l, taken
+        WHERE l.part_id = %(part_id)s AND taken.stock_left IS NOT NULL
+    ),
+    used AS (
+        INSERT INTO {SCHEMA}.job_parts_used (job_id, part_id, quantity_used, unit_price_at_time)
+        SELECT job.job_id, stock.part_id, %(quantity)s, stock.unit_price
+        FROM job, stock
+        RETURNING *
+    ),
+    movement AS (
+        INSERT INTO {SCHEMA}.stock_movements
+            (part_id, movement_type, quantity, balance_after, job_id, job_part_id)
+        SELECT used.part_id, 'consumption', -used.quantity_used, stock.quantity_in_stock,
+               used.job_id, used.job_part_id
+        FROM used, stock
+    )
+    SELECT EXISTS (SELECT 1 FROM vehicle) AS vehicle_found,
+           job.job_id, job.service_type, job.customer_id, job.customer_name, job.plate_no,
+           EXISTS (SELECT 1 FROM part) AS part_found,
+           (SELECT quantity_in_stock FROM part) AS available,
+           used.job_part_id, used.quantity_used, used.unit_price_at_time, used.part_id,
+           stock.part_name, stock.part_code, stock.brand, stock.part
+    FROM (SELECT 1) AS one
+    LEFT JOIN job ON TRUE
+    LEFT JOIN used ON TRUE
+    LEFT JOIN stock ON TRUE
+"""
+
+# Largest bill of materials one batch call may add
+MAX_BATCH_PARTS = 100
+
 
 def get_parts_for_job(job_id):
     """Get all parts used in a specific job."""
@@ -95,92 +264,199 @@ def verify_vehicle_ownership(plate_no, customer_id):
 def add_part_to_job(job_id, part_id, quantity_used):
     """
     Add a part to a job and update inventory.
-    Uses a transaction to ensure both operations succeed or fail together.
+
+    One statement takes the stock (only while enough is left), records the
+    usage and appends a 'consumption' movement, so concurrent requests for
+    the same part can never take its stock below zero.
     """
     from psycopg.rows import dict_row
     
     with get_db_connection() as conn:
         with conn.cursor(row_factory=dict_row) as cur:
-            # Get current unit price from inventory
-            cur.execute(f"""
-                SELECT unit_price, quantity_in_stock 
-                FROM {SCHEMA}.inventory WHERE part_id = %s
-            """, (part_id,))
-            part = cur.fetchone()
+            cur.execute(ADD_PART_QUERY, {'job_id': job_id, 'part_id': part_id, 'quantity': quantity_used})
+            row = cur.fetchone()
             
-            if not part:
-                return None, "Part not found"
+            if not row:
+                cur.execute(f"SELECT quantity_in_stock FROM {SCHEMA}.inventory_levels WHERE part_id = %s", (part_id,))
+                part = cur.fetchone()
+                if not part:
+                    return None, "Part not found"
+                return None, f"Insufficient stock. Available: {part['quantity_in_stock']}, Requested: {quantity_used}"
             
-            unit_price = part['unit_price']
-            current_stock = part['quantity_in_stock']
+            row = dict(row)
+            updated_part = row.pop('part')
+            new_stock, reorder_level = updated_part['quantity_in_stock'], updated_part['reorder_level']
+            apply_counter_deltas(cur, low_stock_items=low_stock_delta(
+                new_stock + quantity_used, reorder_level, new_stock, reorder_level
+            ))
+            publish(cur, 'job_part.added', job_id=job_id, job_part_id=row['job_part_id'], part_id=part_id,
+                    quantity_used=quantity_used, quantity_in_stock=new_stock,
+                    low_stock=is_low_stock(new_stock, reorder_level))
             
-            # Check if enough stock
-            if current_stock < quantity_used:
-                return None, f"Insufficient stock. Available: {current_stock}, Requested: {quantity_used}"
+            conn.commit()
+            invalidate_stats()
+            cache_item(updated_part)
+            return row, None
+
+
+def add_part_for_vehicle(plate_no, customer_id, part_id, quantity_used):
+    """
+    Add a part to the active job of a customer's vehicle, found by plate
+    number, in one round trip (see USE_FOR_VEHICLE_QUERY).
+
+    Returns:
+        (result, None, 201) with result = {'job', 'job_part'}, or
+        (None, error message, HTTP status) naming the step that failed
+    """
+    from psycopg.rows import dict_row
+    
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(USE_FOR_VEHICLE_QUERY, {
+                'plate_no': plate_no,
+                'customer_id': customer_id,
+                'part_id': part_id,
+                'quantity': quantity_used
+            })
+            row = cur.fetchone()
             
-            # Insert into job_parts_used
-            cur.execute(f"""
-                INSERT INTO {SCHEMA}.job_parts_used (job_id, part_id, quantity_used, unit_price_at_time)
-                VALUES (%s, %s, %s, %s)
-                RETURNING job_part_id
-            """, (job_id, part_id, quantity_used, unit_price))
-            job_part_id = cur.fetchone()['job_part_id']
+            if not row['vehicle_found']:
+                return None, (f'Vehicle with plate "{plate_no}" does not belong to customer_id '
+                              f'{customer_id}, or does not exist.'), 404
+            if row['job_id'] is None:
+                return None, f'No active job found for vehicle "{plate_no}". Create a service request first.', 404
+            if not row['part_found']:
+                return None, 'Part not found', 404
+            if row['job_part_id'] is None:
+                return None, f"Insufficient stock. Available: {row['available']}, Requested: {quantity_used}", 400
             
-            # Update inventory quantity
-            cur.execute(f"""
-                UPDATE {SCHEMA}.inventory
-                SET quantity_in_stock = quantity_in_stock - %s, last_updated = CURRENT_TIMESTAMP
-                WHERE part_id = %s
-            """, (quantity_used, part_id))
+            updated_part = row['part']
+            new_stock, reorder_level = updated_part['quantity_in_stock'], updated_part['reorder_level']
+            apply_counter_deltas(cur, low_stock_items=low_stock_delta(
+                new_stock + quantity_used, reorder_level, new_stock, reorder_level
+            ))
+            publish(cur, 'job_part.added', job_id=row['job_id'], job_part_id=row['job_part_id'],
+                    part_id=part_id, quantity_used=quantity_used, quantity_in_stock=new_stock,
+                    low_stock=is_low_stock(new_stock, reorder_level))
             
             conn.commit()
+    
+    invalidate_stats()
+    cache_item(updated_part)
+    job = {key: row[key] for key in ('job_id', 'service_type', 'customer_id', 'customer_name', 'plate_no')}
+    job_part = {key: row[key] for key in ('job_part_id', 'quantity_used', 'unit_price_at_time', 'job_id',
+                                          'part_id', 'part_name', 'part_code', 'brand')}
+    return {'job': job, 'job_part': job_part}, None, 201
+
+
+def add_parts_to_job(job_id, parts):
+    """
+    Add a bill of materials to a job in one transaction, all or nothing.
+    Quantities of a part listed more than once are added up.
+
+    Args:
+        parts: [(part_id, quantity_used)]
+
+    Returns:
+        (result, None) with result = {'parts': every part now on the job,
+        'total_cost': their total}, or (None, errors) with one
+        {'part_id', 'error', 'requested', 'available'} per missing or short
+        part (available is None for a missing part)
+    """
+    from psycopg.rows import dict_row
+    
+    quantities = {}
+    for part_id, quantity_used in parts:
+        quantities[part_id] = quantities.get(part_id, 0) + quantity_used
+    part_ids = sorted(quantities)
+    
+    with get_db_connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(ADD_PARTS_BATCH_QUERY, {
+                'job_id': job_id,
+                'part_ids': part_ids,
+                'quantities': [quantities[part_id] for part_id in part_ids]
+            })
+            rows = [dict(row) for row in cur.fetchall()]
+            
+            failed = [row['part_id'] for row in rows if row['stock_left'] is None]
+            if failed:
+                conn.rollback()
+                cur.execute(f"""
+                    SELECT part_id, quantity_in_stock FROM {SCHEMA}.inventory_levels
+                    WHERE part_id = ANY(%s)
+                """, (failed,))
+                available = {row['part_id']: row['quantity_in_stock'] for row in cur.fetchall()}
+                return None, [
+                    {
+                        'part_id': part_id,
+                        'error': 'Insufficient stock' if part_id in available else 'Part not found',
+                        'requested': quantities[part_id],
+                        'available': available.get(part_id)
+                    }
+                    for part_id in failed
+                ]
+            
+            low_stock = 0
+            for row in rows:
+                part = row['part']
+                low_stock += low_stock_delta(row['stock_left'] + row['quantity'], part['reorder_level'],
+                                             row['stock_left'], part['reorder_level'])
+                publish(cur, 'job_part.added', job_id=job_id, job_part_id=row['job_part_id'],
+                        part_id=row['part_id'], quantity_used=row['quantity'],
+                        quantity_in_stock=row['stock_left'],
+                        low_stock=is_low_stock(row['stock_left'], part['reorder_level']))
+            apply_counter_deltas(cur, low_stock_items=low_stock)
             
-            # Fetch the created record with part details
             cur.execute(f"""
                 SELECT jpu.*, i.part_name, i.part_code, i.brand
                 FROM {SCHEMA}.job_parts_used jpu
                 JOIN {SCHEMA}.inventory i ON jpu.part_id = i.part_id
-                WHERE jpu.job_part_id = %s
-            """, (job_part_id,))
+                WHERE jpu.job_id = %s
+                ORDER BY jpu.job_part_id
+            """, (job_id,))
+            job_parts = [dict(row) for row in cur.fetchall()]
             
-            row = cur.fetchone()
-            if row:
-                return dict(row), None
-            
-            return None, "Failed to retrieve created record"
+            conn.commit()
+    
+    invalidate_stats()
+    for row in rows:
+        cache_item(row['part'])
+    return {
+        'parts': job_parts,
+        'total_cost': float(sum(p['quantity_used'] * p['unit_price_at_time'] for p in job_parts))
+    }, None
 
 
 def remove_part_from_job(job_part_id):
     """
-    Remove a part from a job and restore inventory.
+    Remove a part from a job and restore inventory, appending a 'return'
+    movement in the same statement.
     """
+    from psycopg.rows import dict_row
+    
     with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            # Get the part usage details first
-            cur.execute(f"""
-                SELECT part_id, quantity_used 
-                FROM {SCHEMA}.job_parts_used WHERE job_part_id = %s
-            """, (job_part_id,))
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(REMOVE_PART_QUERY, (job_part_id,))
             usage = cur.fetchone()
             
             if not usage:
                 return False, "Part usage record not found"
             
-            part_id, quantity_used = usage
-            
-            # Delete the usage record
-            cur.execute(f"""
-                DELETE FROM {SCHEMA}.job_parts_used WHERE job_part_id = %s
-            """, (job_part_id,))
+            part_id, quantity_used = usage['part_id'], usage['quantity_used']
+            restored = usage['part']
             
-            # Restore inventory
-            cur.execute(f"""
-                UPDATE {SCHEMA}.inventory
-                SET quantity_in_stock = quantity_in_stock + %s, last_updated = CURRENT_TIMESTAMP
-                WHERE part_id = %s
-            """, (quantity_used, part_id))
+            if restored:
+                new_quantity, reorder_level = restored['quantity_in_stock'], restored['reorder_level']
+                apply_counter_deltas(cur, low_stock_items=low_stock_delta(
+                    new_quantity - quantity_used, reorder_level, new_quantity, reorder_level
+                ))
+            publish(cur, 'job_part.removed', job_part_id=job_part_id, part_id=part_id,
+                    quantity_used=quantity_used)
             
             conn.commit()
+            invalidate_stats()
+            cache_item(restored)
             return True, None
 
 
@@ -204,7 +480,5 @@ def job_exists(job_id):
 
 
 def part_exists(part_id):
-    """Check if a part exists."""
-    with get_db_cursor() as cur:
-        cur.execute(f"SELECT 1 FROM {SCHEMA}.inventory WHERE part_id = %s", (part_id,))
-        return cur.fetchone() is not None
+    """Check if a part exists (from the inventory catalog cache)."""
+    return _catalog_part_exists(part_id)
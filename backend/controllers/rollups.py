@@ -0,0 +1,209 @@
+"""
+Rollups controller - Daily revenue and workload rollups for dashboard analytics.
+
+daily_rollups holds one row per calendar day. It is filled by the end-of-day
+job (rollup_daily.py), which scans the raw billing/job rows once per day so
+the timeseries endpoint only ever reads the rollup table.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from db.connection import get_db_cursor
+
+SCHEMA = 'vehicle_service'
+
+GRANULARITIES = ('day', 'week', 'month')
+
+ROLLUP_FIELDS = (
+    'revenue_paid',
+    'revenue_unpaid',
+    'revenue_billed',
+    'bills_issued',
+    'jobs_opened',
+    'jobs_completed',
+    'parts_quantity',
+    'parts_value'
+)
+
+# Rolls up every day in [start, end] in one set-based statement.
+# revenue_paid is counted on the payment day; revenue_unpaid is the part of
+# the day's bills still unpaid at the end of that day, so a day's row does
+# not change when its bills are paid later.
+ROLLUP_QUERY = f"""
+    WITH days AS (
+        SELECT d::date AS day
+        FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') d
+    ),
+    issued AS (
+        SELECT bill_date AS day,
+               COUNT(*) AS bills_issued,
+               SUM(total_amount) AS revenue_billed,
+               SUM(total_amount) FILTER (
+                   WHERE payment_date IS NULL OR payment_date >= bill_date + 1
+               ) AS revenue_unpaid
+        FROM {SCHEMA}.billing
+        WHERE bill_date BETWEEN %(start)s AND %(end)s
+        GROUP BY bill_date
+    ),
+    paid AS (
+        SELECT payment_date::date AS day, SUM(total_amount) AS revenue_paid
+        FROM {SCHEMA}.billing
+        WHERE payment_status = 'Paid'
+          AND payment_date >= %(start)s AND payment_date < %(end)s::date + 1
+        GROUP BY payment_date::date
+    ),
+    opened AS (
+        SELECT start_time::date AS day, COUNT(*) AS jobs_opened
+        FROM {SCHEMA}.service_jobs
+        WHERE start_time >= %(start)s AND start_time < %(end)s::date + 1
+        GROUP BY start_time::date
+    ),
+    completed AS (
+        SELECT end_time::date AS day, COUNT(*) AS jobs_completed
+        FROM {SCHEMA}.service_jobs
+        WHERE job_status = 'Completed'
+          AND end_time >= %(start)s AND end_time < %(end)s::date + 1
+        GROUP BY end_time::date
+    ),
+    parts AS (
+        -- Rows recorded before used_at existed fall back to the job start
+        SELECT COALESCE(jpu.used_at, sj.start_time)::date AS day,
+               SUM(jpu.quantity_used) AS parts_quantity,
+               SUM(jpu.quantity_used * jpu.unit_price_at_time) AS parts_value
+        FROM {SCHEMA}.job_parts_used jpu
+        LEFT JOIN {SCHEMA}.service_jobs sj ON jpu.job_id = sj.job_id
+        WHERE (jpu.used_at >= %(start)s AND jpu.used_at < %(end)s::date + 1)
+           OR (jpu.used_at IS NULL
+               AND sj.start_time >= %(start)s AND sj.start_time < %(end)s::date + 1)
+        GROUP BY COALESCE(jpu.used_at, sj.start_time)::date
+    )
+    INSERT INTO {SCHEMA}.daily_rollups
+        (day, revenue_paid, revenue_unpaid, revenue_billed, bills_issued,
+         jobs_opened, jobs_completed, parts_quantity, parts_value, rolled_up_at)
+    SELECT days.day,
+           COALESCE(paid.revenue_paid, 0),
+           COALESCE(issued.revenue_unpaid, 0),
+           COALESCE(issued.revenue_billed, 0),
+           COALESCE(issued.bills_issued, 0),
+           COALESCE(opened.jobs_opened, 0),
+           COALESCE(completed.jobs_completed, 0),
+           COALESCE(parts.parts_quantity, 0),
+           COALESCE(parts.parts_value, 0),
+           CURRENT_TIMESTAMP
+    FROM days
+    LEFT JOIN issued ON issued.day = days.day
+    LEFT JOIN paid ON paid.day = days.day
+    LEFT JOIN opened ON opened.day = days.day
+    LEFT JOIN completed ON completed.day = days.day
+    LEFT JOIN parts ON parts.day = days.day
+    ON CONFLICT (day) DO UPDATE SET
+        revenue_paid = EXCLUDED.revenue_paid,
+        revenue_unpaid = EXCLUDED.revenue_unpaid,
+        revenue_billed = EXCLUDED.revenue_billed,
+        bills_issued = EXCLUDED.bills_issued,
+        jobs_opened = EXCLUDED.jobs_opened,
+        jobs_completed = EXCLUDED.jobs_completed,
+        parts_quantity = EXCLUDED.parts_quantity,
+        parts_value = EXCLUDED.parts_value,
+        rolled_up_at = EXCLUDED.rolled_up_at
+"""
+
+
+def _serialize_period(row):
+    """Convert a rollup row to JSON-serializable values."""
+    period = dict(row)
+    for key, value in period.items():
+        if isinstance(value, Decimal):
+            period[key] = float(value)
+        elif isinstance(value, date):
+            period[key] = value.isoformat()
+    return period
+
+
+def rollup_range(start, end, batch_days=31):
+    """
+    Recompute the rollups for every day in [start, end] (inclusive).
+    Work is committed in batches of batch_days so a long backfill does not
+    hold one huge transaction.
+
+    Returns:
+        Number of days rolled up
+    """
+    if start > end:
+        return 0
+
+    total = 0
+    batch_start = start
+    while batch_start <= end:
+        batch_end = min(batch_start + timedelta(days=batch_days - 1), end)
+        with get_db_cursor() as cur:
+            cur.execute(ROLLUP_QUERY, {'start': batch_start, 'end': batch_end})
+        total += (batch_end - batch_start).days + 1
+        batch_start = batch_end + timedelta(days=1)
+    return total
+
+
+def get_rolled_through():
+    """Get the most recent day present in daily_rollups, or None."""
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT MAX(day) AS day FROM {SCHEMA}.daily_rollups")
+        row = cur.fetchone()
+        return row['day'] if row else None
+
+
+def get_first_activity_date():
+    """Get the earliest date with any billing or job activity, or None."""
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT LEAST(
+                (SELECT MIN(bill_date) FROM {SCHEMA}.billing),
+                (SELECT MIN(start_time)::date FROM {SCHEMA}.service_jobs)
+            ) AS day
+        """)
+        row = cur.fetchone()
+        return row['day'] if row else None
+
+
+def run_incremental(through=None, lookback_days=0):
+    """
+    End-of-day job: roll up every day after the last rolled-up day
+    through `through` (default: yesterday).
+
+    Args:
+        through: Last day to roll up
+        lookback_days: Also re-roll this many already rolled-up days,
+                       to pick up late edits to recent rows
+
+    Returns:
+        dict with the rolled 'start', 'end' and number of 'days'
+    """
+    if through is None:
+        through = date.today() - timedelta(days=1)
+
+    rolled_through = get_rolled_through()
+    if rolled_through is None:
+        start = get_first_activity_date() or through
+    else:
+        start = rolled_through + timedelta(days=1 - lookback_days)
+
+    days = rollup_range(start, through)
+    return {'start': start, 'end': through, 'days': days}
+
+
+def get_timeseries(date_from, date_to, granularity='day'):
+    """
+    Get rollup totals between date_from and date_to grouped by granularity.
+    Reads only the daily_rollups table.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+
+    sums = ', '.join(f"SUM({name}) AS {name}" for name in ROLLUP_FIELDS)
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT date_trunc(%s, day)::date AS period, {sums}
+            FROM {SCHEMA}.daily_rollups
+            WHERE day BETWEEN %s AND %s
+            GROUP BY 1
+            ORDER BY 1
+        """, (granularity, date_from, date_to))
+        return [_serialize_period(row) for row in cur.fetchall()]
@@ -0,0 +1,79 @@
+"""
+Search controller - Global search over the search_index table.
+
+search_index holds one row per customer, vehicle, service request, part and
+bill, kept current by row-level triggers (see database/schema.sql). A query
+matches on word prefixes through the tsvector index and on substrings
+(partial phones, plates, codes) through the trigram index.
+"""
+import re
+import psycopg
+from config import Config
+from db.connection import get_db_cursor
+from db.listing import escape_like
+
+SCHEMA = 'vehicle_service'
+
+ENTITY_TYPES = ('customer', 'vehicle', 'request', 'part', 'bill')
+
+MAX_LIMIT = 50
+
+
+def _prefix_tsquery(q):
+    """Turn free text into a prefix tsquery string ('brake pad' -> 'brake:* & pad:*')."""
+    terms = re.findall(r'\w+', q.lower())
+    return ' & '.join(f"{term}:*" for term in terms)
+
+
+def search(q, types=None, limit=20):
+    """
+    Search every indexed entity and return ranked, typed hits.
+    The query runs under Config.SEARCH_TIMEOUT_MS; when the budget is
+    exceeded an empty, timed-out result is returned instead of waiting.
+
+    Args:
+        q: Free-text query
+        types: Optional list of entity types to search (see ENTITY_TYPES)
+        limit: Maximum number of hits (capped at MAX_LIMIT)
+
+    Returns:
+        dict with 'hits' (type, id, title, subtitle, score) and 'timed_out'
+
+    Raises:
+        ValueError: Unknown entity type
+    """
+    types = list(types or ENTITY_TYPES)
+    unknown = [name for name in types if name not in ENTITY_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown type(s): {', '.join(unknown)}. Allowed: {', '.join(ENTITY_TYPES)}")
+
+    q = (q or '').strip()
+    tsquery = _prefix_tsquery(q)
+    if not tsquery:
+        return {'hits': [], 'timed_out': False}
+
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    like = '%' + escape_like(q) + '%'
+
+    try:
+        with get_db_cursor() as cur:
+            cur.execute("SELECT set_config('statement_timeout', %s, true)",
+                        (str(Config.SEARCH_TIMEOUT_MS),))
+            cur.execute(f"""
+                SELECT entity_type AS type, entity_id AS id, title, subtitle,
+                       ts_rank(document, to_tsquery('simple', %(tsquery)s))
+                         + similarity(search_text, %(q)s) AS score
+                FROM {SCHEMA}.search_index
+                WHERE entity_type = ANY(%(types)s)
+                  AND (document @@ to_tsquery('simple', %(tsquery)s)
+                       OR search_text ILIKE %(like)s)
+                ORDER BY score DESC, entity_type, entity_id DESC
+                LIMIT %(limit)s
+            """, {'tsquery': tsquery, 'q': q, 'types': types, 'like': like, 'limit': limit})
+            hits = [dict(row) for row in cur.fetchall()]
+    except psycopg.errors.QueryCanceled:
+        return {'hits': [], 'timed_out': True}
+
+    for hit in hits:
+        hit['score'] = round(float(hit['score']), 4)
+    return {'hits': hits, 'timed_out': False}
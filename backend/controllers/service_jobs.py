@@ -2,10 +2,92 @@
 Service Jobs controller - Raw SQL operations for service job management.
 """
 from db.connection import get_db_cursor, execute_returning
-from datetime import datetime
+from db.listing import ListingSpec, fetch_listing
+from controllers.tasks import enqueue_job_completed
+from controllers.status_history import transition_guard, transition_error
+from datetime import date, datetime
 
 SCHEMA = 'vehicle_service'
 
+# Columns and relations available to ?fields= / ?expand= on the listing route
+JOB_LISTING = ListingSpec(
+    from_clause=f"{SCHEMA}.service_jobs sj",
+    key='job_id',
+    columns={
+        'job_id': 'sj.job_id',
+        'request_id': 'sj.request_id',
+        'employee_id': 'sj.employee_id',
+        'start_time': 'sj.start_time',
+        'end_time': 'sj.end_time',
+        'labor_charge': 'sj.labor_charge',
+        'job_status': 'sj.job_status'
+    },
+    relations={
+        'employee': {
+            'join': f"LEFT JOIN {SCHEMA}.employees e ON sj.employee_id = e.id",
+            'columns': {
+                'employee_name': 'e.name',
+                'employee_position': 'e.position'
+            }
+        },
+        'request': {
+            'join': f"LEFT JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id",
+            'columns': {
+                'service_type': 'sr.service_type',
+                'problem_note': 'sr.problem_note',
+                'priority': 'sr.priority',
+                'request_status': 'sr.status'
+            }
+        },
+        'vehicle': {
+            'join': f"LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id",
+            'requires': ('request',),
+            'columns': {
+                'plate_no': 'v.plate_no',
+                'brand': 'v.brand',
+                'model': 'v.model',
+                'year': 'v.year'
+            }
+        },
+        'customer': {
+            'join': f"LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id",
+            'requires': ('vehicle',),
+            'columns': {
+                'customer_name': 'c.name',
+                'customer_phone': 'c.phone'
+            }
+        }
+    },
+    default_order='sj.start_time DESC NULLS LAST, sj.job_id DESC',
+    filters={
+        'status': {'where': "sj.job_status = ANY(%s)", 'multi': True},
+        'employee_id': {'where': "sj.employee_id = %s", 'type': int},
+        'request_id': {'where': "sj.request_id = %s", 'type': int},
+        'date_from': {'where': "sj.start_time >= %s", 'type': date},
+        'date_to': {'where': "sj.start_time < %s::date + 1", 'type': date},
+        'priority': {'where': "sr.priority = ANY(%s)", 'multi': True, 'requires': ('request',)},
+        'service_type': {'where': "sr.service_type = ANY(%s)", 'multi': True, 'requires': ('request',)},
+        'vehicle_id': {'where': "sr.vehicle_id = %s", 'type': int, 'requires': ('request',)},
+        'customer_id': {'where': "v.customer_id = %s", 'type': int, 'requires': ('vehicle',)},
+        'pending_billing': {
+            'where': f"""(sj.job_status = 'Completed'
+                         AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.billing b WHERE b.job_id = sj.job_id))""",
+            'type': bool
+        },
+        'search': {
+            'where': "(c.name ILIKE %s OR v.plate_no ILIKE %s OR sr.service_type ILIKE %s)",
+            'pattern': True,
+            'requires': ('customer',)
+        }
+    },
+    facets={
+        'status': 'job_status',
+        'priority': 'priority',
+        'service_type': 'service_type',
+        'employee_id': 'employee_id'
+    }
+)
+
 
 def get_all_jobs():
     """Get all service jobs with employee and vehicle info."""
@@ -26,6 +108,112 @@ def get_all_jobs():
         return [dict(row) for row in cur.fetchall()]
 
 
+def list_jobs(fields=None, expand=None, filters=None, sort=None, facets=None):
+    """
+    List service jobs selecting only the requested fields / relations.
+    Every filter present in `filters` (see JOB_LISTING) is combined with AND
+    in one query. Without fields or expand, every relation is included.
+    
+    Counts for the requested facets (see JOB_LISTING.facets) are computed
+    under the same filters and snapshot as the rows.
+    
+    Returns:
+        (rows, facet_counts)
+    
+    Raises:
+        ValueError: Unknown field, expand, sort or facet name, or a bad filter value
+    """
+    if not fields and not expand:
+        expand = list(JOB_LISTING.relations)
+    
+    with get_db_cursor() as cur:
+        return fetch_listing(cur, JOB_LISTING, fields=fields, expand=expand,
+                             filters=filters, sort=sort, facets=facets)
+
+
+# Job board columns, in display order; every job falls in at most one
+BOARD_COLUMNS = ('in_progress', 'pending_billing', 'completed')
+
+# Top N jobs per board column, each read in index order (see
+# database/schema.sql, section 19) and stopped at the limit. Only the
+# selected rows are joined to their details.
+JOB_BOARD_QUERY = f"""
+    WITH in_progress AS (
+        SELECT sj.job_id, sj.start_time AS board_time
+        FROM {SCHEMA}.service_jobs sj
+        WHERE sj.job_status = 'In Progress'
+        ORDER BY sj.start_time DESC NULLS LAST, sj.job_id DESC
+        LIMIT %(limit)s
+    ),
+    pending_billing AS (
+        SELECT sj.job_id, sj.end_time AS board_time
+        FROM {SCHEMA}.service_jobs sj
+        WHERE sj.job_status = 'Completed'
+          AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.billing b WHERE b.job_id = sj.job_id)
+        ORDER BY sj.end_time DESC NULLS LAST, sj.job_id DESC
+        LIMIT %(limit)s
+    ),
+    completed AS (
+        SELECT sj.job_id, sj.end_time AS board_time
+        FROM {SCHEMA}.service_jobs sj
+        WHERE sj.job_status = 'Completed'
+          AND EXISTS (SELECT 1 FROM {SCHEMA}.billing b WHERE b.job_id = sj.job_id)
+        ORDER BY sj.end_time DESC NULLS LAST, sj.job_id DESC
+        LIMIT %(limit)s
+    ),
+    board AS (
+        SELECT 'in_progress' AS board_column, job_id, board_time FROM in_progress
+        UNION ALL
+        SELECT 'pending_billing', job_id, board_time FROM pending_billing
+        UNION ALL
+        SELECT 'completed', job_id, board_time FROM completed
+    )
+    SELECT b.board_column,
+           sj.*,
+           e.name AS employee_name,
+           sr.service_type, sr.priority, sr.status AS request_status,
+           v.plate_no, v.brand, v.model,
+           c.name AS customer_name, c.phone AS customer_phone
+    FROM board b
+    JOIN {SCHEMA}.service_jobs sj ON sj.job_id = b.job_id
+    LEFT JOIN {SCHEMA}.employees e ON sj.employee_id = e.id
+    LEFT JOIN {SCHEMA}.service_requests sr ON sj.request_id = sr.request_id
+    LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
+    LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+    ORDER BY b.board_column, b.board_time DESC NULLS LAST, b.job_id DESC
+"""
+
+# Exact per-column totals: index-only counts, completed jobs split by
+# whether they have a bill (at most one per job)
+JOB_BOARD_COUNTS_QUERY = f"""
+    SELECT (SELECT COUNT(*) FROM {SCHEMA}.service_jobs WHERE job_status = 'In Progress') AS in_progress,
+           COUNT(*) FILTER (WHERE b.job_id IS NULL) AS pending_billing,
+           COUNT(b.job_id) AS completed
+    FROM {SCHEMA}.service_jobs sj
+    LEFT JOIN {SCHEMA}.billing b ON b.job_id = sj.job_id
+    WHERE sj.job_status = 'Completed'
+"""
+
+
+def get_job_board(limit=20):
+    """
+    Get the job board: the newest `limit` jobs of each column
+    (in_progress, pending_billing, completed) and each column's total.
+    
+    Returns:
+        {column: {'count': total, 'jobs': [...]}} for every column in BOARD_COLUMNS
+    """
+    with get_db_cursor() as cur:
+        cur.execute(JOB_BOARD_COUNTS_QUERY)
+        counts = cur.fetchone()
+        board = {column: {'count': int(counts[column]), 'jobs': []} for column in BOARD_COLUMNS}
+        cur.execute(JOB_BOARD_QUERY, {'limit': limit})
+        for row in cur.fetchall():
+            job = dict(row)
+            board[job.pop('board_column')]['jobs'].append(job)
+    return board
+
+
 def get_job_by_id(job_id):
     """Get a single job with full details."""
     with get_db_cursor() as cur:
@@ -71,17 +259,31 @@ def assign_employee(job_id, employee_id):
 
 
 def update_job_status(job_id, status, end_time=None):
-    """Update the status of a job."""
+    """
+    Update the status of a job.
+    Completing a job queues its follow-up work (bill, employee stats, stock check).
+    
+    Raises:
+        InvalidTransition: The job's current status may not change to `status`
+    """
     if status == 'Completed' and end_time is None:
         end_time = datetime.now()
     
-    query = f"""
-        UPDATE {SCHEMA}.service_jobs
-        SET job_status = %s, end_time = %s
-        WHERE job_id = %s
-        RETURNING *
-    """
-    result = execute_returning(query, (status, end_time, job_id))
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.service_jobs
+            SET job_status = %s, end_time = %s
+            WHERE job_id = %s AND {transition_guard('job', 'job_status')}
+            RETURNING *
+        """, (status, end_time, job_id, status))
+        result = cur.fetchone()
+        if not result:
+            error = transition_error(cur, 'job', job_id, status)
+            if error:
+                raise error
+        if result and status == 'Completed':
+            enqueue_job_completed(cur, job_id)
+    
     return dict(result) if result else None
 
 
@@ -1,11 +1,231 @@
 """
 Service Requests controller - Raw SQL operations for service request management.
 """
-from db.connection import get_db_cursor, execute_returning
-from datetime import date
+from db.connection import get_db_cursor
+from db.listing import ListingSpec, fetch_listing
+from controllers.dashboard import apply_counter_deltas, request_status_deltas, bill_deltas, invalidate_stats
+from controllers.tasks import enqueue_job_completed
+from controllers.assignment import pick_technician
+from controllers.status_history import transition_guard, transition_error
+from utils.events import publish
+from datetime import date, datetime
 
 SCHEMA = 'vehicle_service'
 
+# Columns and relations available to ?fields= / ?expand= on the listing route
+REQUEST_LISTING = ListingSpec(
+    from_clause=f"{SCHEMA}.service_requests sr",
+    key='request_id',
+    columns={
+        'request_id': 'sr.request_id',
+        'request_date': 'sr.request_date',
+        'service_type': 'sr.service_type',
+        'problem_note': 'sr.problem_note',
+        'status': 'sr.status',
+        'priority': 'sr.priority',
+        'vehicle_id': 'sr.vehicle_id'
+    },
+    relations={
+        'vehicle': {
+            'join': f"LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id",
+            'columns': {
+                'plate_no': 'v.plate_no',
+                'vehicle_brand': 'v.brand',
+                'vehicle_model': 'v.model',
+                'vehicle_year': 'v.year',
+                'vehicle_color': 'v.color'
+            }
+        },
+        'customer': {
+            'join': f"LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id",
+            'requires': ('vehicle',),
+            'columns': {
+                'customer_id': 'c.customer_id',
+                'customer_name': 'c.name',
+                'customer_phone': 'c.phone',
+                'customer_email': 'c.email',
+                'customer_address': 'c.address'
+            }
+        },
+        'job': {
+            'join': f"LEFT JOIN {SCHEMA}.service_jobs sj ON sr.request_id = sj.request_id",
+            'columns': {
+                'job_id': 'sj.job_id',
+                'job_status': 'sj.job_status',
+                'labor_charge': 'sj.labor_charge',
+                'assigned_employee_id': 'sj.employee_id'
+            }
+        },
+        'employee': {
+            'join': f"LEFT JOIN {SCHEMA}.employees e ON sj.employee_id = e.id",
+            'requires': ('job',),
+            'columns': {
+                'assigned_employee_name': 'e.name',
+                'assigned_employee_position': 'e.position'
+            }
+        }
+    },
+    default_order='sr.request_date DESC, sr.request_id DESC',
+    filters={
+        'status': {'where': "sr.status = ANY(%s)", 'multi': True},
+        'priority': {'where': "sr.priority = ANY(%s)", 'multi': True},
+        'service_type': {'where': "sr.service_type = ANY(%s)", 'multi': True},
+        'date_from': {'where': "sr.request_date >= %s", 'type': date},
+        'date_to': {'where': "sr.request_date <= %s", 'type': date},
+        'vehicle_id': {'where': "sr.vehicle_id = %s", 'type': int},
+        'customer_id': {'where': "v.customer_id = %s", 'type': int, 'requires': ('vehicle',)},
+        'employee_id': {'where': "sj.employee_id = %s", 'type': int, 'requires': ('job',)},
+        'search': {
+            'where': "(c.name ILIKE %s OR v.plate_no ILIKE %s OR sr.service_type ILIKE %s)",
+            'pattern': True,
+            'requires': ('customer',)
+        }
+    },
+    facets={
+        'status': 'status',
+        'priority': 'priority',
+        'service_type': 'service_type',
+        'employee_id': 'assigned_employee_id'
+    }
+)
+
+
+# Single request with vehicle and customer details
+REQUEST_DETAIL_QUERY = f"""
+    SELECT sr.*, 
+           v.plate_no, v.brand AS vehicle_brand, v.model AS vehicle_model, v.year AS vehicle_year, v.color AS vehicle_color,
+           c.customer_id, c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email, c.address AS customer_address
+    FROM {SCHEMA}.service_requests sr
+    LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
+    LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+    WHERE sr.request_id = %s
+"""
+
+# Walk-in intake in one statement. Customer (by phone) and vehicle (by plate)
+# are inserted or reused; the output columns come from the CTEs because rows
+# inserted by this statement are not visible to its own joins.
+WALK_IN_QUERY = f"""
+    WITH cust_new AS (
+        INSERT INTO {SCHEMA}.customers (name, phone, email, address)
+        VALUES (%(name)s, %(phone)s, %(email)s, %(address)s)
+        ON CONFLICT (phone) DO NOTHING
+        RETURNING customer_id, name, phone, email, address
+    ),
+    cust AS (
+        SELECT cust_new.*, TRUE AS created FROM cust_new
+        UNION ALL
+        SELECT customer_id, name, phone, email, address, FALSE
+        FROM {SCHEMA}.customers
+        WHERE phone = %(phone)s AND NOT EXISTS (SELECT 1 FROM cust_new)
+    ),
+    veh_new AS (
+        INSERT INTO {SCHEMA}.vehicles (plate_no, brand, model, year, color, customer_id)
+        SELECT %(plate_no)s, %(brand)s, %(model)s, %(year)s, %(color)s, cust.customer_id
+        FROM cust
+        ON CONFLICT (plate_no) DO NOTHING
+        RETURNING vehicle_id, plate_no, brand, model, year, color, customer_id
+    ),
+    veh AS (
+        SELECT veh_new.*, TRUE AS created FROM veh_new
+        UNION ALL
+        SELECT vehicle_id, plate_no, brand, model, year, color, customer_id, FALSE
+        FROM {SCHEMA}.vehicles
+        WHERE plate_no = %(plate_no)s AND NOT EXISTS (SELECT 1 FROM veh_new)
+    ),
+    req AS (
+        INSERT INTO {SCHEMA}.service_requests
+            (vehicle_id, service_type, problem_note, priority, status, request_date)
+        SELECT vehicle_id, %(service_type)s, %(problem_note)s, %(priority)s, %(status)s, CURRENT_DATE
+        FROM veh
+        RETURNING *
+    ),
+    job AS (
+        INSERT INTO {SCHEMA}.service_jobs
+            (request_id, employee_id, start_time, job_status, labor_charge)
+        SELECT request_id, %(employee_id)s, CURRENT_TIMESTAMP, 'In Progress', 0.00
+        FROM req
+        RETURNING job_id, job_status, employee_id
+    )
+    SELECT req.*,
+           veh.plate_no, veh.brand AS vehicle_brand, veh.model AS vehicle_model,
+           veh.year AS vehicle_year, veh.color AS vehicle_color,
+           cust.customer_id, cust.name AS customer_name, cust.phone AS customer_phone,
+           cust.email AS customer_email, cust.address AS customer_address,
+           job.job_id, job.job_status, job.employee_id,
+           cust.created AS customer_created, veh.created AS vehicle_created,
+           veh.customer_id AS vehicle_owner_id
+    FROM req
+    CROSS JOIN job
+    CROSS JOIN cust
+    CROSS JOIN veh
+"""
+
+# Columns complete_request() may change along with the status
+COMPLETION_FIELDS = ('service_type', 'problem_note', 'priority', 'vehicle_id')
+
+# Completes a request in one statement: flips its status, closes its latest
+# job with the labor charge and inserts the bill (parts + labor + tax).
+# The bill insert is skipped when the job already has one. Nothing changes
+# when the request's current status may not move to Completed.
+COMPLETE_REQUEST_QUERY = f"""
+    WITH old AS (
+        SELECT request_id, status AS old_status
+        FROM {SCHEMA}.service_requests
+        WHERE request_id = %(request_id)s
+        FOR UPDATE
+    ),
+    req AS (
+        UPDATE {SCHEMA}.service_requests sr
+        SET {{assignments}}
+        FROM old
+        WHERE sr.request_id = old.request_id
+          AND {transition_guard('request', 'old.old_status', "'Completed'")}
+        RETURNING sr.request_id, sr.status, old.old_status
+    ),
+    job AS (
+        SELECT sj.job_id
+        FROM {SCHEMA}.service_jobs sj
+        JOIN req ON sj.request_id = req.request_id
+        WHERE %(recomplete)s OR req.old_status IS DISTINCT FROM 'Completed'
+        ORDER BY sj.job_id DESC
+        LIMIT 1
+        FOR UPDATE OF sj
+    ),
+    closed AS (
+        UPDATE {SCHEMA}.service_jobs sj
+        SET labor_charge = %(labor_charge)s, job_status = 'Completed', end_time = %(end_time)s
+        FROM job
+        WHERE sj.job_id = job.job_id
+        RETURNING sj.job_id
+    ),
+    totals AS (
+        SELECT closed.job_id,
+               %(labor_charge)s::numeric AS subtotal_labor,
+               parts.subtotal_parts,
+               ROUND((%(labor_charge)s::numeric + parts.subtotal_parts) * %(tax_rate)s::numeric, 2) AS tax
+        FROM closed
+        CROSS JOIN (
+            SELECT COALESCE(SUM(jpu.quantity_used * jpu.unit_price_at_time), 0) AS subtotal_parts
+            FROM {SCHEMA}.job_parts_used jpu
+            JOIN job ON jpu.job_id = job.job_id
+        ) parts
+    ),
+    bill AS (
+        INSERT INTO {SCHEMA}.billing
+            (job_id, subtotal_labor, subtotal_parts, tax, total_amount, payment_status, bill_date)
+        SELECT job_id, subtotal_labor, subtotal_parts, tax,
+               subtotal_labor + subtotal_parts + tax, 'Unpaid', CURRENT_DATE
+        FROM totals
+        ON CONFLICT (job_id) DO NOTHING
+        RETURNING bill_id, total_amount, payment_status
+    )
+    SELECT req.request_id, req.status, req.old_status,
+           (SELECT job_id FROM closed) AS job_id,
+           bill.bill_id, bill.total_amount, bill.payment_status
+    FROM req
+    LEFT JOIN bill ON TRUE
+"""
+
 
 def get_all_requests():
     """Get all service requests with vehicle, customer, and assigned employee info."""
@@ -26,18 +246,34 @@ def get_all_requests():
         return [dict(row) for row in cur.fetchall()]
 
 
+def list_requests(fields=None, expand=None, filters=None, sort=None, facets=None):
+    """
+    List service requests selecting only the requested fields / relations.
+    Every filter present in `filters` (see REQUEST_LISTING) is combined with
+    AND in one query; joins are added only where needed. Without fields or
+    expand, every relation is included.
+    
+    Counts for the requested facets (see REQUEST_LISTING.facets) are computed
+    under the same filters and snapshot as the rows.
+    
+    Returns:
+        (rows, facet_counts)
+    
+    Raises:
+        ValueError: Unknown field, expand, sort or facet name, or a bad filter value
+    """
+    if not fields and not expand:
+        expand = list(REQUEST_LISTING.relations)
+    
+    with get_db_cursor() as cur:
+        return fetch_listing(cur, REQUEST_LISTING, fields=fields, expand=expand,
+                             filters=filters, sort=sort, facets=facets)
+
+
 def get_request_by_id(request_id):
     """Get a single service request with full details."""
     with get_db_cursor() as cur:
-        cur.execute(f"""
-            SELECT sr.*, 
-                   v.plate_no, v.brand AS vehicle_brand, v.model AS vehicle_model, v.year AS vehicle_year, v.color AS vehicle_color,
-                   c.customer_id, c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email, c.address AS customer_address
-            FROM {SCHEMA}.service_requests sr
-            LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
-            LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
-            WHERE sr.request_id = %s
-        """, (request_id,))
+        cur.execute(REQUEST_DETAIL_QUERY, (request_id,))
         row = cur.fetchone()
         return dict(row) if row else None
 
@@ -82,10 +318,13 @@ def get_requests_by_customer(customer_id):
         return [dict(row) for row in cur.fetchall()]
 
 
-def create_request(vehicle_id, service_type, problem_note=None, priority='Normal', status='Pending', assigned_employee_id=None):
+def create_request(vehicle_id, service_type, problem_note=None, priority='Normal', status='Pending', assigned_employee_id=None,
+                   auto_assign=False):
     """
     Create a new service request and automatically create a service job.
     TRIGGER 1: INSERT request RETURNING request_id -> INSERT job with request_id
+    With auto_assign and no assigned_employee_id, the least-loaded suitable
+    technician is assigned (the job stays unassigned when none is available).
     """
     from psycopg.rows import dict_row
     from db.connection import get_db_connection
@@ -107,6 +346,11 @@ def create_request(vehicle_id, service_type, problem_note=None, priority='Normal
             # Extract request_id from the RETURNING clause
             request_id = request_row['request_id']
             
+            if assigned_employee_id is None and auto_assign:
+                technician = pick_technician(cur, service_type)
+                if technician:
+                    assigned_employee_id = technician['employee_id']
+            
             # TRIGGER 1 CONTINUED: Immediately create a service_job row with assigned employee
             cur.execute(f"""
                 INSERT INTO {SCHEMA}.service_jobs 
@@ -116,6 +360,11 @@ def create_request(vehicle_id, service_type, problem_note=None, priority='Normal
             """, (request_id, assigned_employee_id))
             
             job_row = cur.fetchone()
+            
+            apply_counter_deltas(cur, **request_status_deltas(None, request_row['status']))
+            publish(cur, 'request.created', request_id=request_id,
+                    job_id=job_row['job_id'] if job_row else None,
+                    vehicle_id=vehicle_id, status=request_row['status'])
             conn.commit()
             
             # Build response with both request and job info
@@ -124,8 +373,74 @@ def create_request(vehicle_id, service_type, problem_note=None, priority='Normal
                 request_dict['job_id'] = job_row['job_id']
                 request_dict['job_status'] = job_row['job_status']
                 request_dict['employee_id'] = job_row['employee_id']
-            
-            return request_dict
+    
+    invalidate_stats()
+    return request_dict
+
+
+def create_walk_in_request(customer, vehicle, service_type, problem_note=None, priority='Normal',
+                           status='Pending', assigned_employee_id=None, auto_assign=False):
+    """
+    Walk-in intake: customer + vehicle + request + job in one statement.
+    The customer is reused when the phone number is already known and the
+    vehicle when the plate is; otherwise they are created.
+    auto_assign works as in create_request.
+    
+    Args:
+        customer: dict with name, phone, email, address
+        vehicle: dict with plate_no, brand, model, year, color
+    
+    Returns:
+        The full request (same shape as get_request_by_id) plus job_id,
+        job_status, employee_id, customer_created and vehicle_created
+    
+    Raises:
+        ValueError: The plate belongs to a different customer, or a concurrent
+                    intake created the same customer / vehicle (retry)
+    """
+    params = {
+        'name': customer['name'],
+        'phone': customer['phone'],
+        'email': customer['email'],
+        'address': customer['address'],
+        'plate_no': vehicle['plate_no'],
+        'brand': vehicle['brand'],
+        'model': vehicle['model'],
+        'year': vehicle['year'],
+        'color': vehicle['color'],
+        'service_type': service_type,
+        'problem_note': problem_note,
+        'priority': priority,
+        'status': status,
+        'employee_id': assigned_employee_id
+    }
+    
+    with get_db_cursor() as cur:
+        if assigned_employee_id is None and auto_assign:
+            technician = pick_technician(cur, service_type)
+            if technician:
+                params['employee_id'] = technician['employee_id']
+        
+        cur.execute(WALK_IN_QUERY, params)
+        row = cur.fetchone()
+        if not row:
+            raise ValueError("Customer or vehicle was modified concurrently, please retry")
+        
+        result = dict(row)
+        owner_id = result.pop('vehicle_owner_id')
+        if owner_id != result['customer_id']:
+            # Raising rolls back the whole intake, including a new customer
+            raise ValueError(f"Vehicle {vehicle['plate_no']} is registered to another customer")
+        
+        apply_counter_deltas(cur,
+                             customers_count=int(result['customer_created']),
+                             vehicles_count=int(result['vehicle_created']),
+                             **request_status_deltas(None, result['status']))
+        publish(cur, 'request.created', request_id=result['request_id'],
+                job_id=result['job_id'], vehicle_id=result['vehicle_id'], status=result['status'])
+    
+    invalidate_stats()
+    return result
 
 
 def update_request(request_id, service_type=None, problem_note=None, priority=None, status=None, vehicle_id=None):
@@ -153,27 +468,136 @@ def update_request(request_id, service_type=None, problem_note=None, priority=No
         return get_request_by_id(request_id)
     
     params.append(request_id)
-    query = f"""
-        UPDATE {SCHEMA}.service_requests
-        SET {', '.join(updates)}
-        WHERE request_id = %s
-        RETURNING *
+    return _update_with_counters(updates, params, new_status=status)
+
+
+def update_request_status(request_id, status):
     """
+    Update the status of a service request.
     
-    result = execute_returning(query, tuple(params))
-    return dict(result) if result else None
+    Raises:
+        InvalidTransition: The current status may not change to `status`
+    """
+    return _update_with_counters(["status = %s"], [status, request_id], new_status=status)
 
 
-def update_request_status(request_id, status):
-    """Update the status of a service request."""
-    query = f"""
-        UPDATE {SCHEMA}.service_requests
-        SET status = %s
-        WHERE request_id = %s
-        RETURNING *
+def complete_request(request_id, labor_charge=0.00, recomplete=True, tax_rate=None, **changes):
+    """
+    Mark a request Completed, close its latest job and generate the bill,
+    all in one transaction.
+    
+    Args:
+        labor_charge: Labor charge recorded on the job and billed
+        recomplete: Also close the job / bill when the request was already Completed
+        tax_rate: Defaults to billing.DEFAULT_TAX_RATE
+        changes: Other request columns to update (see COMPLETION_FIELDS)
+    
+    Returns:
+        dict with 'request' (full details), 'job' and 'bill' (None when there
+        was no job to close or it already had a bill), or None if the request
+        does not exist
+    
+    Raises:
+        InvalidTransition: The request's status may not change to Completed
+    """
+    from controllers.billing import BILL_DETAIL_QUERY, DEFAULT_TAX_RATE
+    
+    if tax_rate is None:
+        tax_rate = DEFAULT_TAX_RATE
+    
+    assignments = ["status = 'Completed'"]
+    params = {
+        'request_id': request_id,
+        'labor_charge': labor_charge,
+        'recomplete': recomplete,
+        'end_time': datetime.now(),
+        'tax_rate': tax_rate
+    }
+    for name in COMPLETION_FIELDS:
+        if changes.get(name) is not None:
+            assignments.append(f"{name} = %({name})s")
+            params[name] = changes[name]
+    
+    with get_db_cursor() as cur:
+        cur.execute(COMPLETE_REQUEST_QUERY.format(assignments=', '.join(assignments)), params)
+        row = cur.fetchone()
+        if not row:
+            error = transition_error(cur, 'request', request_id, 'Completed')
+            if error:
+                raise error
+            return None
+        
+        apply_counter_deltas(cur, **request_status_deltas(row['old_status'], row['status']))
+        publish(cur, 'request.updated', request_id=request_id,
+                status=row['status'], old_status=row['old_status'])
+        if row['job_id']:
+            # Employee stats and stock checks run later on the queue worker
+            enqueue_job_completed(cur, row['job_id'])
+        if row['bill_id']:
+            apply_counter_deltas(cur, **bill_deltas(None, row))
+            publish(cur, 'bill.created', bill_id=row['bill_id'], job_id=row['job_id'],
+                    total_amount=row['total_amount'])
+        
+        # Read back the results on the same transaction
+        cur.execute(REQUEST_DETAIL_QUERY, (request_id,))
+        request = dict(cur.fetchone())
+        
+        job = None
+        if row['job_id']:
+            cur.execute(f"SELECT * FROM {SCHEMA}.service_jobs WHERE job_id = %s", (row['job_id'],))
+            job = dict(cur.fetchone())
+        
+        bill = None
+        if row['bill_id']:
+            cur.execute(BILL_DETAIL_QUERY + "WHERE b.bill_id = %s", (row['bill_id'],))
+            bill = dict(cur.fetchone())
+    
+    invalidate_stats()
+    return {'request': request, 'job': job, 'bill': bill}
+
+
+def _update_with_counters(updates, params, new_status=None):
+    """
+    Run a service request UPDATE and adjust the dashboard counters
+    for any status change in the same transaction.
+    The last entry of params must be the request_id. When new_status is
+    given, the UPDATE only applies if the status may change to it.
     """
-    result = execute_returning(query, (status, request_id))
-    return dict(result) if result else None
+    guard = ''
+    if new_status is not None:
+        guard = f"AND {transition_guard('request', 'old.old_status')}"
+        params = list(params) + [new_status]
+    
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.service_requests sr
+            SET {', '.join(updates)}
+            FROM (
+                SELECT request_id, status AS old_status
+                FROM {SCHEMA}.service_requests
+                WHERE request_id = %s
+                FOR UPDATE
+            ) old
+            WHERE sr.request_id = old.request_id {guard}
+            RETURNING sr.*, old.old_status
+        """, tuple(params))
+        result = cur.fetchone()
+        if not result:
+            if new_status is not None:
+                error = transition_error(cur, 'request', params[-2], new_status)
+                if error:
+                    raise error
+            return None
+        
+        result = dict(result)
+        old_status = result.pop('old_status')
+        apply_counter_deltas(cur, **request_status_deltas(old_status, result['status']))
+        publish(cur, 'request.updated', request_id=result['request_id'],
+                status=result['status'], old_status=old_status)
+    
+    if old_status != result['status']:
+        invalidate_stats()
+    return result
 
 
 def delete_request(request_id):
@@ -187,7 +611,12 @@ def delete_request(request_id):
         
         cur.execute(f"DELETE FROM {SCHEMA}.service_requests WHERE request_id = %s RETURNING *", (request_id,))
         row = cur.fetchone()
-        return dict(row) if row else None
+        if row:
+            apply_counter_deltas(cur, **request_status_deltas(row['status'], None))
+    
+    if row:
+        invalidate_stats()
+    return dict(row) if row else None
 
 
 def request_exists(request_id):
@@ -226,39 +655,60 @@ def search_requests(search_term):
         return [dict(row) for row in cur.fetchall()]
 
 
+# Employees assigned to a request's jobs, aggregated per request row so the
+# "with employees" reads stay a single statement
+EMPLOYEES_LATERAL = f"""
+    LEFT JOIN LATERAL (
+        SELECT COALESCE(
+                   json_agg(json_build_object('employee_id', emp.id,
+                                              'employee_name', emp.name,
+                                              'position', emp.position)
+                            ORDER BY emp.id),
+                   '[]'::json) AS employees
+        FROM (
+            SELECT DISTINCT e.id, e.name, e.position
+            FROM {SCHEMA}.service_jobs esj
+            JOIN {SCHEMA}.employees e ON esj.employee_id = e.id
+            WHERE esj.request_id = sr.request_id
+        ) emp
+    ) emps ON TRUE
+"""
+
+
 def get_request_with_employees(request_id):
     """Get a service request with assigned employees from related jobs."""
     with get_db_cursor() as cur:
-        # Get the request details
-        request = get_request_by_id(request_id)
-        if not request:
-            return None
-        
-        # Get employees assigned to this request's jobs
         cur.execute(f"""
-            SELECT DISTINCT e.id AS employee_id, e.name AS employee_name, e.position
-            FROM {SCHEMA}.service_jobs sj
-            JOIN {SCHEMA}.employees e ON sj.employee_id = e.id
-            WHERE sj.request_id = %s
+            SELECT sr.*, 
+                   v.plate_no, v.brand AS vehicle_brand, v.model AS vehicle_model, v.year AS vehicle_year, v.color AS vehicle_color,
+                   c.customer_id, c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email, c.address AS customer_address,
+                   emps.employees
+            FROM {SCHEMA}.service_requests sr
+            LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
+            LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+            {EMPLOYEES_LATERAL}
+            WHERE sr.request_id = %s
         """, (request_id,))
-        employees = [dict(row) for row in cur.fetchall()]
-        
-        request['employees'] = employees
-        return request
+        row = cur.fetchone()
+        return dict(row) if row else None
 
 
 def get_all_requests_with_employees():
-    """Get all service requests with assigned employees."""
-    requests = get_all_requests()
-    
+    """Get all service requests with assigned employees (one statement, no per-row queries)."""
     with get_db_cursor() as cur:
-        for req in requests:
-            cur.execute(f"""
-                SELECT DISTINCT e.id AS employee_id, e.name AS employee_name, e.position
-                FROM {SCHEMA}.service_jobs sj
-                JOIN {SCHEMA}.employees e ON sj.employee_id = e.id
-                WHERE sj.request_id = %s
-            """, (req['request_id'],))
-            req['employees'] = [dict(row) for row in cur.fetchall()]
-    
-    return requests
+        cur.execute(f"""
+            SELECT sr.*, 
+                   v.plate_no, v.brand AS vehicle_brand, v.model AS vehicle_model, v.year AS vehicle_year, v.color AS vehicle_color,
+                   c.customer_id, c.name AS customer_name, c.phone AS customer_phone, c.email AS customer_email, c.address AS customer_address,
+                   sj.job_id, sj.employee_id AS assigned_employee_id,
+                   e.name AS assigned_employee_name, e.position AS assigned_employee_position,
+                   emps.employees
+            FROM {SCHEMA}.service_requests sr
+            LEFT JOIN {SCHEMA}.vehicles v ON sr.vehicle_id = v.vehicle_id
+            LEFT JOIN {SCHEMA}.customers c ON v.customer_id = c.customer_id
+            LEFT JOIN {SCHEMA}.service_jobs sj ON sr.request_id = sj.request_id
+            LEFT JOIN {SCHEMA}.employees e ON sj.employee_id = e.id
+            {EMPLOYEES_LATERAL}
+            ORDER BY sr.request_date DESC, sr.request_id DESC
+        """)
+        return [dict(row) for row in cur.fetchall()]
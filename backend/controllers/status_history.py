@@ -0,0 +1,131 @@
+"""
+Status history controller - Status transition rules and time-in-state reports.
+
+Every status change of a service request or job is appended to
+status_events by triggers in the same statement (see database/schema.sql,
+section 23). Status-changing UPDATEs add transition_guard() to their WHERE
+clause, so a change the status_transitions graph does not allow updates
+nothing; transition_error() then tells a rejected change from a missing row.
+"""
+from db.connection import get_db_cursor
+
+SCHEMA = 'vehicle_service'
+
+# entity name -> (entity_type code, table, key column, status column)
+ENTITIES = {
+    'request': ('R', 'service_requests', 'request_id', 'status'),
+    'job': ('J', 'service_jobs', 'job_id', 'job_status')
+}
+
+
+class InvalidTransition(ValueError):
+    """Raised when a status change is not allowed from the current status."""
+
+    def __init__(self, entity, current_status, new_status):
+        super().__init__(f"Cannot change {entity} status from '{current_status}' to '{new_status}'")
+        self.current_status = current_status
+        self.new_status = new_status
+
+
+def transition_guard(entity, status_expr, new_status_param='%s'):
+    """
+    SQL condition allowing the UPDATE only for a permitted transition.
+
+    Usage:
+        f"UPDATE ... SET job_status = %s WHERE job_id = %s AND {transition_guard('job', 'job_status')}"
+        (pass the new status once more for the guard's placeholder)
+    """
+    entity_type = ENTITIES[entity][0]
+    return f"{SCHEMA}.status_transition_allowed('{entity_type}', {status_expr}, {new_status_param})"
+
+
+def transition_error(cur, entity, entity_id, new_status):
+    """
+    Call after a guarded UPDATE matched no row.
+
+    Returns:
+        An InvalidTransition to raise when the row exists (the guard refused
+        the change), None when the row does not exist
+    """
+    _, table, key, column = ENTITIES[entity]
+    cur.execute(f"SELECT {column} AS status FROM {SCHEMA}.{table} WHERE {key} = %s", (entity_id,))
+    row = cur.fetchone()
+    return InvalidTransition(entity, row['status'], new_status) if row else None
+
+
+def get_allowed_transitions(entity):
+    """Get {from_status: [to_status, ...]} for an entity."""
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT from_status, array_agg(to_status ORDER BY to_status) AS to_statuses
+            FROM {SCHEMA}.status_transitions
+            WHERE entity_type = %s
+            GROUP BY from_status
+        """, (ENTITIES[entity][0],))
+        return {row['from_status']: row['to_statuses'] for row in cur.fetchall()}
+
+
+def get_history(entity, entity_id):
+    """
+    Get the status changes of one request or job, oldest first, each with
+    the time spent in the new status (until the next change, or until now).
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT event_id, from_status, to_status, changed_at,
+                   ROUND(EXTRACT(EPOCH FROM
+                       COALESCE(LEAD(changed_at) OVER w, CURRENT_TIMESTAMP::timestamp) - changed_at
+                   )::numeric / 3600, 2) AS hours_in_status,
+                   LEAD(changed_at) OVER w IS NULL AS current
+            FROM {SCHEMA}.status_history
+            WHERE entity_type = %s AND entity_id = %s
+            WINDOW w AS (ORDER BY event_id)
+            ORDER BY event_id
+        """, (ENTITIES[entity][0], entity_id))
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_time_in_state(entity, date_from, date_to):
+    """
+    Time spent in each status by requests or jobs that entered it between
+    date_from and date_to (inclusive). Each event is matched with the next
+    event of the same entity through the (entity_type, entity_id, event_id)
+    index; statuses not left yet are measured until now.
+
+    Returns:
+        [{status, entries, still_in_status, avg_hours, p50_hours, p90_hours, max_hours}]
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            WITH spans AS (
+                SELECT e.to_status,
+                       nxt.changed_at IS NULL AS open,
+                       EXTRACT(EPOCH FROM
+                           COALESCE(nxt.changed_at, CURRENT_TIMESTAMP::timestamp) - e.changed_at
+                       ) / 3600 AS hours
+                FROM {SCHEMA}.status_events e
+                LEFT JOIN LATERAL (
+                    SELECT n.changed_at
+                    FROM {SCHEMA}.status_events n
+                    WHERE n.entity_type = e.entity_type
+                      AND n.entity_id = e.entity_id
+                      AND n.event_id > e.event_id
+                    ORDER BY n.event_id
+                    LIMIT 1
+                ) nxt ON TRUE
+                WHERE e.entity_type = %s
+                  AND e.changed_at >= %s AND e.changed_at < %s::date + 1
+            )
+            SELECT c.status,
+                   COUNT(*) AS entries,
+                   COUNT(*) FILTER (WHERE s.open) AS still_in_status,
+                   ROUND(AVG(s.hours)::numeric, 2) AS avg_hours,
+                   ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY s.hours)::numeric, 2) AS p50_hours,
+                   ROUND(percentile_cont(0.9) WITHIN GROUP (ORDER BY s.hours)::numeric, 2) AS p90_hours,
+                   ROUND(MAX(s.hours)::numeric, 2) AS max_hours
+            FROM spans s
+            JOIN {SCHEMA}.status_codes c ON c.code = s.to_status
+            GROUP BY c.code, c.status
+            ORDER BY c.code
+        """, (ENTITIES[entity][0], date_from, date_to))
+        return [dict(row) for row in cur.fetchall()]
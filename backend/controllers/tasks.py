@@ -0,0 +1,86 @@
+"""
+Tasks controller - Follow-up work run by the queue worker (worker.py).
+
+Each handler receives the worker's cursor and the task payload. Handlers
+run in the same transaction that marks the task done, so they must only
+use the given cursor and may be retried after a failure.
+"""
+import logging
+from controllers.billing import create_bill_for_job
+from utils.events import publish
+from utils.work_queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = 'vehicle_service'
+
+
+def enqueue_job_completed(cur, job_id):
+    """
+    Queue the follow-up work for a job that was just completed. A task
+    already waiting for the job covers this completion too; one queued
+    after it finished handles a job that was reopened and completed again.
+    """
+    enqueue(cur, 'job.completed', {'job_id': job_id}, dedupe_key=f"job.completed:{job_id}")
+
+
+def handle_job_completed(cur, payload):
+    """
+    Follow-up work for a completed job:
+    1. Make sure the job has a bill (jobs completed outside the request flow have none)
+    2. Credit the assigned employee with the finished job (once per job)
+    3. Report parts used by the job that are now at or below their reorder level
+
+    Skipped when the job was reopened (no longer Completed) before the task ran.
+    """
+    job_id = payload['job_id']
+
+    cur.execute(f"""
+        SELECT job_id, employee_id, job_status
+        FROM {SCHEMA}.service_jobs WHERE job_id = %s
+        FOR UPDATE
+    """, (job_id,))
+    job = cur.fetchone()
+    if not job:
+        logger.warning(f"==> job.completed: job {job_id} no longer exists, skipping")
+        return
+    if job['job_status'] != 'Completed':
+        # Reopened before the worker got to it; its next completion queues again
+        logger.info(f"==> job.completed: job {job_id} is '{job['job_status']}' now, skipping")
+        return
+
+    bill, _ = create_bill_for_job(cur, job_id)
+    if bill:
+        logger.info(f"==> job.completed: generated bill {bill['bill_id']} for job {job_id}")
+
+    # Credit the employee once per job, however often it is reopened and completed
+    cur.execute(f"""
+        UPDATE {SCHEMA}.service_jobs
+        SET completion_credited = TRUE
+        WHERE job_id = %s AND NOT completion_credited
+        RETURNING employee_id
+    """, (job_id,))
+    credited = cur.fetchone()
+    if credited and credited['employee_id']:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.employees
+            SET jobs_done = COALESCE(jobs_done, 0) + 1
+            WHERE id = %s
+        """, (credited['employee_id'],))
+
+    cur.execute(f"""
+        SELECT DISTINCT i.part_id, i.part_name, i.quantity_in_stock, i.reorder_level
+        FROM {SCHEMA}.job_parts_used jpu
+        JOIN {SCHEMA}.inventory_levels i ON jpu.part_id = i.part_id
+        WHERE jpu.job_id = %s AND i.quantity_in_stock <= i.reorder_level
+        ORDER BY i.part_id
+    """, (job_id,))
+    low_parts = [dict(row) for row in cur.fetchall()]
+    if low_parts:
+        publish(cur, 'inventory.low_stock', job_id=job_id, parts=low_parts)
+
+
+# task_type -> handler(cur, payload)
+HANDLERS = {
+    'job.completed': handle_job_completed
+}
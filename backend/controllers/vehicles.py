@@ -2,6 +2,7 @@
 Vehicles controller - Raw SQL operations for vehicle management.
 """
 from db.connection import get_db_cursor, execute_returning
+from controllers.dashboard import apply_counter_deltas, invalidate_stats
 
 SCHEMA = 'vehicle_service'
 
@@ -52,12 +53,18 @@ def get_vehicles_by_customer(customer_id):
 
 def create_vehicle(plate_no, brand, model, year, color, customer_id):
     """Create a new vehicle. Let SERIAL handle the ID."""
-    query = f"""
-        INSERT INTO {SCHEMA}.vehicles (plate_no, brand, model, year, color, customer_id)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING *
-    """
-    result = execute_returning(query, (plate_no, brand, model, year, color, customer_id))
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.vehicles (plate_no, brand, model, year, color, customer_id)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING *
+        """, (plate_no, brand, model, year, color, customer_id))
+        result = cur.fetchone()
+        if result:
+            apply_counter_deltas(cur, vehicles_count=1)
+    
+    if result:
+        invalidate_stats()
     return dict(result) if result else None
 
 
@@ -111,7 +118,12 @@ def delete_vehicle(vehicle_id):
         
         cur.execute(f"DELETE FROM {SCHEMA}.vehicles WHERE vehicle_id = %s RETURNING *", (vehicle_id,))
         row = cur.fetchone()
-        return dict(row) if row else None
+        if row:
+            apply_counter_deltas(cur, vehicles_count=-1)
+    
+    if row:
+        invalidate_stats()
+    return dict(row) if row else None
 
 
 def vehicle_exists(vehicle_id):
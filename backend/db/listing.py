@@ -0,0 +1,330 @@
+"""
+Listing query builder for list endpoints.
+
+A ListingSpec whitelists the columns a list endpoint can return and the
+relations (joins) they come from. build_listing_query() then generates a
+SELECT that joins only the relations needed for the requested fields, so
+narrow views (?fields=, ?expand=) get smaller queries and payloads.
+
+Specs may also declare filters (?status=, ?date_from=, ?search=, ...) that
+are all combined with AND, and any output column can be used in ?sort=.
+Facets (?facets=status,priority) return grouped counts for the same filters,
+read in the same snapshot as the page.
+Only identifiers from the spec are interpolated into SQL; values are always
+passed as %s parameters.
+"""
+from datetime import date
+
+# Converters for filter values
+FILTER_TYPES = {
+    str: str,
+    int: int,
+    date: date.fromisoformat
+}
+
+
+def parse_csv_param(value):
+    """Split a comma-separated query parameter into a list of names."""
+    if not value:
+        return []
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def escape_like(value):
+    """Escape LIKE wildcards so user input only matches literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class ListingSpec:
+    """
+    Whitelist of selectable columns and joinable relations for one listing.
+
+    Args:
+        from_clause: FROM clause of the base table, e.g. "schema.service_requests sr"
+        key: Output name of the primary key, always selected
+        columns: {output_name: sql_expression} for the base table
+        relations: {name: {'join': sql, 'requires': (names...), 'columns': {...}}}
+                   in the order their joins must appear
+        default_order: ORDER BY clause used when none is given
+        filters: {param_name: {'where': sql, 'type': str|int|date|bool,
+                               'multi': bool, 'pattern': bool, 'requires': (names...)}}
+                 - where: condition; every %s in it receives the value
+                 - multi: comma-separated values, passed as a list (use = ANY(%s))
+                 - pattern: value is wrapped as %value% for ILIKE (wildcards escaped)
+                 - bool: 'true' adds the condition (which takes no parameters)
+        facets: {facet_name: output column} available to ?facets=. A facet
+                ignores the filter of the same name, so a status tab shows
+                counts for every status under the other filters.
+    """
+
+    def __init__(self, from_clause, key, columns, relations, default_order, filters=None, facets=None):
+        self.from_clause = from_clause
+        self.key = key
+        self.columns = columns
+        self.relations = relations
+        self.default_order = default_order
+        self.filters = filters or {}
+        self.facets = facets or {}
+
+        # output_name -> relation name (None for base columns)
+        self._owner = {name: None for name in columns}
+        for relation, definition in relations.items():
+            for name in definition['columns']:
+                self._owner[name] = relation
+
+    @property
+    def field_names(self):
+        return list(self._owner)
+
+    def _with_requirements(self, relations):
+        """Add every relation the given relations depend on."""
+        needed = set()
+        pending = list(relations)
+        while pending:
+            name = pending.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            pending.extend(self.relations[name].get('requires', ()))
+        return needed
+
+    def resolve(self, fields=None, expand=None, extra_relations=()):
+        """
+        Work out the columns to select and the relations to join.
+
+        - No fields: every base column plus every column of the expanded relations.
+        - fields: exactly those columns (plus the key); relations owning them are joined.
+        - extra_relations: joined without selecting their columns (e.g. for filters).
+
+        Raises:
+            ValueError: Unknown field or relation name
+        """
+        fields = list(fields or [])
+        expand = list(expand or [])
+
+        unknown_relations = [name for name in expand if name not in self.relations]
+        if unknown_relations:
+            raise ValueError(f"Unknown expand value(s): {', '.join(unknown_relations)}. "
+                             f"Allowed: {', '.join(self.relations)}")
+
+        if fields:
+            unknown_fields = [name for name in fields if name not in self._owner]
+            if unknown_fields:
+                raise ValueError(f"Unknown field(s): {', '.join(unknown_fields)}")
+            selected = [self.key] + [name for name in fields if name != self.key]
+        else:
+            selected = list(self.columns)
+            for relation in expand:
+                selected.extend(self.relations[relation]['columns'])
+
+        owners = {self._owner[name] for name in selected if self._owner[name]}
+        needed = self._with_requirements(owners | set(expand) | set(extra_relations))
+        joins = [name for name in self.relations if name in needed]
+        return selected, joins
+
+    def expression(self, name):
+        """SQL expression for an output column name."""
+        owner = self._owner[name]
+        if owner is None:
+            return self.columns[name]
+        return self.relations[owner]['columns'][name]
+
+    def filter_clauses(self, args):
+        """
+        Build WHERE conditions from query args for every declared filter present.
+        Args that are not filters are ignored.
+
+        Returns:
+            (where, params, relations) for build_listing_query()
+
+        Raises:
+            ValueError: A filter value cannot be parsed
+        """
+        where = []
+        params = []
+        relations = []
+        for name, definition in self.filters.items():
+            raw = args.get(name) if args else None
+            if raw is None or raw == '':
+                continue
+
+            value_type = definition.get('type', str)
+            if value_type is bool:
+                if raw.lower() != 'true':
+                    continue
+                value = None
+            else:
+                convert = FILTER_TYPES[value_type]
+                try:
+                    if definition.get('multi'):
+                        value = [convert(part) for part in parse_csv_param(raw)]
+                    else:
+                        value = convert(raw.strip())
+                except ValueError:
+                    raise ValueError(f"Invalid value for {name}: {raw}")
+                if definition.get('pattern'):
+                    value = f"%{escape_like(value)}%"
+
+            sql = definition['where']
+            where.append(sql)
+            params.extend([value] * sql.count('%s'))
+            relations.extend(definition.get('requires', ()))
+        return where, params, relations
+
+    def order_clause(self, sort):
+        """
+        Build an ORDER BY clause from a sort spec such as "-request_date,priority"
+        (a leading - sorts descending). The key is appended as a tie-breaker
+        so paging through results is stable.
+
+        Returns:
+            (order_by, relations)
+
+        Raises:
+            ValueError: Unknown sort field
+        """
+        terms = []
+        relations = set()
+        names = []
+        for item in parse_csv_param(sort):
+            descending = item.startswith('-')
+            name = item.lstrip('-+')
+            if name not in self._owner:
+                raise ValueError(f"Unknown sort field: {name}. Allowed: {', '.join(self.field_names)}")
+            names.append(name)
+            if self._owner[name]:
+                relations.add(self._owner[name])
+            terms.append(f"{self.expression(name)} {'DESC' if descending else 'ASC'} NULLS LAST")
+
+        if not terms:
+            return self.default_order, relations
+        if self.key not in names:
+            terms.append(f"{self.expression(self.key)} DESC")
+        return ', '.join(terms), relations
+
+
+def build_listing_query(spec, fields=None, expand=None, where=None, params=None,
+                        extra_relations=(), order_by=None, limit=None, offset=None,
+                        filters=None, sort=None):
+    """
+    Build a listing SELECT from a spec.
+
+    Args:
+        spec: ListingSpec for the resource
+        fields / expand: Parsed ?fields= and ?expand= values
+        where: List of SQL conditions (ANDed), using %s placeholders
+        params: Parameters for the where conditions, in order
+        extra_relations: Relations the where conditions need joined
+        order_by: ORDER BY clause (defaults to spec.default_order)
+        limit / offset: Optional pagination
+        filters: Query args matched against spec.filters (e.g. request.args)
+        sort: Sort spec such as "-request_date,priority" (overrides order_by)
+
+    Returns:
+        (query, params) tuple ready for cursor.execute()
+    """
+    where = list(where or [])
+    params = list(params or [])
+    extra_relations = list(extra_relations)
+
+    if filters:
+        filter_where, filter_params, filter_relations = spec.filter_clauses(filters)
+        where.extend(filter_where)
+        params.extend(filter_params)
+        extra_relations.extend(filter_relations)
+    if sort:
+        order_by, sort_relations = spec.order_clause(sort)
+        extra_relations.extend(sort_relations)
+
+    selected, joins = spec.resolve(fields, expand, extra_relations)
+
+    select_list = ',\n               '.join(f"{spec.expression(name)} AS {name}" for name in selected)
+    join_list = '\n        '.join(spec.relations[name]['join'] for name in joins)
+
+    query = f"""
+        SELECT {select_list}
+        FROM {spec.from_clause}
+        {join_list}
+    """
+    if where:
+        query += f"WHERE {' AND '.join(where)}\n"
+    query += f"ORDER BY {order_by or spec.default_order}\n"
+    if limit is not None:
+        query += "LIMIT %s\n"
+        params.append(limit)
+    if offset:
+        query += "OFFSET %s\n"
+        params.append(offset)
+
+    return query, tuple(params)
+
+
+def build_facet_query(spec, facets, filters=None):
+    """
+    Build one statement counting rows per value of each requested facet.
+
+    Returns:
+        (query, params) producing (facet, value, count) rows
+
+    Raises:
+        ValueError: Unknown facet name, or a bad filter value
+    """
+    unknown = [name for name in facets if name not in spec.facets]
+    if unknown:
+        raise ValueError(f"Unknown facet(s): {', '.join(unknown)}. "
+                         f"Allowed: {', '.join(spec.facets)}")
+
+    parts = []
+    params = []
+    for name in facets:
+        column = spec.facets[name]
+        # Disjunctive facet: apply every filter except its own
+        other_filters = {key: value for key, value in (filters or {}).items() if key != name}
+        where, where_params, relations = spec.filter_clauses(other_filters)
+        if spec._owner[column]:
+            relations.append(spec._owner[column])
+        needed = spec._with_requirements(relations)
+        joins = '\n            '.join(spec.relations[rel]['join'] for rel in spec.relations if rel in needed)
+
+        part = f"""
+            SELECT %s AS facet, ({spec.expression(column)})::text AS value, COUNT(*) AS count
+            FROM {spec.from_clause}
+            {joins}
+        """
+        if where:
+            part += f"WHERE {' AND '.join(where)}\n"
+        part += "GROUP BY 2"
+        parts.append(f"({part})")
+        params.append(name)
+        params.extend(where_params)
+
+    query = '\nUNION ALL\n'.join(parts) + "\nORDER BY 1, 3 DESC, 2"
+    return query, tuple(params)
+
+
+def fetch_listing(cur, spec, fields=None, expand=None, filters=None, sort=None, facets=None):
+    """
+    Run a listing (and its facet counts) on the given cursor.
+    With facets the transaction is switched to a read-only REPEATABLE READ
+    snapshot first, so the counts match the returned rows exactly.
+
+    Returns:
+        (rows, facet_counts) where facet_counts is
+        {facet: [{'value': ..., 'count': ...}, ...]} ({} without facets)
+    """
+    facets = list(facets or [])
+    query, params = build_listing_query(spec, fields=fields, expand=expand, filters=filters, sort=sort)
+    facet_query = build_facet_query(spec, facets, filters) if facets else None
+
+    if facet_query:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cur.execute(query, params)
+    rows = [dict(row) for row in cur.fetchall()]
+
+    facet_counts = {}
+    if facet_query:
+        facet_counts = {name: [] for name in facets}
+        cur.execute(*facet_query)
+        for row in cur.fetchall():
+            facet_counts[row['facet']].append({'value': row['value'], 'count': row['count']})
+    return rows, facet_counts
@@ -0,0 +1,32 @@
+"""
+Periodic job that folds the striped stock of hot parts back into one
+total and spreads it evenly over the stripes again, so no stripe runs dry
+long before the others (see database/schema.sql, section 25).
+Run from the backend folder (e.g. every few minutes from cron):
+
+  python fold_stock.py
+"""
+import sys
+import os
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.inventory import rebalance_stock_stripes
+
+
+def main(argv):
+    print("Rebalancing striped stock...")
+    
+    parts = rebalance_stock_stripes()
+    
+    if parts:
+        print(f"  Rebalanced {parts} striped part(s).")
+    else:
+        print("  No striped parts.")
+    print("Stock rebalancing completed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+Bulk import of historical service records (customers, vehicles, requests,
+jobs, parts and bills) from a CSV file. See controllers/history_import.py
+for the column list. Run from the backend folder:
+
+  python import_history.py history.csv --source branch-north
+  python import_history.py history.csv --source branch-north --batch-size 2000
+
+Requests already imported from the same --source are skipped, so an
+interrupted import can be re-run. Afterwards refresh the dashboard rollups
+for the imported period, e.g. python rollup_daily.py --backfill 2019-01-01 2024-06-30
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.history_import import import_history
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Import historical service records from CSV.')
+    parser.add_argument('csv_file', help='Path to the CSV file')
+    parser.add_argument('--source', required=True,
+                        help='Name of the data source (e.g. branch); used to skip already imported rows')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Requests merged per transaction')
+    args = parser.parse_args(argv)
+    
+    started = time.monotonic()
+    
+    def progress(message):
+        print(f"  [{time.monotonic() - started:7.1f}s] {message}")
+    
+    print(f"Importing {args.csv_file} (source: {args.source})...")
+    try:
+        with open(args.csv_file, 'rb') as f:
+            summary = import_history(f, args.source, batch_size=args.batch_size, progress=progress)
+    except ValueError as e:
+        print(f"  ERROR: {str(e)}")
+        return 1
+    
+    print(f"  Lines: {summary['lines']}, requests: {summary['requests']}")
+    print(f"  Imported: {summary['imported']}, skipped (already imported): {summary['skipped']}, "
+          f"rejected: {summary['rejected']}")
+    for error in summary['errors']:
+        where = f"line {error['line']}" if error['line'] else f"ext_ref {error['ext_ref']}"
+        print(f"  REJECTED {where}: {error['error']}")
+    print("Import completed!")
+    return 0 if not summary['rejected'] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,39 @@
+"""
+Reconciliation script for the dashboard_counters summary table.
+Recomputes every counter from the base tables and reports any drift.
+Run from the backend folder: python reconcile_counters.py [--check]
+
+  --check   Only report drift, do not rewrite the counters
+"""
+import sys
+import os
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.dashboard import reconcile_counters
+
+
+def main(argv):
+    fix = '--check' not in argv
+    print("Reconciling dashboard counters...")
+    
+    result = reconcile_counters(fix=fix)
+    
+    if not result['drift']:
+        print("  No drift detected.")
+    else:
+        for name, values in result['drift'].items():
+            print(f"  DRIFT {name}: stored={values['stored']} actual={values['actual']}")
+        if result['fixed']:
+            print("  Counters rewritten from base tables.")
+        else:
+            print("  Check only - counters left unchanged.")
+    
+    print("Reconciliation completed!")
+    # Non-zero exit when drift was found in check mode, for use in cron/CI
+    return 1 if result['drift'] and not fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,50 @@
+"""
+End-of-day job that fills the daily_rollups table used by
+GET /api/dashboard/timeseries.
+Run from the backend folder (e.g. nightly from cron):
+
+  python rollup_daily.py                               # roll up every new day through yesterday
+  python rollup_daily.py --through 2024-06-30          # roll up through a given day
+  python rollup_daily.py --lookback 3                  # also re-roll the last 3 rolled-up days
+  python rollup_daily.py --backfill 2023-01-01 2023-12-31
+"""
+import sys
+import os
+import argparse
+from datetime import date
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from controllers.rollups import rollup_range, run_incremental
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Populate the daily dashboard rollups.')
+    parser.add_argument('--backfill', nargs=2, metavar=('FROM', 'TO'), type=date.fromisoformat,
+                        help='Recompute every day in the range (inclusive)')
+    parser.add_argument('--through', type=date.fromisoformat,
+                        help='Last day to roll up incrementally (default: yesterday)')
+    parser.add_argument('--lookback', type=int, default=0,
+                        help='Re-roll this many already rolled-up days')
+    args = parser.parse_args(argv)
+    
+    if args.backfill:
+        start, end = args.backfill
+        print(f"Backfilling daily rollups {start} .. {end}...")
+        days = rollup_range(start, end)
+    else:
+        print("Rolling up new days...")
+        result = run_incremental(through=args.through, lookback_days=args.lookback)
+        start, end, days = result['start'], result['end'], result['days']
+    
+    if days:
+        print(f"  Rolled up {days} day(s): {start} .. {end}")
+    else:
+        print("  Nothing to roll up.")
+    print("Daily rollups completed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
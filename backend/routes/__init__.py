@@ -9,6 +9,9 @@ from routes.billing import billing_bp
 from routes.customers import customers_bp
 from routes.vehicles import vehicles_bp
 from routes.service_requests import service_requests_bp
+from routes.events import events_bp
+from routes.search import search_bp
+from routes.analytics import analytics_bp
 
 __all__ = [
     'auth_bp',
@@ -20,5 +23,8 @@ __all__ = [
     'billing_bp',
     'customers_bp',
     'vehicles_bp',
-    'service_requests_bp'
+    'service_requests_bp',
+    'events_bp',
+    'search_bp',
+    'analytics_bp'
 ]
@@ -0,0 +1,100 @@
+"""
+Analytics API routes.
+"""
+from datetime import date, timedelta
+from flask import Blueprint, request, jsonify
+from controllers import analytics as analytics_ctrl
+from controllers import status_history as history_ctrl
+from db.listing import parse_csv_param
+from utils.jwt_utils import token_required
+from utils.http_cache import conditional_get
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+
+@analytics_bp.route('/jobs', methods=['GET'])
+@token_required
+@conditional_get(*analytics_ctrl.JOB_TABLES, vary=lambda: date.today().isoformat())
+def get_job_analytics(current_user):
+    """
+    Get job cycle times, daily throughput / work in progress and
+    per-service-type bottlenecks.
+    Query params:
+        from=YYYY-MM-DD, to=YYYY-MM-DD   window (default: last 365 days)
+        service_type=<type,...>          only these service types
+        priority=<priority,...>          only these priorities
+        employee_id=<id,...>             only these employees' jobs
+    """
+    try:
+        try:
+            date_to = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+            date_from = (date.fromisoformat(request.args['from']) if request.args.get('from')
+                         else date_to - timedelta(days=364))
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+        
+        if date_from > date_to:
+            return jsonify({'error': 'from must not be after to'}), 400
+        if (date_to - date_from).days >= analytics_ctrl.MAX_RANGE_DAYS:
+            return jsonify({'error': f'The window may cover at most {analytics_ctrl.MAX_RANGE_DAYS} days'}), 400
+        
+        try:
+            employee_ids = [int(v) for v in parse_csv_param(request.args.get('employee_id'))]
+        except ValueError:
+            return jsonify({'error': 'employee_id must be a number'}), 400
+        
+        filters = {
+            'service_type': parse_csv_param(request.args.get('service_type')),
+            'priority': parse_csv_param(request.args.get('priority')),
+            'employee_id': employee_ids
+        }
+        
+        analytics = analytics_ctrl.get_job_analytics(date_from, date_to, filters)
+        
+        return jsonify({
+            'message': 'Job analytics retrieved successfully',
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'filters': {name: values for name, values in filters.items() if values},
+            **analytics
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get job analytics: {str(e)}'}), 500
+
+
+@analytics_bp.route('/time-in-status', methods=['GET'])
+@token_required
+def get_time_in_status(current_user):
+    """
+    Get how long requests or jobs stayed in each status.
+    Query params:
+        entity=request|job               (default: request)
+        from=YYYY-MM-DD, to=YYYY-MM-DD   status entered in this window (default: last 30 days)
+    """
+    try:
+        entity = request.args.get('entity', 'request')
+        if entity not in history_ctrl.ENTITIES:
+            return jsonify({'error': f'Invalid entity. Must be one of: {", ".join(history_ctrl.ENTITIES)}'}), 400
+        
+        try:
+            date_to = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+            date_from = (date.fromisoformat(request.args['from']) if request.args.get('from')
+                         else date_to - timedelta(days=29))
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+        
+        if date_from > date_to:
+            return jsonify({'error': 'from must not be after to'}), 400
+        
+        return jsonify({
+            'message': 'Time in status retrieved successfully',
+            'entity': entity,
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'statuses': history_ctrl.get_time_in_state(entity, date_from, date_to),
+            'transitions': history_ctrl.get_allowed_transitions(entity)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get time in status: {str(e)}'}), 500
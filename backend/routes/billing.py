@@ -4,12 +4,14 @@ Billing API routes.
 from flask import Blueprint, request, jsonify
 from controllers import billing as bill_ctrl
 from utils.jwt_utils import token_required
+from utils.http_cache import conditional_get
 
 billing_bp = Blueprint('billing', __name__, url_prefix='/api/billing')
 
 
 @billing_bp.route('', methods=['GET'])
 @token_required
+@conditional_get('billing', 'service_jobs', 'service_requests', 'vehicles', 'customers')
 def get_all_bills(current_user):
     """Get all billing records."""
     try:
@@ -26,6 +28,7 @@ def get_all_bills(current_user):
 
 @billing_bp.route('/<int:bill_id>', methods=['GET'])
 @token_required
+@conditional_get('billing', 'service_jobs', 'service_requests', 'vehicles', 'customers', weak=False)
 def get_bill(current_user, bill_id):
     """Get a single bill by ID."""
     try:
@@ -45,6 +48,7 @@ def get_bill(current_user, bill_id):
 
 @billing_bp.route('/job/<int:job_id>', methods=['GET'])
 @token_required
+@conditional_get('billing', 'service_jobs', 'service_requests', 'vehicles', 'customers', 'job_parts_used', 'inventory', weak=False)
 def get_bill_by_job(current_user, job_id):
     """Get billing details for a specific job (includes parts breakdown)."""
     try:
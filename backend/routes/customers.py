@@ -4,12 +4,14 @@ Customers API routes.
 from flask import Blueprint, request, jsonify
 from controllers import customers as cust_ctrl
 from utils.jwt_utils import token_required
+from utils.http_cache import conditional_get
 
 customers_bp = Blueprint('customers', __name__, url_prefix='/api/customers')
 
 
 @customers_bp.route('', methods=['GET'])
 @token_required
+@conditional_get('customers')
 def get_all_customers(current_user):
     """Get all customers. Query param: search=<term> to filter."""
     try:
@@ -31,6 +33,7 @@ def get_all_customers(current_user):
 
 @customers_bp.route('/<int:customer_id>', methods=['GET'])
 @token_required
+@conditional_get('customers', weak=False)
 def get_customer(current_user, customer_id):
     """Get a single customer by ID."""
     try:
@@ -175,6 +178,7 @@ def delete_customer(current_user, customer_id):
 
 @customers_bp.route('/<int:customer_id>/vehicles', methods=['GET'])
 @token_required
+@conditional_get('customers', 'vehicles')
 def get_customer_vehicles(current_user, customer_id):
     """Get all vehicles for a specific customer."""
     try:
@@ -1,5 +1,9 @@
-from flask import Blueprint, jsonify
+from datetime import date, timedelta
+from flask import Blueprint, request, jsonify
 from db.connection import get_db_cursor
+from controllers import dashboard as dash_ctrl
+from controllers import rollups as rollup_ctrl
+from controllers import inventory as inv_ctrl
 from utils.jwt_utils import token_required
 
 SCHEMA = 'vehicle_service'
@@ -34,7 +38,7 @@ def get_dashboard(current_user):
     """
     try:
         print(f"[DEBUG] Dashboard route called by user: {current_user}")
-        stats = get_dashboard_stats()
+        stats = dash_ctrl.get_dashboard_stats()
         print(f"[DEBUG] Dashboard stats returned: {stats}")
         
         return jsonify({
@@ -48,6 +52,45 @@ def get_dashboard(current_user):
         return jsonify({'error': f'Failed to load dashboard: {str(e)}'}), 500
 
 
+@dashboard_bp.route('/dashboard/timeseries', methods=['GET'])
+@token_required
+def get_timeseries(current_user):
+    """
+    Get revenue and workload totals over time from the daily rollups.
+    Query params: from=YYYY-MM-DD, to=YYYY-MM-DD (default: last 30 days),
+                  granularity=day|week|month (default: day)
+    """
+    try:
+        try:
+            date_to = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+            date_from = (date.fromisoformat(request.args['from']) if request.args.get('from')
+                         else date_to - timedelta(days=29))
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+        
+        if date_from > date_to:
+            return jsonify({'error': 'from must not be after to'}), 400
+        
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in rollup_ctrl.GRANULARITIES:
+            return jsonify({'error': f'Invalid granularity. Must be one of: {", ".join(rollup_ctrl.GRANULARITIES)}'}), 400
+        
+        series = rollup_ctrl.get_timeseries(date_from, date_to, granularity)
+        rolled_through = rollup_ctrl.get_rolled_through()
+        
+        return jsonify({
+            'message': 'Timeseries retrieved successfully',
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'granularity': granularity,
+            'rolled_through': rolled_through.isoformat() if rolled_through else None,
+            'series': series
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get timeseries: {str(e)}'}), 500
+
+
 @dashboard_bp.route('/dashboard/customers', methods=['GET'])
 @token_required
 def get_customers(current_user):
@@ -141,11 +184,9 @@ def get_service_jobs(current_user):
 @dashboard_bp.route('/dashboard/inventory', methods=['GET'])
 @token_required
 def get_inventory(current_user):
-    """Get all inventory items."""
+    """Get all inventory items (served from the inventory catalog cache)."""
     try:
-        with get_db_cursor() as cur:
-            cur.execute(f"SELECT * FROM {SCHEMA}.inventory ORDER BY part_name")
-            inventory = [dict(row) for row in cur.fetchall()]
+        inventory = inv_ctrl.get_all_items()
         
         return jsonify({
             'message': 'Inventory retrieved successfully',
@@ -181,84 +222,3 @@ def get_billing(current_user):
         
     except Exception as e:
         return jsonify({'error': f'Failed to get billing: {str(e)}'}), 500
-
-
-def get_dashboard_stats():
-    """Get summary statistics for the dashboard."""
-    print("[DEBUG] get_dashboard_stats() called")
-    try:
-        with get_db_cursor() as cur:
-            # Count customers
-            cur.execute("SELECT COUNT(*) as count FROM vehicle_service.customers")
-            customers_count = cur.fetchone()['count'] or 0
-            print(f"[DEBUG] customers_count = {customers_count}")
-            
-            # Count vehicles
-            cur.execute("SELECT COUNT(*) as count FROM vehicle_service.vehicles")
-            vehicles_count = cur.fetchone()['count'] or 0
-            print(f"[DEBUG] vehicles_count = {vehicles_count}")
-            
-            # Count pending service requests
-            cur.execute("SELECT COUNT(*) as count FROM vehicle_service.service_requests WHERE status = 'Pending'")
-            pending_requests = cur.fetchone()['count'] or 0
-            print(f"[DEBUG] pending_requests = {pending_requests}")
-            
-            # Count active service jobs (Pending OR In Progress)
-            cur.execute("SELECT COUNT(*) as count FROM vehicle_service.service_requests WHERE status IN ('Pending', 'In Progress')")
-            active_jobs = cur.fetchone()['count'] or 0
-            print(f"[DEBUG] active_jobs = {active_jobs}")
-            
-            # Count low stock inventory items
-            cur.execute("SELECT COUNT(*) as count FROM vehicle_service.inventory WHERE quantity_in_stock <= reorder_level")
-            low_stock = cur.fetchone()['count'] or 0
-            print(f"[DEBUG] low_stock = {low_stock}")
-            
-            # Total unpaid bills
-            cur.execute("SELECT COALESCE(SUM(total_amount), 0) as total FROM vehicle_service.billing WHERE payment_status = 'Unpaid'")
-            unpaid_total = cur.fetchone()['total'] or 0
-            print(f"[DEBUG] unpaid_total = {unpaid_total}")
-            
-            # Total revenue (paid bills)
-            cur.execute("SELECT COALESCE(SUM(total_amount), 0) as total FROM vehicle_service.billing WHERE payment_status = 'Paid'")
-            revenue_row = cur.fetchone()
-            total_revenue = revenue_row['total'] or 0
-            print(f"[DEBUG] total_revenue = {total_revenue}")
-            
-            # Top employees by rating (limit 3)
-            cur.execute("""
-                SELECT id, name, position, CAST(rating AS FLOAT) as rating, jobs_done 
-                FROM vehicle_service.employees 
-                WHERE working_status = 'Working'
-                ORDER BY rating DESC, jobs_done DESC 
-                LIMIT 3
-            """)
-            top_employees = [dict(row) for row in cur.fetchall()]
-            print(f"[DEBUG] top_employees = {top_employees}")
-        
-        stats = {
-            'customers_count': int(customers_count),
-            'vehicles_count': int(vehicles_count),
-            'pending_requests': int(pending_requests),
-            'active_jobs': int(active_jobs),
-            'low_stock_items': int(low_stock),
-            'unpaid_total': float(unpaid_total),
-            'total_revenue': float(total_revenue),
-            'top_employees': top_employees
-        }
-        print(f"[DEBUG] Final stats dict: {stats}")
-        return stats
-        
-    except Exception as e:
-        print(f"[DEBUG] ERROR in get_dashboard_stats: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'customers_count': 0,
-            'vehicles_count': 0,
-            'pending_requests': 0,
-            'active_jobs': 0,
-            'low_stock_items': 0,
-            'unpaid_total': 0.0,
-            'total_revenue': 0.0,
-            'top_employees': []
-        }
@@ -0,0 +1,53 @@
+"""
+Server-Sent Events API routes.
+"""
+import json
+import queue
+from flask import Blueprint, Response, current_app
+from utils.events import broker
+from utils.jwt_utils import stream_token_required
+
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+
+@events_bp.route('/stream', methods=['GET'])
+@stream_token_required
+def stream_events(current_user):
+    """
+    Stream shop change events (text/event-stream).
+    
+    Authenticate with the usual Authorization header, or with ?token=<jwt>
+    when using the browser's EventSource.
+    
+    Each message has an `event:` name (e.g. request.created, bill.paid,
+    inventory.updated) and a JSON `data:` payload with the affected ids.
+    A `resync` event means events may have been missed and the client
+    should refetch its data.
+    """
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    subscriber = broker.subscribe()
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            yield ': connected\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                yield (
+                    f"id: {event['seq']}\n"
+                    f"event: {event['type']}\n"
+                    f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+                )
+        finally:
+            broker.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -5,8 +5,10 @@ import os
 import uuid
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
+from config import Config
 from controllers import inventory as inv_ctrl
 from utils.jwt_utils import token_required
+from utils.http_cache import conditional_get
 
 inventory_bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
 
@@ -14,6 +16,9 @@ inventory_bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 UPLOAD_FOLDER = 'static/uploads/inventory'
 
+# Matches the CHECK on inventory.stock_stripes
+MAX_STOCK_STRIPES = 64
+
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
@@ -40,6 +45,7 @@ def save_image(file):
 
 @inventory_bp.route('', methods=['GET'])
 @token_required
+@conditional_get(*inv_ctrl.STOCK_TABLES, versions=inv_ctrl.catalog_table_versions)
 def get_all_items(current_user):
     """Get all inventory items."""
     try:
@@ -56,6 +62,7 @@ def get_all_items(current_user):
 
 @inventory_bp.route('/low-stock', methods=['GET'])
 @token_required
+@conditional_get(*inv_ctrl.STOCK_TABLES, versions=inv_ctrl.catalog_table_versions)
 def get_low_stock(current_user):
     """Get items where stock is at or below reorder level."""
     try:
@@ -71,8 +78,49 @@ def get_low_stock(current_user):
         return jsonify({'error': f'Failed to get low stock items: {str(e)}'}), 500
 
 
+@inventory_bp.route('/code/<string:part_code>', methods=['GET'])
+@token_required
+@conditional_get(*inv_ctrl.STOCK_TABLES, weak=False, versions=inv_ctrl.catalog_table_versions)
+def get_item_by_code(current_user, part_code):
+    """Get a single inventory item by part code (e.g. from a barcode scan)."""
+    try:
+        item = inv_ctrl.get_item_by_code(part_code)
+        
+        if not item:
+            return jsonify({'error': 'Item not found'}), 404
+        
+        return jsonify({
+            'message': 'Item retrieved successfully',
+            'item': item
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get item: {str(e)}'}), 500
+
+
+@inventory_bp.route('/cache-stats', methods=['GET'])
+@token_required
+def get_cache_stats(current_user):
+    """Get this process's inventory catalog cache counters."""
+    return jsonify({
+        'message': 'Cache stats retrieved successfully',
+        'cache': inv_ctrl.get_cache_stats()
+    }), 200
+
+
+@inventory_bp.route('/stock-write-stats', methods=['GET'])
+@token_required
+def get_stock_write_stats(current_user):
+    """Get this process's group-commit counters for stock updates (flush sizes, latencies)."""
+    return jsonify({
+        'message': 'Stock write stats retrieved successfully',
+        'stats': inv_ctrl.get_stock_write_stats()
+    }), 200
+
+
 @inventory_bp.route('/<int:part_id>', methods=['GET'])
 @token_required
+@conditional_get(*inv_ctrl.STOCK_TABLES, weak=False, versions=inv_ctrl.catalog_table_versions)
 def get_item(current_user, part_id):
     """Get a single inventory item."""
     try:
@@ -240,6 +288,15 @@ def update_stock(current_user, part_id):
     {
         "quantity": 50  (set to specific value)
     }
+    Optional:
+    {
+        "movement_type": "receipt" | "adjustment"  (for quantity_change; default
+                         receipt when positive, adjustment when negative),
+        "note": "Supplier delivery #123"
+    }
+    
+    Every change is recorded in the part's stock movements. Returns 409
+    when a negative quantity_change exceeds the stock left.
     """
     try:
         if not inv_ctrl.part_exists(part_id):
@@ -257,7 +314,15 @@ def update_stock(current_user, part_id):
             except ValueError:
                 return jsonify({'error': 'quantity_change must be an integer'}), 400
             
-            item = inv_ctrl.update_stock(part_id, quantity_change)
+            movement_type = data.get('movement_type')
+            if movement_type not in (None, 'receipt', 'adjustment'):
+                return jsonify({'error': 'movement_type must be receipt or adjustment'}), 400
+            
+            try:
+                item = inv_ctrl.update_stock(part_id, quantity_change, movement_type=movement_type,
+                                             note=data.get('note'))
+            except inv_ctrl.InsufficientStock as e:
+                return jsonify({'error': str(e), 'available': e.available}), 409
         elif 'quantity' in data:
             try:
                 new_quantity = int(data['quantity'])
@@ -267,7 +332,7 @@ def update_stock(current_user, part_id):
             if new_quantity < 0:
                 return jsonify({'error': 'quantity cannot be negative'}), 400
             
-            item = inv_ctrl.set_stock(part_id, new_quantity)
+            item = inv_ctrl.set_stock(part_id, new_quantity, note=data.get('note'))
         else:
             return jsonify({'error': 'Either quantity_change or quantity is required'}), 400
         
@@ -280,6 +345,81 @@ def update_stock(current_user, part_id):
         return jsonify({'error': f'Failed to update stock: {str(e)}'}), 500
 
 
+@inventory_bp.route('/<int:part_id>/stripes', methods=['PUT'])
+@token_required
+def set_stock_stripes(current_user, part_id):
+    """
+    Split a hot part's stock over several sub-rows so concurrent jobs
+    taking it do not queue on one row lock. The total stock is unchanged.
+    
+    Expected JSON (optional):
+    {
+        "stripes": 8  (0 to turn striping off; default STOCK_STRIPES)
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            stripes = int(data.get('stripes', Config.STOCK_STRIPES))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'stripes must be an integer'}), 400
+        
+        if not 0 <= stripes <= MAX_STOCK_STRIPES:
+            return jsonify({'error': f'stripes must be between 0 and {MAX_STOCK_STRIPES}'}), 400
+        
+        item = inv_ctrl.set_stock_stripes(part_id, stripes)
+        
+        if not item:
+            return jsonify({'error': 'Item not found'}), 404
+        
+        return jsonify({
+            'message': 'Stock stripes updated successfully',
+            'item': item
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to update stock stripes: {str(e)}'}), 500
+
+
+@inventory_bp.route('/<int:part_id>/movements', methods=['GET'])
+@token_required
+def get_stock_movements(current_user, part_id):
+    """
+    Get a part's stock movements (receipts, consumption, returns,
+    adjustments), newest first.
+    
+    Query params:
+        limit: Page size (default 50, max 200)
+        before: Return movements older than this movement_id (next page)
+        type: Only this movement type
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit', 50))
+            before = request.args.get('before')
+            before = int(before) if before else None
+        except ValueError:
+            return jsonify({'error': 'limit and before must be numbers'}), 400
+        limit = max(1, min(limit, 200))
+        
+        movement_type = request.args.get('type')
+        if movement_type and movement_type not in inv_ctrl.MOVEMENT_TYPES:
+            return jsonify({'error': f"type must be one of: {', '.join(inv_ctrl.MOVEMENT_TYPES)}"}), 400
+        
+        movements = inv_ctrl.get_stock_movements(part_id, limit=limit, before_id=before,
+                                                 movement_type=movement_type)
+        
+        return jsonify({
+            'message': 'Stock movements retrieved successfully',
+            'movements': movements,
+            'next_before': movements[-1]['movement_id'] if len(movements) == limit else None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get stock movements: {str(e)}'}), 500
+
+
 @inventory_bp.route('/<int:part_id>', methods=['DELETE'])
 @token_required
 def delete_item(current_user, part_id):
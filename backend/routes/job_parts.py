@@ -95,6 +95,103 @@ def add_part_to_job(current_user):
         return jsonify({'error': f'Failed to add part: {str(e)}'}), 500
 
 
+@job_parts_bp.route('/batch', methods=['POST'])
+@token_required
+def add_parts_to_job(current_user):
+    """
+    Add several parts to a job at once, all or nothing.
+    The job is given directly or resolved once from a vehicle plate.
+    
+    Expected JSON:
+    {
+        "job_id": 1,                 (or "plate_no" + "customer_id")
+        "parts": [
+            {"part_id": 5, "quantity_used": 2},
+            {"part_id": 9, "quantity_used": 1}
+        ]
+    }
+    
+    Returns every part now on the job and their total cost. When a part is
+    missing (404) or short (409) nothing is added and the response lists
+    each failing part.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        parts = data.get('parts')
+        if not parts or not isinstance(parts, list):
+            return jsonify({'error': 'parts must be a non-empty list'}), 400
+        if len(parts) > jp_ctrl.MAX_BATCH_PARTS:
+            return jsonify({'error': f'At most {jp_ctrl.MAX_BATCH_PARTS} parts per call'}), 400
+        
+        items = []
+        for part in parts:
+            try:
+                part_id = int(part['part_id'])
+                quantity_used = int(part['quantity_used'])
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'error': 'Each part needs integer part_id and quantity_used'}), 400
+            if quantity_used <= 0:
+                return jsonify({'error': 'quantity_used must be positive'}), 400
+            items.append((part_id, quantity_used))
+        
+        active_job = None
+        if data.get('job_id'):
+            try:
+                job_id = int(data['job_id'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'job_id must be an integer'}), 400
+            if not jp_ctrl.job_exists(job_id):
+                return jsonify({'error': 'Job not found'}), 404
+        else:
+            plate_no = data.get('plate_no')
+            customer_id = data.get('customer_id')
+            if not plate_no or not customer_id:
+                return jsonify({'error': 'job_id, or plate_no and customer_id, is required'}), 400
+            try:
+                customer_id = int(customer_id)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'customer_id must be an integer'}), 400
+            
+            active_job = jp_ctrl.get_active_job_by_plate_no(plate_no, customer_id)
+            if not active_job:
+                if not jp_ctrl.verify_vehicle_ownership(plate_no, customer_id):
+                    return jsonify({
+                        'error': f'Vehicle with plate "{plate_no}" does not belong to customer_id {customer_id}, or does not exist.'
+                    }), 404
+                return jsonify({
+                    'error': f'No active job found for vehicle "{plate_no}". Create a service request first.'
+                }), 404
+            job_id = active_job['job_id']
+        
+        result, errors = jp_ctrl.add_parts_to_job(job_id, items)
+        
+        if errors:
+            status = 404 if any(e['available'] is None for e in errors) else 409
+            return jsonify({'error': 'No parts were added', 'errors': errors}), status
+        
+        response = {
+            'message': 'Parts added to job successfully',
+            'job_id': job_id,
+            'parts': result['parts'],
+            'total_cost': result['total_cost']
+        }
+        if active_job:
+            response.update({
+                'customer_id': active_job.get('customer_id'),
+                'customer_name': active_job.get('customer_name'),
+                'service_type': active_job.get('service_type'),
+                'plate_no': active_job.get('plate_no')
+            })
+        return jsonify(response), 201
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to add parts: {str(e)}'}), 500
+
+
 @job_parts_bp.route('/<int:job_part_id>', methods=['DELETE'])
 @token_required
 def remove_part_from_job(current_user, job_part_id):
@@ -171,47 +268,30 @@ def add_part_for_vehicle(current_user):
         
         try:
             customer_id = int(customer_id)
+            part_id = int(part_id)
             quantity_used = int(quantity_used)
         except ValueError:
-            return jsonify({'error': 'customer_id and quantity_used must be integers'}), 400
+            return jsonify({'error': 'customer_id, part_id and quantity_used must be integers'}), 400
         
         if quantity_used <= 0:
             return jsonify({'error': 'quantity_used must be positive'}), 400
         
-        # TRIGGER 2 STEP 1: Verify plate_no belongs to customer_id
-        ownership = jp_ctrl.verify_vehicle_ownership(plate_no, customer_id)
-        if not ownership:
-            return jsonify({
-                'error': f'Vehicle with plate "{plate_no}" does not belong to customer_id {customer_id}, or does not exist.'
-            }), 404
-        
-        # TRIGGER 2 STEP 2: Find the active job for this vehicle
-        active_job = jp_ctrl.get_active_job_by_plate_no(plate_no, customer_id)
-        if not active_job:
-            return jsonify({
-                'error': f'No active job found for vehicle "{plate_no}". Create a service request first.'
-            }), 404
-        
-        job_id = active_job['job_id']
-        
-        # Validate part exists
-        if not jp_ctrl.part_exists(part_id):
-            return jsonify({'error': 'Part not found'}), 404
-        
-        # TRIGGER 2 STEP 3: Add part to job and update inventory
-        result, error = jp_ctrl.add_part_to_job(job_id, part_id, quantity_used)
+        # TRIGGER 2: verify ownership, find the active job, check the part and
+        # its stock, add the part and update inventory - all in one statement
+        result, error, status = jp_ctrl.add_part_for_vehicle(plate_no, customer_id, part_id, quantity_used)
         
         if error:
-            return jsonify({'error': error}), 400
+            return jsonify({'error': error}), status
         
+        job = result['job']
         return jsonify({
             'message': 'Part added to job successfully',
-            'job_id': job_id,
-            'customer_id': active_job.get('customer_id'),
-            'customer_name': active_job.get('customer_name'),
-            'service_type': active_job.get('service_type'),
-            'plate_no': active_job.get('plate_no'),
-            'job_part': result
+            'job_id': job['job_id'],
+            'customer_id': job['customer_id'],
+            'customer_name': job['customer_name'],
+            'service_type': job['service_type'],
+            'plate_no': job['plate_no'],
+            'job_part': result['job_part']
         }), 201
         
     except Exception as e:
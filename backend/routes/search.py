@@ -0,0 +1,45 @@
+"""
+Global search API route.
+"""
+from flask import Blueprint, request, jsonify
+from controllers import search as search_ctrl
+from db.listing import parse_csv_param
+from utils.jwt_utils import token_required
+
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+
+@search_bp.route('', methods=['GET'])
+@token_required
+def search(current_user):
+    """
+    Search customers, vehicles, service requests, parts and bills at once.
+    Query params:
+        q=<text>            required
+        types=<type,...>    customer, vehicle, request, part, bill (default: all)
+        limit=<n>           max hits (default 20, max 50)
+    """
+    try:
+        q = request.args.get('q', '').strip()
+        if not q:
+            return jsonify({'error': 'q is required'}), 400
+        
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+        
+        try:
+            result = search_ctrl.search(q, types=parse_csv_param(request.args.get('types')), limit=limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'message': 'Search completed',
+            'query': q,
+            'hits': result['hits'],
+            'timed_out': result['timed_out']
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Search failed: {str(e)}'}), 500
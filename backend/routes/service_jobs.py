@@ -4,7 +4,11 @@ Service Jobs API routes.
 from flask import Blueprint, request, jsonify
 from controllers import service_jobs as job_ctrl
 from controllers import employees as emp_ctrl
+from controllers import assignment as assign_ctrl
+from controllers import status_history as history_ctrl
+from db.listing import parse_csv_param
 from utils.jwt_utils import token_required
+from utils.http_cache import conditional_get
 
 service_jobs_bp = Blueprint('service_jobs', __name__, url_prefix='/api/jobs')
 
@@ -12,27 +16,83 @@ service_jobs_bp = Blueprint('service_jobs', __name__, url_prefix='/api/jobs')
 @service_jobs_bp.route('', methods=['GET'])
 @token_required
 def get_all_jobs(current_user):
-    """Get all service jobs with employee and vehicle info."""
+    """
+    Get all service jobs with employee and vehicle info.
+    
+    Filters (all optional, combined with AND in one query):
+        status=<s,...>  priority=<p,...>  service_type=<t,...>
+        date_from=<YYYY-MM-DD>  date_to=<YYYY-MM-DD>  (job start time)
+        employee_id=<id>  request_id=<id>  customer_id=<id>  vehicle_id=<id>
+        pending_billing=true  search=<term>
+    Sorting:
+        sort=<field,...>    e.g. sort=-start_time (- for descending)
+    
+    Sparse views:
+        fields=<name,...>   only return these columns (e.g. fields=job_id,job_status,plate_no)
+        expand=<rel,...>    add related columns: employee, request, vehicle, customer
+    
+    Facets:
+        facets=<name,...>   grouped counts: status, priority, service_type, employee_id
+                            (each ignores its own filter, so tabs show every value)
+    """
     try:
-        status_filter = request.args.get('status')
-        pending_billing = request.args.get('pending_billing')
-        
-        if pending_billing == 'true':
-            jobs = job_ctrl.get_completed_jobs_without_bills()
-        elif status_filter:
-            jobs = job_ctrl.get_jobs_by_status(status_filter)
+        fields = parse_csv_param(request.args.get('fields'))
+        expand = parse_csv_param(request.args.get('expand'))
+        sort = request.args.get('sort')
+        facets = parse_csv_param(request.args.get('facets'))
+        filtered = any(request.args.get(name) for name in job_ctrl.JOB_LISTING.filters)
+        facet_counts = None
+        
+        if fields or expand or sort or facets or filtered:
+            try:
+                jobs, facet_counts = job_ctrl.list_jobs(
+                    fields=fields, expand=expand, filters=request.args, sort=sort, facets=facets
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         else:
             jobs = job_ctrl.get_all_jobs()
         
-        return jsonify({
+        response = {
             'message': 'Service jobs retrieved successfully',
             'jobs': jobs
-        }), 200
+        }
+        if facet_counts:
+            response['facets'] = facet_counts
+        
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to get jobs: {str(e)}'}), 500
 
 
+@service_jobs_bp.route('/board', methods=['GET'])
+@token_required
+@conditional_get('service_jobs', 'billing', 'service_requests', 'vehicles', 'customers', 'employees')
+def get_job_board(current_user):
+    """
+    Get the job board: per-column job lists and exact counts in one response.
+    Columns: in_progress, pending_billing (completed, no bill yet), completed (billed)
+    Query params: limit=<n> jobs per column (default 20, max 100)
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+        limit = max(1, min(limit, 100))
+        
+        board = job_ctrl.get_job_board(limit)
+        
+        return jsonify({
+            'message': 'Job board retrieved successfully',
+            'board': board
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get job board: {str(e)}'}), 500
+
+
 @service_jobs_bp.route('/<int:job_id>', methods=['GET'])
 @token_required
 def get_job(current_user, job_id):
@@ -144,11 +204,131 @@ def assign_employee(current_user, job_id):
         return jsonify({'error': f'Failed to assign employee: {str(e)}'}), 500
 
 
+@service_jobs_bp.route('/<int:job_id>/auto-assign', methods=['POST'])
+@token_required
+def auto_assign_job(current_user, job_id):
+    """
+    Assign the least-loaded technician whose position matches the job's
+    service type (any available technician when none matches).
+    The job must be In Progress and not yet assigned.
+    """
+    try:
+        if not job_ctrl.job_exists(job_id):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        try:
+            job = assign_ctrl.auto_assign_job(job_id)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 409
+        
+        if not job:
+            return jsonify({'error': 'Job is already assigned or not in progress'}), 409
+        
+        return jsonify({
+            'message': 'Technician assigned successfully',
+            'job': job
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to assign technician: {str(e)}'}), 500
+
+
+@service_jobs_bp.route('/auto-assign', methods=['POST'])
+@token_required
+def auto_assign_pending(current_user):
+    """
+    Assign technicians to every open job without one, highest priority and
+    oldest first, spreading the work by current load.
+    
+    Expected JSON (optional):
+    {
+        "limit": 100  (max jobs to assign, default 100, max 1000)
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            limit = int(data.get('limit', 100))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit must be a number'}), 400
+        limit = max(1, min(limit, 1000))
+        
+        result = assign_ctrl.auto_assign_pending(limit)
+        
+        return jsonify({
+            'message': f"Assigned {len(result['assigned'])} job(s)",
+            **result
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to assign pending jobs: {str(e)}'}), 500
+
+
+@service_jobs_bp.route('/next', methods=['POST'])
+@token_required
+def claim_next_job(current_user):
+    """
+    Claim the highest-priority, oldest unassigned job.
+    Concurrent callers never receive the same job.
+    
+    Expected JSON (optional):
+    {
+        "employee_id": 2,  (default: the logged-in employee)
+        "service_types": ["Oil Change", "Brake Service"]  (default: any)
+    }
+    
+    Returns 204 when there is no unassigned job.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            employee_id = int(data.get('employee_id') or current_user['id'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'employee_id must be a number'}), 400
+        if employee_id != current_user['id'] and not emp_ctrl.employee_exists(employee_id):
+            return jsonify({'error': 'Employee not found'}), 404
+        
+        service_types = data.get('service_types')
+        if isinstance(service_types, str):
+            service_types = parse_csv_param(service_types)
+        if service_types is not None and not isinstance(service_types, list):
+            return jsonify({'error': 'service_types must be a list'}), 400
+        
+        job = assign_ctrl.claim_next_job(employee_id, service_types)
+        
+        if not job:
+            return '', 204
+        
+        return jsonify({
+            'message': 'Job claimed successfully',
+            'job': job
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to claim next job: {str(e)}'}), 500
+
+
+@service_jobs_bp.route('/workload', methods=['GET'])
+@token_required
+def get_workload(current_user):
+    """Get each employee's open jobs and estimated remaining hours."""
+    try:
+        return jsonify({
+            'message': 'Workload retrieved successfully',
+            'workload': assign_ctrl.get_workload()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get workload: {str(e)}'}), 500
+
+
 @service_jobs_bp.route('/<int:job_id>/status', methods=['PUT'])
 @token_required
 def update_status(current_user, job_id):
     """
     Update job status.
+    A status change the transition rules do not allow returns 409.
     
     Expected JSON:
     {
@@ -181,10 +361,29 @@ def update_status(current_user, job_id):
             'job': job
         }), 200
         
+    except history_ctrl.InvalidTransition as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': f'Failed to update status: {str(e)}'}), 500
 
 
+@service_jobs_bp.route('/<int:job_id>/history', methods=['GET'])
+@token_required
+def get_job_history(current_user, job_id):
+    """Get the status changes of a job with the time spent in each status."""
+    try:
+        if not job_ctrl.job_exists(job_id):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'message': 'Status history retrieved successfully',
+            'history': history_ctrl.get_history('job', job_id)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get status history: {str(e)}'}), 500
+
+
 @service_jobs_bp.route('/<int:job_id>/labor', methods=['PUT'])
 @token_required
 def update_labor(current_user, job_id):
@@ -4,7 +4,9 @@ Service Requests API routes.
 from flask import Blueprint, request, jsonify
 from controllers import service_requests as sr_ctrl
 from controllers import vehicles as veh_ctrl
-from controllers import customers as cust_ctrl
+from controllers import history_import as import_ctrl
+from controllers import status_history as history_ctrl
+from db.listing import parse_csv_param
 from utils.jwt_utils import token_required
 
 service_requests_bp = Blueprint('service_requests', __name__, url_prefix='/api/service-requests')
@@ -15,32 +17,56 @@ service_requests_bp = Blueprint('service_requests', __name__, url_prefix='/api/s
 def get_all_requests(current_user):
     """
     Get all service requests with full details.
-    Query params: status=<status>, search=<term>, customer_id=<id>, vehicle_id=<id>
+    
+    Filters (all optional, combined with AND in one query):
+        status=<s,...>  priority=<p,...>  service_type=<t,...>
+        date_from=<YYYY-MM-DD>  date_to=<YYYY-MM-DD>
+        customer_id=<id>  vehicle_id=<id>  employee_id=<id>  search=<term>
+    Sorting:
+        sort=<field,...>    e.g. sort=-priority,request_date (- for descending)
+    
+    Sparse views:
+        fields=<name,...>   only return these columns (e.g. fields=request_id,status,plate_no)
+        expand=<rel,...>    add related columns: vehicle, customer, job, employee
+    Only the tables needed for the selected columns, filters and sort are joined.
+    
+    Facets:
+        facets=<name,...>   grouped counts: status, priority, service_type, employee_id
+                            (each ignores its own filter, so tabs show every value)
     """
     try:
-        status_filter = request.args.get('status')
-        search_term = request.args.get('search')
-        customer_id = request.args.get('customer_id')
-        vehicle_id = request.args.get('vehicle_id')
         include_employees = request.args.get('include_employees', 'false').lower() == 'true'
-        
-        if status_filter:
-            requests_list = sr_ctrl.get_requests_by_status(status_filter)
-        elif search_term:
-            requests_list = sr_ctrl.search_requests(search_term)
-        elif customer_id:
-            requests_list = sr_ctrl.get_requests_by_customer(int(customer_id))
-        elif vehicle_id:
-            requests_list = sr_ctrl.get_requests_by_vehicle(int(vehicle_id))
+        fields = parse_csv_param(request.args.get('fields'))
+        expand = parse_csv_param(request.args.get('expand'))
+        sort = request.args.get('sort')
+        facets = parse_csv_param(request.args.get('facets'))
+        filtered = any(request.args.get(name) for name in sr_ctrl.REQUEST_LISTING.filters)
+        facet_counts = None
+        
+        if fields or expand or sort or facets or filtered:
+            try:
+                requests_list, facet_counts = sr_ctrl.list_requests(
+                    fields=fields,
+                    expand=expand,
+                    filters=request.args,
+                    sort=sort,
+                    facets=facets
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         elif include_employees:
             requests_list = sr_ctrl.get_all_requests_with_employees()
         else:
             requests_list = sr_ctrl.get_all_requests()
         
-        return jsonify({
+        response = {
             'message': 'Service requests retrieved successfully',
             'requests': requests_list
-        }), 200
+        }
+        if facet_counts:
+            response['facets'] = facet_counts
+        
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to get service requests: {str(e)}'}), 500
@@ -82,10 +108,14 @@ def create_request(current_user):
         "service_type": "Engine Repair",
         "problem_note": "Engine making noise",  (optional)
         "priority": "High",  (optional, default: "Normal")
-        "status": "Pending"  (optional, default: "Pending")
+        "status": "Pending",  (optional, default: "Pending")
+        "assigned_employee_id": 2,  (optional)
+        "auto_assign": true  (optional: assign the least-loaded suitable technician
+                              when assigned_employee_id is not given)
     }
     
-    OR for creating with new customer and vehicle:
+    OR for a walk-in with customer and vehicle (created in the same transaction,
+    or reused when the phone / plate number is already known):
     {
         "customer": {
             "name": "John Doe",
@@ -113,39 +143,57 @@ def create_request(current_user):
         
         vehicle_id = data.get('vehicle_id')
         
-        # Check if creating with nested customer/vehicle data
+        service_type = data.get('service_type')
+        if not service_type or not service_type.strip():
+            return jsonify({'error': 'service_type is required'}), 400
+        
+        # Get assigned employee ID (optional but recommended)
+        assigned_employee_id = data.get('assigned_employee_id')
+        if assigned_employee_id:
+            assigned_employee_id = int(assigned_employee_id)
+        else:
+            assigned_employee_id = None
+        auto_assign = bool(data.get('auto_assign', False))
+        
+        # Walk-in with nested customer/vehicle data: one atomic intake
         if not vehicle_id and 'customer' in data and 'vehicle' in data:
-            # Create customer first
             cust_data = data.get('customer')
             if not cust_data.get('name') or not cust_data.get('phone') or not cust_data.get('email') or not cust_data.get('address'):
                 return jsonify({'error': 'Customer name, phone, email, and address are required'}), 400
             
-            customer = cust_ctrl.create_customer(
-                name=cust_data['name'].strip(),
-                phone=cust_data['phone'].strip(),
-                email=cust_data['email'].strip(),
-                address=cust_data['address'].strip()
-            )
-            if not customer:
-                return jsonify({'error': 'Failed to create customer'}), 500
-            
-            # Create vehicle
             veh_data = data.get('vehicle')
             if not veh_data.get('plate_no') or not veh_data.get('brand') or not veh_data.get('model') or not veh_data.get('year') or not veh_data.get('color'):
                 return jsonify({'error': 'Vehicle plate_no, brand, model, year, and color are required'}), 400
             
-            vehicle = veh_ctrl.create_vehicle(
-                plate_no=veh_data['plate_no'].strip(),
-                brand=veh_data['brand'].strip(),
-                model=veh_data['model'].strip(),
-                year=int(veh_data['year']),
-                color=veh_data['color'].strip(),
-                customer_id=customer['customer_id']
-            )
-            if not vehicle:
-                return jsonify({'error': 'Failed to create vehicle'}), 500
+            try:
+                full_request = sr_ctrl.create_walk_in_request(
+                    customer={
+                        'name': cust_data['name'].strip(),
+                        'phone': cust_data['phone'].strip(),
+                        'email': cust_data['email'].strip(),
+                        'address': cust_data['address'].strip()
+                    },
+                    vehicle={
+                        'plate_no': veh_data['plate_no'].strip(),
+                        'brand': veh_data['brand'].strip(),
+                        'model': veh_data['model'].strip(),
+                        'year': int(veh_data['year']),
+                        'color': veh_data['color'].strip()
+                    },
+                    service_type=service_type.strip(),
+                    problem_note=data.get('problem_note'),
+                    priority=data.get('priority', 'Normal'),
+                    status=data.get('status', 'Pending'),
+                    assigned_employee_id=assigned_employee_id,
+                    auto_assign=auto_assign
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 409
             
-            vehicle_id = vehicle['vehicle_id']
+            return jsonify({
+                'message': 'Service request created successfully',
+                'request': full_request
+            }), 201
         
         if not vehicle_id:
             return jsonify({'error': 'vehicle_id is required'}), 400
@@ -154,22 +202,14 @@ def create_request(current_user):
         if not veh_ctrl.vehicle_exists(vehicle_id):
             return jsonify({'error': 'Vehicle not found'}), 404
         
-        service_type = data.get('service_type')
-        if not service_type or not service_type.strip():
-            return jsonify({'error': 'service_type is required'}), 400
-        
-        # Get assigned employee ID (optional but recommended)
-        assigned_employee_id = data.get('assigned_employee_id')
-        if assigned_employee_id:
-            assigned_employee_id = int(assigned_employee_id)
-        
         service_request = sr_ctrl.create_request(
             vehicle_id=vehicle_id,
             service_type=service_type.strip(),
             problem_note=data.get('problem_note'),
             priority=data.get('priority', 'Normal'),
             status=data.get('status', 'Pending'),
-            assigned_employee_id=assigned_employee_id
+            assigned_employee_id=assigned_employee_id,
+            auto_assign=auto_assign
         )
         
         if not service_request:
@@ -190,12 +230,48 @@ def create_request(current_user):
         return jsonify({'error': f'Failed to create service request: {error_msg}'}), 500
 
 
+@service_requests_bp.route('/import', methods=['POST'])
+@token_required
+def import_requests(current_user):
+    """
+    Bulk import historical service records from a CSV request body
+    (Content-Type: text/csv). The body is streamed into the database,
+    never held in memory. For very large files prefer the CLI:
+    python import_history.py <file> --source <name>
+    
+    Query params: source=<name> (required), batch_size=<n>
+    """
+    try:
+        source = request.args.get('source', '').strip()
+        if not source:
+            return jsonify({'error': 'source is required'}), 400
+        
+        try:
+            batch_size = int(request.args.get('batch_size', 5000))
+        except ValueError:
+            return jsonify({'error': 'batch_size must be a number'}), 400
+        
+        try:
+            summary = import_ctrl.import_history(request.stream, source, batch_size=batch_size)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'message': 'Import completed',
+            'summary': summary
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to import service history: {str(e)}'}), 500
+
+
 @service_requests_bp.route('/<int:request_id>', methods=['PUT'])
 @token_required
 def update_request(current_user, request_id):
     """
     Update a service request.
     If status is changed to 'Completed', triggers auto-billing.
+    A status change the transition rules do not allow returns 409.
     
     Expected JSON (all fields optional):
     {
@@ -221,50 +297,48 @@ def update_request(current_user, request_id):
         if vehicle_id and not veh_ctrl.vehicle_exists(vehicle_id):
             return jsonify({'error': 'Vehicle not found'}), 404
         
-        # Get the old status to detect if status is changing to Completed
-        old_request = sr_ctrl.get_request_by_id(request_id)
-        old_status = old_request.get('status') if old_request else None
         new_status = data.get('status')
         
-        service_request = sr_ctrl.update_request(
-            request_id=request_id,
-            service_type=data.get('service_type'),
-            problem_note=data.get('problem_note'),
-            priority=data.get('priority'),
-            status=new_status,
-            vehicle_id=vehicle_id
-        )
-        
-        # TRIGGER 3: If status changed to Completed, trigger auto-billing
-        bill = None
-        job = None
-        if new_status == 'Completed' and old_status != 'Completed':
-            from controllers import service_jobs as job_ctrl
-            from controllers import billing as billing_ctrl
-            from datetime import datetime
-            
+        # TRIGGER 3: Completing the request closes its job and generates the bill
+        # in the same transaction
+        if new_status == 'Completed':
             labor_charge = data.get('labor_charge', 0.00)
             try:
                 labor_charge = float(labor_charge)
             except (ValueError, TypeError):
                 labor_charge = 0.00
             
-            # Find the job for this request
-            job = sr_ctrl.get_job_for_request(request_id)
+            completion = sr_ctrl.complete_request(
+                request_id,
+                labor_charge=labor_charge,
+                recomplete=False,
+                service_type=data.get('service_type'),
+                problem_note=data.get('problem_note'),
+                priority=data.get('priority'),
+                vehicle_id=vehicle_id
+            )
+            if not completion:
+                return jsonify({'error': 'Service request not found'}), 404
             
-            if job:
-                job_id = job['job_id']
-                
-                # Update labor_charge on the job
-                job_ctrl.update_labor_charge(job_id, labor_charge)
-                
-                # Update job status to Completed with end_time
-                job_ctrl.update_job_status(job_id, 'Completed', datetime.now())
-                
-                # Generate the bill automatically
-                bill_result, bill_error = billing_ctrl.generate_bill(job_id)
-                if bill_result:
-                    bill = billing_ctrl.get_bill_by_id(bill_result['bill_id'])
+            response = {
+                'message': 'Service request updated successfully',
+                'request': completion['request']
+            }
+            if completion['job']:
+                response['job'] = completion['job']
+            if completion['bill']:
+                response['bill'] = completion['bill']
+                response['message'] = 'Service request completed and bill generated successfully'
+            return jsonify(response), 200
+        
+        sr_ctrl.update_request(
+            request_id=request_id,
+            service_type=data.get('service_type'),
+            problem_note=data.get('problem_note'),
+            priority=data.get('priority'),
+            status=new_status,
+            vehicle_id=vehicle_id
+        )
         
         # Return full request details
         full_request = sr_ctrl.get_request_by_id(request_id)
@@ -274,15 +348,10 @@ def update_request(current_user, request_id):
             'request': full_request
         }
         
-        if job:
-            response['job'] = job
-        
-        if bill:
-            response['bill'] = bill
-            response['message'] = 'Service request completed and bill generated successfully'
-        
         return jsonify(response), 200
         
+    except history_ctrl.InvalidTransition as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': f'Failed to update service request: {str(e)}'}), 500
 
@@ -293,6 +362,7 @@ def update_request_status(current_user, request_id):
     """
     TRIGGER 3: Update service request status.
     When status is 'Completed', automatically completes the job and generates a bill.
+    A status change the transition rules do not allow returns 409.
     
     Expected JSON:
     {
@@ -325,37 +395,20 @@ def update_request_status(current_user, request_id):
         except (ValueError, TypeError):
             labor_charge = 0.00
         
-        # Update the service request status
-        service_request = sr_ctrl.update_request_status(request_id, status)
-        
-        # TRIGGER 3: If status is Completed, complete job and generate bill
+        # TRIGGER 3: If status is Completed, complete the job and generate the bill
+        # in one transaction. The bill is:
+        # subtotal_parts = SUM(quantity_used * unit_price_at_time), tax = 18% of (labor + parts)
         bill = None
         job = None
         if status == 'Completed':
-            from controllers import service_jobs as job_ctrl
-            from controllers import billing as billing_ctrl
-            from datetime import datetime
-            
-            # Find the job for this request
-            job = sr_ctrl.get_job_for_request(request_id)
-            
-            if job:
-                job_id = job['job_id']
-                
-                # TRIGGER 3 STEP 1: Update labor_charge on the job
-                job_ctrl.update_labor_charge(job_id, labor_charge)
-                
-                # TRIGGER 3 STEP 2: Update job status to Completed with end_time
-                updated_job = job_ctrl.update_job_status(job_id, 'Completed', datetime.now())
-                
-                # TRIGGER 3 STEP 3: Generate the bill automatically
-                # This calculates: subtotal_parts = SUM(quantity_used * unit_price_at_time)
-                # tax = 18% of (labor + parts)
-                bill_result, bill_error = billing_ctrl.generate_bill(job_id)
-                if bill_result:
-                    bill = bill_result
-                    # Fetch full bill details for response
-                    bill = billing_ctrl.get_bill_by_id(bill['bill_id'])
+            completion = sr_ctrl.complete_request(request_id, labor_charge=labor_charge)
+            if not completion:
+                return jsonify({'error': 'Service request not found'}), 404
+            service_request = completion['request']
+            job = completion['job']
+            bill = completion['bill']
+        else:
+            service_request = sr_ctrl.update_request_status(request_id, status)
         
         response = {
             'message': 'Status updated successfully',
@@ -371,10 +424,29 @@ def update_request_status(current_user, request_id):
         
         return jsonify(response), 200
         
+    except history_ctrl.InvalidTransition as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         return jsonify({'error': f'Failed to update status: {str(e)}'}), 500
 
 
+@service_requests_bp.route('/<int:request_id>/history', methods=['GET'])
+@token_required
+def get_request_history(current_user, request_id):
+    """Get the status changes of a service request with the time spent in each status."""
+    try:
+        if not sr_ctrl.request_exists(request_id):
+            return jsonify({'error': 'Service request not found'}), 404
+        
+        return jsonify({
+            'message': 'Status history retrieved successfully',
+            'history': history_ctrl.get_history('request', request_id)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get status history: {str(e)}'}), 500
+
+
 @service_requests_bp.route('/<int:request_id>', methods=['DELETE'])
 @token_required
 def delete_request(current_user, request_id):
@@ -5,12 +5,14 @@ from flask import Blueprint, request, jsonify
 from controllers import vehicles as veh_ctrl
 from controllers import customers as cust_ctrl
 from utils.jwt_utils import token_required
+from utils.http_cache import conditional_get
 
 vehicles_bp = Blueprint('vehicles', __name__, url_prefix='/api/vehicles')
 
 
 @vehicles_bp.route('', methods=['GET'])
 @token_required
+@conditional_get('vehicles', 'customers')
 def get_all_vehicles(current_user):
     """Get all vehicles. Query params: search=<term>, customer_id=<id>"""
     try:
@@ -35,6 +37,7 @@ def get_all_vehicles(current_user):
 
 @vehicles_bp.route('/<int:vehicle_id>', methods=['GET'])
 @token_required
+@conditional_get('vehicles', 'customers', weak=False)
 def get_vehicle(current_user, vehicle_id):
     """Get a single vehicle by ID."""
     try:
@@ -54,6 +57,7 @@ def get_vehicle(current_user, vehicle_id):
 
 @vehicles_bp.route('/plate/<plate_no>', methods=['GET'])
 @token_required
+@conditional_get('vehicles', 'customers', weak=False)
 def get_vehicle_by_plate(current_user, plate_no):
     """Get a vehicle by plate number."""
     try:
@@ -9,6 +9,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from db.connection import get_db_connection
+from controllers.dashboard import apply_counter_deltas, is_low_stock
 
 SEED_DATA = [
     ('Engine Cylinder', 'EC2022', 'EnginePro', 15000.00, 30, 'pcs', 10, 'High-quality engine cylinder for 2022 models', '/static/uploads/inventory/image1.png'),
@@ -36,11 +37,20 @@ def seed_inventory():
                     continue
                 
                 cur.execute("""
-                    INSERT INTO vehicle_service.inventory 
-                        (part_name, part_code, brand, unit_price, quantity_in_stock, 
-                         quantity_label, reorder_level, description, image_url, last_updated)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    WITH item AS (
+                        INSERT INTO vehicle_service.inventory 
+                            (part_name, part_code, brand, unit_price, quantity_in_stock, 
+                             quantity_label, reorder_level, description, image_url, last_updated)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                        RETURNING part_id, quantity_in_stock
+                    )
+                    INSERT INTO vehicle_service.stock_movements (part_id, movement_type, quantity, balance_after, note)
+                    SELECT part_id, 'receipt', quantity_in_stock, quantity_in_stock, 'Opening balance'
+                    FROM item
+                    WHERE quantity_in_stock > 0
                 """, item)
+                if is_low_stock(item[4], item[6]):
+                    apply_counter_deltas(cur, low_stock_items=1)
                 print(f"  Inserted: {item[0]} ({item[1]})")
     
     print("Inventory seeding completed!")
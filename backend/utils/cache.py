@@ -0,0 +1,354 @@
+"""
+In-process caching helpers.
+"""
+import threading
+from collections import OrderedDict
+import time
+
+
+class _Flight:
+    """A computation in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe cache whose entries expire after `ttl` seconds.
+
+    get_or_compute() is single-flight: when an entry is missing or expired,
+    only the first caller runs the computation and concurrent callers for
+    the same key wait for its result instead of recomputing.
+
+    invalidate() bumps a generation number, so a computation that started
+    before the invalidation is returned to its callers but not stored.
+
+    Usage:
+        cache = TTLCache(ttl=5)
+        stats = cache.get_or_compute('stats', compute_stats)
+        cache.invalidate()
+    """
+
+    def __init__(self, ttl, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing it at most once if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self._hits += 1
+                return entry[0]
+
+            self._misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                generation = self._generation
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and generation == self._generation and self.ttl > 0:
+                    now = self._clock()
+                    # Drop expired entries so keys that are not asked again do not pile up
+                    for stale in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                        del self._entries[stale]
+                    self._entries[key] = (flight.value, now + self.ttl)
+            flight.event.set()
+
+        return flight.value
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key when key is None."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'ttl': self.ttl
+            }
+
+
+class CatalogCache:
+    """
+    Bounded, versioned in-process copy of a catalog table, keyed by its
+    primary key and a unique alternate key (e.g. part_id and part_code).
+
+    Reads are read-through: a missing entry is loaded with load_one and
+    kept; all() loads the whole catalog once and serves it from memory
+    while it fits in max_items. Writers in this process call put() /
+    remove() after their transaction commits, so their own changes show
+    up immediately. Changes made by other processes are detected through
+    get_version() (a cheap change marker), checked at most every
+    check_interval seconds. On a new version, load_changed (when given)
+    re-reads only the entries changed since the previous check; without it
+    every entry is dropped.
+
+    load_changed(since) returns (items, keys, mark): the items changed
+    since `since`, every existing key, and the mark to pass next time.
+    With since=None only the mark is needed.
+
+    A load that was running while entries were refreshed, dropped or
+    written through may be older than them, so it is returned to its
+    caller but not stored.
+
+    At most max_items entries are kept; the least recently used entry is
+    evicted first.
+
+    Usage:
+        catalog = CatalogCache(load_all, load_one, get_version, key='part_id', alt_key='part_code',
+                               load_changed=load_changed)
+        item = catalog.get(7)
+        item = catalog.get_by_alt('BP-001')
+        catalog.put(updated_item)
+    """
+
+    def __init__(self, load_all, load_one, get_version, key, alt_key=None, load_changed=None,
+                 sort_key=None, max_items=5000, check_interval=1.0, clock=time.monotonic):
+        self._load_all = load_all
+        self._load_one = load_one
+        self._get_version = get_version
+        self._load_changed = load_changed
+        self.key = key
+        self.alt_key = alt_key
+        self._sort_key = sort_key
+        self.max_items = max_items
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._alt_index = {}
+        self._complete = False
+        self._sorted = None
+        self._version = None
+        self._since = None
+        self._generation = 0
+        self._checked_at = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._refreshes = 0
+
+    def _check_version(self, force=False):
+        """Refresh (or drop) the entries when the catalog changed since the last check."""
+        now = self._clock()
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            old_version, since = self._version, self._since
+        version = self._get_version()
+        if version == old_version:
+            return
+
+        if self._load_changed is None:
+            items = keys = mark = None
+        else:
+            items, keys, mark = self._load_changed(since)
+        with self._lock:
+            if self._version != old_version:
+                # Another caller already moved to a newer version
+                return
+            if since is not None and items is not None:
+                self._refresh(items, keys)
+                self._refreshes += 1
+            else:
+                if old_version is not None:
+                    self._invalidations += 1
+                self._clear()
+            self._version = version
+            self._since = mark
+
+    def sync(self, version):
+        """
+        Catch up now when `version` (e.g. just read for an ETag) differs from
+        the one the entries were checked at, instead of at the next check.
+        """
+        with self._lock:
+            if version == self._version:
+                return
+        self._check_version(force=True)
+
+    def _refresh(self, items, keys):
+        """Apply changed items and drop deleted keys. Caller holds the lock."""
+        live = set(keys)
+        for key in [key for key in self._entries if key not in live]:
+            item = self._entries.pop(key)
+            if self.alt_key:
+                self._alt_index.pop(item.get(self.alt_key), None)
+        for item in items:
+            if self._complete or item[self.key] in self._entries:
+                self._store(item)
+        if self._complete and len(self._entries) != len(live):
+            self._complete = False
+        self._sorted = None
+        self._generation += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._alt_index.clear()
+        self._complete = False
+        self._sorted = None
+        self._generation += 1
+
+    def _store(self, item):
+        """Insert or replace one entry and evict beyond max_items. Caller holds the lock."""
+        key = item[self.key]
+        old = self._entries.pop(key, None)
+        if old is not None and self.alt_key:
+            self._alt_index.pop(old.get(self.alt_key), None)
+        self._entries[key] = item
+        if self.alt_key and item.get(self.alt_key) is not None:
+            self._alt_index[item[self.alt_key]] = key
+        self._sorted = None
+        while len(self._entries) > self.max_items:
+            _, evicted = self._entries.popitem(last=False)
+            if self.alt_key:
+                self._alt_index.pop(evicted.get(self.alt_key), None)
+            self._evictions += 1
+            self._complete = False
+
+    def get(self, key):
+        """Get one entry by primary key (a copy), or None if it does not exist."""
+        self._check_version()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return dict(item)
+            self._misses += 1
+            if self._complete:
+                # The whole catalog is loaded, so the key does not exist
+                return None
+            generation = self._generation
+
+        item = self._load_one(self.key, key)
+        if item is None:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._store(item)
+        return dict(item)
+
+    def get_by_alt(self, alt_value):
+        """Get one entry by the alternate key (a copy), or None."""
+        self._check_version()
+        with self._lock:
+            key = self._alt_index.get(alt_value)
+            if key is not None and key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return dict(self._entries[key])
+            self._misses += 1
+            if self._complete:
+                return None
+            generation = self._generation
+
+        item = self._load_one(self.alt_key, alt_value)
+        if item is None:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._store(item)
+        return dict(item)
+
+    def all(self):
+        """Get every entry (copies), ordered by sort_key when given."""
+        self._check_version()
+        with self._lock:
+            if self._complete:
+                self._hits += 1
+                if self._sorted is None:
+                    self._sorted = list(self._entries.values())
+                    if self._sort_key:
+                        self._sorted.sort(key=self._sort_key)
+                return [dict(item) for item in self._sorted]
+            self._misses += 1
+            generation = self._generation
+
+        items = self._load_all()
+        if len(items) <= self.max_items:
+            with self._lock:
+                if generation != self._generation:
+                    return [dict(item) for item in items]
+                self._clear()
+                for item in items:
+                    self._store(item)
+                self._complete = True
+        return [dict(item) for item in items]
+
+    def put(self, item):
+        """Write through one created or updated entry."""
+        with self._lock:
+            self._store(dict(item))
+            self._generation += 1
+
+    def remove(self, key, deleted=True):
+        """
+        Write through one deleted entry. With deleted=False the entry is only
+        dropped (its new state is unknown) and reloaded on the next read.
+        """
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is not None and self.alt_key:
+                self._alt_index.pop(item.get(self.alt_key), None)
+            self._sorted = None
+            self._generation += 1
+            if not deleted:
+                self._complete = False
+
+    def invalidate(self):
+        """Drop every entry."""
+        with self._lock:
+            self._clear()
+            self._invalidations += 1
+
+    def stats(self):
+        """Return hit/miss/eviction counters, size and bounds."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_items': self.max_items,
+                'complete': self._complete,
+                'version': self._version,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'refreshes': self._refreshes,
+                'invalidations': self._invalidations
+            }
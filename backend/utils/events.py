@@ -0,0 +1,125 @@
+"""
+Shop change events over Postgres LISTEN/NOTIFY.
+
+Write paths call publish() with their own cursor, so the NOTIFY is sent
+only when their transaction commits. Each worker process runs a single
+EventBroker thread that LISTENs on the channel and fans every event out
+to the Server-Sent Events subscribers connected to that worker.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from db.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'autoims_events'
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+
+def publish(cur, event_type, **data):
+    """
+    Queue a change event on the caller's transaction.
+
+    Usage:
+        publish(cur, 'bill.paid', bill_id=12, job_id=7)
+    """
+    payload = json.dumps({'type': event_type, **data}, default=str, separators=(',', ':'))
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD_BYTES:
+        # Keep only the identifying fields; clients refetch the details
+        payload = json.dumps({'type': event_type, 'truncated': True,
+                              **{k: v for k, v in data.items() if k.endswith('_id')}},
+                             default=str, separators=(',', ':'))
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+
+
+class EventBroker:
+    """
+    Per-process LISTEN connection that fans notifications out to subscriber queues.
+    The listener thread starts with the first subscriber and reconnects on errors.
+    """
+
+    def __init__(self, channel=CHANNEL, queue_size=100, reconnect_delay=5):
+        self.channel = channel
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._seq = 0
+
+    def subscribe(self):
+        """Register a subscriber and return its event queue."""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen_forever,
+                                                name='event-broker', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        """Remove a subscriber queue."""
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _dispatch(self, payload):
+        """Deliver one notification payload to every subscriber."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"==> Ignoring malformed event payload: {payload[:100]}")
+            return
+
+        with self._lock:
+            self._seq += 1
+            event['seq'] = self._seq
+            subscribers = list(self._subscribers)
+
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop its backlog and tell it to refetch everything
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait({'type': 'resync', 'seq': event['seq']})
+
+    def _listen_forever(self):
+        """Listener thread body: LISTEN and dispatch until the process exits."""
+        while True:
+            conn = None
+            try:
+                conn = get_connection()
+                conn.autocommit = True
+                conn.execute(f"LISTEN {self.channel}")
+                logger.info(f"==> Event broker listening on '{self.channel}'")
+                for notify in conn.notifies():
+                    self._dispatch(notify.payload)
+            except Exception as e:
+                logger.error(f"==> Event broker connection lost: {str(e)}")
+            finally:
+                if conn:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            # Anything published while disconnected is lost; tell clients to refetch
+            self._dispatch(json.dumps({'type': 'resync'}))
+            time.sleep(self.reconnect_delay)
+
+
+# One listener per worker process
+broker = EventBroker()
@@ -0,0 +1,133 @@
+"""
+Group commit: coalesce small writes that arrive close together into one
+transaction.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class GroupCommitter:
+    """
+    Thread-safe batcher that runs flush(items) once for all calls submitted
+    within `window` seconds of each other.
+
+    The first caller of a batch becomes its leader: it waits up to `window`
+    seconds (or until max_batch items are queued), takes the batch and runs
+    flush() on its own thread; the other callers wait on their futures.
+    Calls arriving during a flush start the next batch, so flushes may
+    overlap.
+
+    flush(items) returns one result per item, in order; a result that is
+    an exception is raised to that caller only. If flush() itself raises,
+    every caller in the batch gets the error.
+
+    Usage:
+        committer = GroupCommitter(apply_deltas, window=0.005)
+        result = committer.call((part_id, 10))
+    """
+
+    def __init__(self, flush, window=0.005, max_batch=500, clock=time.monotonic, history=1000):
+        self._flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)
+        self._pending = []
+        self._leader = False
+        self._flushes = 0
+        self._calls = 0
+        self._failed_flushes = 0
+        self._max_flush_size = 0
+        self._flush_sizes = deque(maxlen=history)
+        self._flush_seconds = deque(maxlen=history)
+        self._wait_seconds = deque(maxlen=history)
+
+    def submit(self, item):
+        """Queue one item and return a Future for its result."""
+        future = Future()
+        submitted = self._clock()
+        future.add_done_callback(lambda _: self._record_wait(self._clock() - submitted))
+
+        with self._lock:
+            self._pending.append((item, future))
+            if len(self._pending) >= self.max_batch:
+                self._full.notify()
+            if self._leader:
+                return future
+            self._leader = True
+            deadline = self._clock() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    break
+                self._full.wait(remaining)
+            batch, self._pending = self._pending, []
+            self._leader = False
+
+        self._run(batch)
+        return future
+
+    def call(self, item, timeout=None):
+        """Submit one item and wait for its result."""
+        return self.submit(item).result(timeout)
+
+    def _run(self, batch):
+        started = self._clock()
+        try:
+            results = self._flush([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            with self._lock:
+                self._failed_flushes += 1
+            return
+        finally:
+            with self._lock:
+                self._flushes += 1
+                self._calls += len(batch)
+                self._max_flush_size = max(self._max_flush_size, len(batch))
+                self._flush_sizes.append(len(batch))
+                self._flush_seconds.append(self._clock() - started)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self._wait_seconds.append(seconds)
+
+    def stats(self):
+        """Return flush counts, flush sizes and flush / call latencies (ms, recent history)."""
+        with self._lock:
+            sizes = list(self._flush_sizes)
+            flush_ms = sorted(s * 1000 for s in self._flush_seconds)
+            wait_ms = sorted(s * 1000 for s in self._wait_seconds)
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch,
+                'flushes': self._flushes,
+                'failed_flushes': self._failed_flushes,
+                'calls': self._calls,
+                'pending': len(self._pending),
+                'avg_flush_size': round(sum(sizes) / len(sizes), 2) if sizes else None,
+                'max_flush_size': self._max_flush_size,
+                'flush_ms': _summary(flush_ms),
+                'call_ms': _summary(wait_ms)
+            }
+
+
+def _summary(values):
+    """p50 / p95 / max of an ascending list of milliseconds."""
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    return {
+        'p50': round(values[len(values) // 2], 2),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+        'max': round(values[-1], 2)
+    }
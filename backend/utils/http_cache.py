@@ -0,0 +1,83 @@
+"""
+Conditional GET support (ETag / If-None-Match) for read endpoints.
+
+ETags are derived from per-table change markers kept in table_versions by
+statement-level triggers (see database/schema.sql), so checking whether a
+resource changed costs one tiny query instead of running the listing query
+and serializing every row.
+"""
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from db.connection import get_db_cursor
+
+SCHEMA = 'vehicle_service'
+
+
+def get_table_versions(tables):
+    """
+    Get the change marker of each table.
+    Versions are spread over several shard rows per table to avoid a single
+    hot row, so the marker is the sum of its shards.
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT table_name, SUM(version) AS version
+            FROM {SCHEMA}.table_versions
+            WHERE table_name = ANY(%s)
+            GROUP BY table_name
+        """, (list(tables),))
+        versions = {row['table_name']: int(row['version']) for row in cur.fetchall()}
+    return {table: versions.get(table, 0) for table in tables}
+
+
+def compute_etag(tables, versions, extra=''):
+    """Hash the request URL, table versions and any extra marker into an ETag value."""
+    marker = '|'.join(f"{table}:{versions[table]}" for table in sorted(tables)) + f"|{extra}"
+    digest = hashlib.sha1(f"{request.full_path}|{marker}".encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def conditional_get(*tables, weak=True, vary=None, versions=get_table_versions):
+    """
+    Decorator adding ETag / If-None-Match handling to a GET route.
+    Place it below @token_required so authentication still runs first.
+
+    Args:
+        tables: Tables whose changes invalidate the response
+        weak: Emit a weak ETag (W/"...")
+        vary: Optional callable returning a string that also changes the
+              response, e.g. today's date for a default date window
+        versions: Function returning the table versions, for responses
+                  served from a cache that must first catch up with them
+
+    Usage:
+        @inventory_bp.route('', methods=['GET'])
+        @token_required
+        @conditional_get('inventory')
+        def get_all_items(current_user):
+            ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                etag = compute_etag(tables, versions(tables), vary() if vary else '')
+            except Exception:
+                # Markers unavailable (e.g. table not migrated yet): serve uncached
+                return f(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=weak)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Authorization')
+            return response
+
+        return decorated
+    return decorator
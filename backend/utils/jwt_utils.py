@@ -59,6 +59,20 @@ def token_required(f):
         def protected_route(current_user):
             return jsonify({'message': 'Protected data'})
     """
+    return _require_token(f, allow_query_token=False)
+
+
+def stream_token_required(f):
+    """
+    Like token_required, but also accepts the token as a ?token= query
+    parameter. Browsers' EventSource cannot send an Authorization header,
+    so use this only on Server-Sent Events streams.
+    """
+    return _require_token(f, allow_query_token=True)
+
+
+def _require_token(f, allow_query_token):
+    """Build the authentication wrapper used by the decorators above."""
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
@@ -73,6 +87,9 @@ def token_required(f):
             if len(parts) == 2 and parts[0].lower() == 'bearer':
                 token = parts[1]
         
+        if not token and allow_query_token:
+            token = request.args.get('token')
+        
         if not token:
             return jsonify({'error': 'Authentication token is missing'}), 401
         
@@ -0,0 +1,149 @@
+"""
+Durable work queue backed by the task_queue table.
+
+Write paths call enqueue() with their own cursor, so a task exists only if
+their transaction commits. Worker processes (worker.py) claim tasks with
+FOR UPDATE SKIP LOCKED, so any number of workers can drain the queue
+without blocking each other. A claimed task is leased for a visibility
+timeout; if the worker dies the lease expires and another worker picks the
+task up. Failed tasks are retried with exponential backoff until
+max_attempts, then left in the 'dead' state for inspection.
+"""
+import json
+import logging
+from db.connection import get_db_cursor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = 'vehicle_service'
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Seconds before the first retry; doubled on every further attempt
+RETRY_BASE_SECONDS = 10
+
+
+class LeaseLost(Exception):
+    """Raised when a task's lease expired and another worker re-claimed it."""
+
+
+def enqueue(cur, task_type, payload=None, dedupe_key=None, max_attempts=DEFAULT_MAX_ATTEMPTS, delay_seconds=0):
+    """
+    Queue a task on the caller's transaction.
+    Nothing is queued while a task with the same dedupe_key is still
+    pending or running.
+
+    Usage:
+        enqueue(cur, 'job.completed', {'job_id': 7}, dedupe_key='job.completed:7')
+    """
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.task_queue
+            (task_type, payload, dedupe_key, max_attempts, run_after)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+        ON CONFLICT (dedupe_key) WHERE status IN ('pending', 'running') DO NOTHING
+    """, (task_type, json.dumps(payload or {}, default=str), dedupe_key, max_attempts, delay_seconds))
+
+
+def claim(worker_id, batch_size=10, visibility_timeout=300):
+    """
+    Lease up to batch_size runnable tasks to worker_id.
+    Runnable means pending and due, or running with an expired lease.
+    Expired tasks that already used all their attempts are moved to 'dead'.
+
+    Returns:
+        List of task dicts (attempts already counts this run)
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.task_queue
+            SET status = 'dead', finished_at = CURRENT_TIMESTAMP,
+                last_error = COALESCE(last_error, 'visibility timeout exceeded')
+            WHERE status = 'running'
+              AND locked_until < CURRENT_TIMESTAMP
+              AND attempts >= max_attempts
+        """)
+        cur.execute(f"""
+            UPDATE {SCHEMA}.task_queue t
+            SET status = 'running',
+                attempts = t.attempts + 1,
+                locked_by = %s,
+                locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            FROM (
+                SELECT id
+                FROM {SCHEMA}.task_queue
+                WHERE (status = 'pending' AND run_after <= CURRENT_TIMESTAMP)
+                   OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+                ORDER BY run_after, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ) due
+            WHERE t.id = due.id
+            RETURNING t.*
+        """, (worker_id, visibility_timeout, batch_size))
+        return [dict(row) for row in cur.fetchall()]
+
+
+def run(task, worker_id, handler):
+    """
+    Run handler(cur, payload) and mark the task done in the same transaction,
+    so its database effects are applied exactly once.
+
+    Raises:
+        LeaseLost: The lease expired and the task was re-claimed meanwhile
+        Exception: Whatever the handler raised (the transaction is rolled back)
+    """
+    with get_db_cursor() as cur:
+        handler(cur, task['payload'])
+        cur.execute(f"""
+            UPDATE {SCHEMA}.task_queue
+            SET status = 'done', finished_at = CURRENT_TIMESTAMP,
+                locked_by = NULL, locked_until = NULL
+            WHERE id = %s AND status = 'running' AND locked_by = %s AND attempts = %s
+            RETURNING id
+        """, (task['id'], worker_id, task['attempts']))
+        if not cur.fetchone():
+            raise LeaseLost(f"Task {task['id']} was re-claimed by another worker")
+
+
+def fail(task, worker_id, error):
+    """
+    Record a failed attempt: reschedule with backoff, or move to 'dead'
+    once max_attempts is reached.
+    """
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SCHEMA}.task_queue
+            SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP END,
+                run_after = CURRENT_TIMESTAMP
+                            + make_interval(secs => %s * power(2, GREATEST(attempts - 1, 0))),
+                last_error = %s,
+                locked_by = NULL,
+                locked_until = NULL
+            WHERE id = %s AND status = 'running' AND locked_by = %s AND attempts = %s
+            RETURNING status
+        """, (RETRY_BASE_SECONDS, str(error)[:2000], task['id'], worker_id, task['attempts']))
+        row = cur.fetchone()
+        return row['status'] if row else None
+
+
+def purge_finished(older_than_days=7):
+    """Delete done tasks older than the given age. Dead tasks are kept."""
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            DELETE FROM {SCHEMA}.task_queue
+            WHERE status = 'done'
+              AND finished_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+        """, (older_than_days,))
+        return cur.rowcount
+
+
+def get_queue_stats():
+    """Count tasks per status."""
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT status, COUNT(*) AS count
+            FROM {SCHEMA}.task_queue
+            GROUP BY status
+        """)
+        return {row['status']: row['count'] for row in cur.fetchall()}
@@ -0,0 +1,90 @@
+"""
+Queue worker for follow-up work (see utils/work_queue.py and controllers/tasks.py).
+Run one or more from the backend folder, next to the API:
+
+  python worker.py                 # process tasks until stopped
+  python worker.py --once          # drain what is due now, then exit
+  python worker.py --stats         # print task counts per status
+  python worker.py --purge-days 7  # delete finished tasks older than 7 days, then exit
+"""
+import sys
+import os
+import argparse
+import logging
+import socket
+import time
+
+# Add the backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from controllers.tasks import HANDLERS
+from utils import work_queue
+
+logger = logging.getLogger('worker')
+
+
+def process_batch(worker_id, batch_size, visibility_timeout):
+    """Claim and run one batch of tasks. Returns the number of tasks claimed."""
+    tasks = work_queue.claim(worker_id, batch_size=batch_size, visibility_timeout=visibility_timeout)
+    for task in tasks:
+        handler = HANDLERS.get(task['task_type'])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for task type '{task['task_type']}'")
+            work_queue.run(task, worker_id, handler)
+            logger.info(f"==> Task {task['id']} ({task['task_type']}) done")
+        except work_queue.LeaseLost as e:
+            logger.warning(f"==> {str(e)}")
+        except Exception as e:
+            status = work_queue.fail(task, worker_id, e)
+            logger.error(f"==> Task {task['id']} ({task['task_type']}) failed "
+                         f"on attempt {task['attempts']}/{task['max_attempts']} -> {status}: {str(e)}")
+    return len(tasks)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Process queued background tasks.')
+    parser.add_argument('--once', action='store_true', help='Exit when no task is due')
+    parser.add_argument('--stats', action='store_true', help='Print task counts per status and exit')
+    parser.add_argument('--purge-days', type=int, metavar='DAYS',
+                        help='Delete finished tasks older than DAYS and exit')
+    parser.add_argument('--batch-size', type=int, default=Config.WORKER_BATCH_SIZE)
+    parser.add_argument('--poll', type=float, default=Config.WORKER_POLL_SECONDS,
+                        help='Seconds to sleep when the queue is empty')
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        for status, count in sorted(work_queue.get_queue_stats().items()):
+            print(f"  {status}: {count}")
+        return 0
+
+    if args.purge_days is not None:
+        print(f"Purged {work_queue.purge_finished(args.purge_days)} finished task(s).")
+        return 0
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Worker {worker_id} started (batch={args.batch_size}, poll={args.poll}s)")
+
+    while True:
+        try:
+            claimed = process_batch(worker_id, args.batch_size, Config.WORKER_VISIBILITY_TIMEOUT)
+        except Exception as e:
+            # Database unavailable: back off and try again
+            logger.error(f"==> Claiming tasks failed: {str(e)}")
+            claimed = 0
+
+        if not claimed:
+            if args.once:
+                break
+            time.sleep(args.poll)
+
+    print("Worker finished!")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except KeyboardInterrupt:
+        print("Worker stopped.")
@@ -110,4 +110,1036 @@ ADD COLUMN IF NOT EXISTS payment_date TIMESTAMP;
 
 ALTER TABLE vehicle_service.inventory 
 ADD COLUMN IF NOT EXISTS image_url TEXT,
-ADD COLUMN IF NOT EXISTS quantity_label VARCHAR(20) DEFAULT 'pcs';
\ No newline at end of file
+ADD COLUMN IF NOT EXISTS quantity_label VARCHAR(20) DEFAULT 'pcs';
+
+-- 11. DASHBOARD COUNTERS
+-- Single-row summary kept current by the write paths in the backend.
+-- Recompute with: python reconcile_counters.py (from the backend folder)
+CREATE TABLE IF NOT EXISTS vehicle_service.dashboard_counters(
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    customers_count INT NOT NULL DEFAULT 0,
+    vehicles_count INT NOT NULL DEFAULT 0,
+    pending_requests INT NOT NULL DEFAULT 0,
+    active_jobs INT NOT NULL DEFAULT 0,
+    low_stock_items INT NOT NULL DEFAULT 0,
+    unpaid_total NUMERIC(14,2) NOT NULL DEFAULT 0.00,
+    total_revenue NUMERIC(14,2) NOT NULL DEFAULT 0.00,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO vehicle_service.dashboard_counters (id) VALUES (1)
+ON CONFLICT (id) DO NOTHING;
+
+
+-- 12. DAILY ROLLUPS
+-- One row per day, filled by the end-of-day job (python rollup_daily.py).
+-- GET /api/dashboard/timeseries reads only this table.
+CREATE TABLE IF NOT EXISTS vehicle_service.daily_rollups(
+    day DATE PRIMARY KEY,
+    revenue_paid NUMERIC(14,2) NOT NULL DEFAULT 0.00,
+    revenue_unpaid NUMERIC(14,2) NOT NULL DEFAULT 0.00,
+    revenue_billed NUMERIC(14,2) NOT NULL DEFAULT 0.00,
+    bills_issued INT NOT NULL DEFAULT 0,
+    jobs_opened INT NOT NULL DEFAULT 0,
+    jobs_completed INT NOT NULL DEFAULT 0,
+    parts_quantity INT NOT NULL DEFAULT 0,
+    parts_value NUMERIC(14,2) NOT NULL DEFAULT 0.00,
+    rolled_up_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- When a part was consumed, so parts usage can be rolled up by day.
+-- Added without a default first so existing rows stay NULL (the rollup
+-- falls back to the job start time for them).
+ALTER TABLE vehicle_service.job_parts_used
+ADD COLUMN IF NOT EXISTS used_at TIMESTAMP;
+ALTER TABLE vehicle_service.job_parts_used
+ALTER COLUMN used_at SET DEFAULT CURRENT_TIMESTAMP;
+
+-- Range scans used by the rollup job
+CREATE INDEX IF NOT EXISTS idx_billing_bill_date ON vehicle_service.billing (bill_date);
+CREATE INDEX IF NOT EXISTS idx_billing_payment_date ON vehicle_service.billing (payment_date);
+CREATE INDEX IF NOT EXISTS idx_service_jobs_start_time ON vehicle_service.service_jobs (start_time);
+CREATE INDEX IF NOT EXISTS idx_service_jobs_end_time ON vehicle_service.service_jobs (end_time);
+CREATE INDEX IF NOT EXISTS idx_job_parts_used_used_at ON vehicle_service.job_parts_used (used_at);
+
+
+-- 13. TABLE VERSIONS
+-- Change markers used for API ETags (backend/utils/http_cache.py).
+-- A statement-level trigger bumps one of 16 shard rows per table, picked by
+-- backend pid, so concurrent writers rarely queue on the same row. The bump
+-- is part of the writing transaction, so a reader never sees a new version
+-- before the data it describes has committed.
+CREATE TABLE IF NOT EXISTS vehicle_service.table_versions(
+    table_name VARCHAR(63) NOT NULL,
+    shard SMALLINT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (table_name, shard)
+);
+
+CREATE OR REPLACE FUNCTION vehicle_service.bump_table_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO vehicle_service.table_versions (table_name, shard, version, updated_at)
+    VALUES (TG_TABLE_NAME, pg_backend_pid() % 16, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (table_name, shard) DO UPDATE
+    SET version = vehicle_service.table_versions.version + 1,
+        updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['customers', 'vehicles', 'service_requests', 'service_jobs',
+                             'inventory', 'job_parts_used', 'billing', 'employees']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_version ON vehicle_service.%I', t, t);
+        EXECUTE format('CREATE TRIGGER trg_%s_version
+                        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vehicle_service.%I
+                        FOR EACH STATEMENT EXECUTE FUNCTION vehicle_service.bump_table_version()', t, t);
+    END LOOP;
+END;
+$$;
+
+
+-- 14. ONE BILL PER JOB
+-- At most one bill per job; lets request completion insert the bill with
+-- ON CONFLICT (job_id) DO NOTHING instead of a racy existence check.
+-- Remove any duplicate bills before applying this on an existing database.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_billing_job_id ON vehicle_service.billing (job_id);
+
+
+-- 15. TASK QUEUE
+-- Durable queue for follow-up work, drained by python worker.py.
+-- pending -> running (leased until locked_until) -> done | pending (retry) | dead
+CREATE TABLE IF NOT EXISTS vehicle_service.task_queue(
+    id BIGSERIAL PRIMARY KEY,
+    task_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'done', 'dead')),
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(100),
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    dedupe_key VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Claim scans only touch live tasks
+CREATE INDEX IF NOT EXISTS idx_task_queue_pending
+    ON vehicle_service.task_queue (run_after, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_task_queue_running
+    ON vehicle_service.task_queue (locked_until) WHERE status = 'running';
+
+-- A dedupe_key is unique among live tasks only, so the same key can be
+-- queued again once its previous task is done or dead
+ALTER TABLE vehicle_service.task_queue DROP CONSTRAINT IF EXISTS task_queue_dedupe_key_key;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_task_queue_live_dedupe_key
+    ON vehicle_service.task_queue (dedupe_key) WHERE status IN ('pending', 'running');
+
+
+-- 16. LISTING FILTER INDEXES
+-- Support the combined ?status=&priority=&date_from=&customer_id=&search=
+-- filters on GET /api/service-requests and GET /api/jobs.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_service_requests_status_date
+    ON vehicle_service.service_requests (status, request_date DESC);
+CREATE INDEX IF NOT EXISTS idx_service_requests_priority
+    ON vehicle_service.service_requests (priority);
+CREATE INDEX IF NOT EXISTS idx_service_requests_request_date
+    ON vehicle_service.service_requests (request_date DESC, request_id DESC);
+CREATE INDEX IF NOT EXISTS idx_service_requests_vehicle_id
+    ON vehicle_service.service_requests (vehicle_id);
+CREATE INDEX IF NOT EXISTS idx_vehicles_customer_id
+    ON vehicle_service.vehicles (customer_id);
+CREATE INDEX IF NOT EXISTS idx_service_jobs_request_id
+    ON vehicle_service.service_jobs (request_id);
+CREATE INDEX IF NOT EXISTS idx_service_jobs_employee_status
+    ON vehicle_service.service_jobs (employee_id, job_status);
+CREATE INDEX IF NOT EXISTS idx_service_jobs_status
+    ON vehicle_service.service_jobs (job_status);
+CREATE INDEX IF NOT EXISTS idx_service_requests_service_type
+    ON vehicle_service.service_requests (service_type);
+
+-- Trigram indexes serve the ILIKE '%term%' text search
+CREATE INDEX IF NOT EXISTS idx_customers_name_trgm
+    ON vehicle_service.customers USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vehicles_plate_no_trgm
+    ON vehicle_service.vehicles USING gin (plate_no gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_service_requests_service_type_trgm
+    ON vehicle_service.service_requests USING gin (service_type gin_trgm_ops);
+
+
+-- 17. GLOBAL SEARCH INDEX
+-- One row per searchable entity, kept current by row-level triggers and
+-- queried by GET /api/search. search_documents defines what is indexed.
+CREATE TABLE IF NOT EXISTS vehicle_service.search_index(
+    entity_type VARCHAR(20) NOT NULL,
+    entity_id INT NOT NULL,
+    title TEXT NOT NULL,
+    subtitle TEXT,
+    search_text TEXT NOT NULL,
+    document TSVECTOR NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity_type, entity_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_index_document
+    ON vehicle_service.search_index USING gin (document);
+CREATE INDEX IF NOT EXISTS idx_search_index_text_trgm
+    ON vehicle_service.search_index USING gin (search_text gin_trgm_ops);
+
+CREATE OR REPLACE VIEW vehicle_service.search_documents AS
+    SELECT 'customer'::text AS entity_type, customer_id AS entity_id,
+           name::text AS title,
+           concat_ws(' · ', phone, email) AS subtitle,
+           concat_ws(' ', name, phone, email) AS search_text
+    FROM vehicle_service.customers
+    UNION ALL
+    SELECT 'vehicle', vehicle_id,
+           plate_no,
+           concat_ws(' ', brand, model, year),
+           concat_ws(' ', plate_no, replace(plate_no, '-', ''), brand, model)
+    FROM vehicle_service.vehicles
+    UNION ALL
+    SELECT 'request', request_id,
+           service_type,
+           concat_ws(' · ', status, request_date),
+           concat_ws(' ', service_type, problem_note)
+    FROM vehicle_service.service_requests
+    UNION ALL
+    SELECT 'part', part_id,
+           part_name,
+           concat_ws(' · ', part_code, brand),
+           concat_ws(' ', part_name, part_code, brand)
+    FROM vehicle_service.inventory
+    UNION ALL
+    SELECT 'bill', bill_id,
+           'Bill #' || bill_id,
+           concat_ws(' · ', payment_status, total_amount),
+           concat_ws(' ', 'bill', bill_id, 'job', job_id)
+    FROM vehicle_service.billing;
+
+CREATE OR REPLACE FUNCTION vehicle_service.refresh_search_entry(p_type TEXT, p_id INT)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM vehicle_service.search_index
+    WHERE entity_type = p_type AND entity_id = p_id;
+
+    INSERT INTO vehicle_service.search_index
+        (entity_type, entity_id, title, subtitle, search_text, document, updated_at)
+    SELECT entity_type, entity_id, title, subtitle, search_text,
+           to_tsvector('simple', search_text), CURRENT_TIMESTAMP
+    FROM vehicle_service.search_documents
+    WHERE entity_type = p_type AND entity_id = p_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger arguments: entity type, primary key column
+CREATE OR REPLACE FUNCTION vehicle_service.search_index_sync()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_old_id INT;
+    v_new_id INT;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_old_id := (to_jsonb(OLD) ->> TG_ARGV[1])::int;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_new_id := (to_jsonb(NEW) ->> TG_ARGV[1])::int;
+    END IF;
+
+    -- An UPDATE that kept the key refreshes the entry once
+    IF v_old_id IS NOT NULL AND v_old_id IS DISTINCT FROM v_new_id THEN
+        PERFORM vehicle_service.refresh_search_entry(TG_ARGV[0], v_old_id);
+    END IF;
+    IF v_new_id IS NOT NULL THEN
+        PERFORM vehicle_service.refresh_search_entry(TG_ARGV[0], v_new_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Updates only refresh the index when a column used by search_documents
+-- changed, so stock, payment and other hot-path updates do not rewrite it.
+DO $$
+DECLARE
+    t TEXT[];
+    v_when TEXT;
+BEGIN
+    FOREACH t SLICE 1 IN ARRAY ARRAY[
+        ARRAY['customers', 'customer', 'customer_id', 'customer_id, name, phone, email'],
+        ARRAY['vehicles', 'vehicle', 'vehicle_id', 'vehicle_id, plate_no, brand, model, year'],
+        ARRAY['service_requests', 'request', 'request_id', 'request_id, service_type, problem_note, status, request_date'],
+        ARRAY['inventory', 'part', 'part_id', 'part_id, part_name, part_code, brand'],
+        ARRAY['billing', 'bill', 'bill_id', 'bill_id, payment_status, total_amount, job_id']
+    ]
+    LOOP
+        SELECT format('(%s) IS DISTINCT FROM (%s)',
+                      string_agg('OLD.' || trim(c), ', '), string_agg('NEW.' || trim(c), ', '))
+        INTO v_when
+        FROM unnest(string_to_array(t[4], ',')) AS c;
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_search ON vehicle_service.%I', t[1], t[1]);
+        EXECUTE format('CREATE TRIGGER trg_%s_search
+                        AFTER INSERT OR DELETE ON vehicle_service.%I
+                        FOR EACH ROW EXECUTE FUNCTION vehicle_service.search_index_sync(%L, %L)',
+                       t[1], t[1], t[2], t[3]);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_search_update ON vehicle_service.%I', t[1], t[1]);
+        EXECUTE format('CREATE TRIGGER trg_%s_search_update
+                        AFTER UPDATE OF %s ON vehicle_service.%I
+                        FOR EACH ROW WHEN (%s)
+                        EXECUTE FUNCTION vehicle_service.search_index_sync(%L, %L)',
+                       t[1], t[4], t[1], v_when, t[2], t[3]);
+    END LOOP;
+END;
+$$;
+
+-- Backfill (also rebuilds the index after bulk loads with triggers disabled)
+CREATE OR REPLACE FUNCTION vehicle_service.rebuild_search_index()
+RETURNS BIGINT AS $$
+DECLARE
+    n BIGINT;
+BEGIN
+    TRUNCATE vehicle_service.search_index;
+    INSERT INTO vehicle_service.search_index
+        (entity_type, entity_id, title, subtitle, search_text, document, updated_at)
+    SELECT entity_type, entity_id, title, subtitle, search_text,
+           to_tsvector('simple', search_text), CURRENT_TIMESTAMP
+    FROM vehicle_service.search_documents;
+    GET DIAGNOSTICS n = ROW_COUNT;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT vehicle_service.rebuild_search_index();
+
+
+-- 18. HISTORY IMPORT REFERENCES
+-- Source-system request keys already loaded by import_history.py, so a
+-- re-run of the same file only imports what is missing.
+CREATE TABLE IF NOT EXISTS vehicle_service.history_import_refs(
+    source VARCHAR(100) NOT NULL,
+    ext_ref TEXT NOT NULL,
+    request_id INT REFERENCES vehicle_service.service_requests(request_id) ON DELETE CASCADE,
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, ext_ref)
+);
+
+-- TRUE when p_value (NULL counts as valid) converts to p_type, e.g.
+-- is_valid_input('2024-02-30', 'date') is FALSE. Lets the import reject a
+-- bad line instead of failing the statement that casts it (PostgreSQL 16
+-- has pg_input_is_valid() for this).
+CREATE OR REPLACE FUNCTION vehicle_service.is_valid_input(p_value TEXT, p_type TEXT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    IF p_value IS NOT NULL THEN
+        EXECUTE format('SELECT %L::%s', p_value, p_type);
+    END IF;
+    RETURN TRUE;
+EXCEPTION WHEN data_exception THEN
+    RETURN FALSE;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+-- 19. JOB BOARD INDEXES
+-- Newest-first ordering within each job board column, in the board's
+-- exact sort order, so each column's top N is read straight off the index.
+DROP INDEX IF EXISTS vehicle_service.idx_service_jobs_status_start_time;
+DROP INDEX IF EXISTS vehicle_service.idx_service_jobs_status_end_time;
+CREATE INDEX IF NOT EXISTS idx_service_jobs_board_start_time
+    ON vehicle_service.service_jobs (job_status, start_time DESC NULLS LAST, job_id DESC);
+CREATE INDEX IF NOT EXISTS idx_service_jobs_board_end_time
+    ON vehicle_service.service_jobs (job_status, end_time DESC NULLS LAST, job_id DESC);
+
+
+-- 20. TECHNICIAN WORKLOAD
+-- Live per-employee workload used by the assignment engine
+-- (controllers/assignment.py). Jobs get an estimated duration from their
+-- service type when created; row-level triggers keep employee_workload's
+-- open job count and remaining hours current as jobs are created,
+-- reassigned and completed, so picking the least-loaded technician is a
+-- single index probe.
+CREATE TABLE IF NOT EXISTS vehicle_service.service_type_estimates(
+    service_type VARCHAR(30) PRIMARY KEY,
+    est_hours NUMERIC(5,2) NOT NULL CHECK (est_hours >= 0)
+);
+
+INSERT INTO vehicle_service.service_type_estimates (service_type, est_hours) VALUES
+    ('Engine Repair', 6.0),
+    ('Brake Service', 2.0),
+    ('Oil Change', 0.5),
+    ('Tire Service', 1.0),
+    ('Electrical', 3.0),
+    ('AC Service', 2.5),
+    ('General Maintenance', 2.0),
+    ('Body Work', 5.0),
+    ('Other', 2.0)
+ON CONFLICT (service_type) DO NOTHING;
+
+-- Which positions (lower-case employees.position) can do which service type.
+-- Only employees whose position is listed here are auto-assigned.
+-- After editing, run: SELECT vehicle_service.rebuild_employee_workload();
+CREATE TABLE IF NOT EXISTS vehicle_service.technician_skills(
+    position VARCHAR(100) NOT NULL,
+    service_type VARCHAR(30) NOT NULL,
+    PRIMARY KEY (position, service_type)
+);
+
+INSERT INTO vehicle_service.technician_skills (position, service_type)
+SELECT p.position, st.service_type
+FROM (VALUES ('technician'), ('mechanic')) AS p(position)
+CROSS JOIN vehicle_service.service_type_estimates st
+WHERE p.position = 'technician' OR st.service_type NOT IN ('Electrical', 'Body Work')
+UNION ALL
+SELECT * FROM (VALUES
+    ('electrician', 'Electrical'),
+    ('electrician', 'AC Service'),
+    ('body technician', 'Body Work'),
+    ('painter', 'Body Work')
+) AS s(position, service_type)
+ON CONFLICT (position, service_type) DO NOTHING;
+
+ALTER TABLE vehicle_service.service_jobs
+ADD COLUMN IF NOT EXISTS est_hours NUMERIC(5,2);
+
+CREATE TABLE IF NOT EXISTS vehicle_service.employee_workload(
+    employee_id INT PRIMARY KEY REFERENCES vehicle_service.employees(id) ON DELETE CASCADE,
+    position VARCHAR(100),
+    available BOOLEAN NOT NULL DEFAULT FALSE,
+    open_jobs INT NOT NULL DEFAULT 0,
+    remaining_hours NUMERIC(8,2) NOT NULL DEFAULT 0.00,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Least-loaded technician overall / within a position
+CREATE INDEX IF NOT EXISTS idx_employee_workload_least_loaded
+    ON vehicle_service.employee_workload (remaining_hours, open_jobs, employee_id)
+    WHERE available;
+CREATE INDEX IF NOT EXISTS idx_employee_workload_position
+    ON vehicle_service.employee_workload (position, remaining_hours, open_jobs, employee_id)
+    WHERE available;
+
+-- Assignment order of the pending queue: High, Normal, Low
+CREATE OR REPLACE FUNCTION vehicle_service.priority_rank(p_priority TEXT)
+RETURNS INT AS $$
+    SELECT CASE p_priority WHEN 'High' THEN 0 WHEN 'Low' THEN 2 ELSE 1 END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION vehicle_service.estimate_hours(p_service_type TEXT)
+RETURNS NUMERIC AS $$
+    SELECT COALESCE(
+        (SELECT est_hours FROM vehicle_service.service_type_estimates WHERE service_type = p_service_type),
+        (SELECT est_hours FROM vehicle_service.service_type_estimates WHERE service_type = 'Other'),
+        0
+    );
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION vehicle_service.service_jobs_set_estimate()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.est_hours IS NULL THEN
+        SELECT vehicle_service.estimate_hours(sr.service_type) INTO NEW.est_hours
+        FROM vehicle_service.service_requests sr
+        WHERE sr.request_id = NEW.request_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_service_jobs_estimate ON vehicle_service.service_jobs;
+CREATE TRIGGER trg_service_jobs_estimate
+    BEFORE INSERT ON vehicle_service.service_jobs
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.service_jobs_set_estimate();
+
+-- Apply one job's contribution (+1 / -1) to its employee's workload
+CREATE OR REPLACE FUNCTION vehicle_service.adjust_workload(p_employee_id INT, p_sign INT, p_hours NUMERIC)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE vehicle_service.employee_workload
+    SET open_jobs = GREATEST(open_jobs + p_sign, 0),
+        remaining_hours = GREATEST(remaining_hours + p_sign * COALESCE(p_hours, 0), 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE employee_id = p_employee_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A job counts as open load while it is In Progress and its request is not
+-- Cancelled (cancelling a request leaves its job In Progress).
+CREATE OR REPLACE FUNCTION vehicle_service.job_is_open_load(p_job_status TEXT, p_request_id INT)
+RETURNS BOOLEAN AS $$
+    SELECT p_job_status = 'In Progress'
+       AND NOT EXISTS (SELECT 1 FROM vehicle_service.service_requests
+                       WHERE request_id = p_request_id AND status = 'Cancelled');
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION vehicle_service.service_jobs_workload_sync()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.employee_id IS NOT NULL
+           AND vehicle_service.job_is_open_load(OLD.job_status, OLD.request_id) THEN
+            PERFORM vehicle_service.adjust_workload(OLD.employee_id, -1, OLD.est_hours);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.employee_id IS NOT NULL
+           AND vehicle_service.job_is_open_load(NEW.job_status, NEW.request_id) THEN
+            PERFORM vehicle_service.adjust_workload(NEW.employee_id, 1, NEW.est_hours);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_service_jobs_workload ON vehicle_service.service_jobs;
+CREATE TRIGGER trg_service_jobs_workload
+    AFTER INSERT OR UPDATE OF employee_id, job_status, est_hours OR DELETE ON vehicle_service.service_jobs
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.service_jobs_workload_sync();
+
+-- Cancelling a request removes its assigned open jobs from the workload;
+-- reopening it adds them back
+CREATE OR REPLACE FUNCTION vehicle_service.service_requests_workload_sync()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM vehicle_service.adjust_workload(
+        sj.employee_id,
+        CASE WHEN NEW.status = 'Cancelled' THEN -1 ELSE 1 END,
+        sj.est_hours
+    )
+    FROM vehicle_service.service_jobs sj
+    WHERE sj.request_id = NEW.request_id
+      AND sj.employee_id IS NOT NULL
+      AND sj.job_status = 'In Progress';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_service_requests_workload ON vehicle_service.service_requests;
+CREATE TRIGGER trg_service_requests_workload
+    AFTER UPDATE OF status ON vehicle_service.service_requests
+    FOR EACH ROW
+    WHEN ((OLD.status = 'Cancelled') IS DISTINCT FROM (NEW.status = 'Cancelled'))
+    EXECUTE FUNCTION vehicle_service.service_requests_workload_sync();
+
+CREATE OR REPLACE FUNCTION vehicle_service.employees_workload_sync()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO vehicle_service.employee_workload (employee_id, position, available)
+    VALUES (
+        NEW.id,
+        lower(trim(NEW.position)),
+        COALESCE(NEW.working_status, 'Working') = 'Working'
+        AND EXISTS (SELECT 1 FROM vehicle_service.technician_skills s
+                    WHERE s.position = lower(trim(NEW.position)))
+    )
+    ON CONFLICT (employee_id) DO UPDATE
+    SET position = EXCLUDED.position,
+        available = EXCLUDED.available,
+        updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_employees_workload ON vehicle_service.employees;
+CREATE TRIGGER trg_employees_workload
+    AFTER INSERT OR UPDATE OF position, working_status ON vehicle_service.employees
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.employees_workload_sync();
+
+-- Backfill / recompute from the jobs table (also after editing technician_skills)
+CREATE OR REPLACE FUNCTION vehicle_service.rebuild_employee_workload()
+RETURNS BIGINT AS $$
+DECLARE
+    n BIGINT;
+BEGIN
+    UPDATE vehicle_service.service_jobs sj
+    SET est_hours = vehicle_service.estimate_hours(sr.service_type)
+    FROM vehicle_service.service_requests sr
+    WHERE sr.request_id = sj.request_id AND sj.est_hours IS NULL;
+
+    INSERT INTO vehicle_service.employee_workload
+        (employee_id, position, available, open_jobs, remaining_hours, updated_at)
+    SELECT e.id,
+           lower(trim(e.position)),
+           COALESCE(e.working_status, 'Working') = 'Working'
+           AND EXISTS (SELECT 1 FROM vehicle_service.technician_skills s
+                       WHERE s.position = lower(trim(e.position))),
+           COUNT(sj.job_id),
+           COALESCE(SUM(sj.est_hours), 0),
+           CURRENT_TIMESTAMP
+    FROM vehicle_service.employees e
+    LEFT JOIN vehicle_service.service_jobs sj
+           ON sj.employee_id = e.id
+          AND vehicle_service.job_is_open_load(sj.job_status, sj.request_id)
+    GROUP BY e.id
+    ON CONFLICT (employee_id) DO UPDATE
+    SET position = EXCLUDED.position,
+        available = EXCLUDED.available,
+        open_jobs = EXCLUDED.open_jobs,
+        remaining_hours = EXCLUDED.remaining_hours,
+        updated_at = EXCLUDED.updated_at;
+    GET DIAGNOSTICS n = ROW_COUNT;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT vehicle_service.rebuild_employee_workload();
+
+
+-- 21. JOB DISPATCH INDEXES
+-- POST /api/jobs/next and the pending-queue assignment walk open requests in
+-- (priority, request_date) order and need only the few unassigned open jobs.
+CREATE INDEX IF NOT EXISTS idx_service_requests_dispatch
+    ON vehicle_service.service_requests (vehicle_service.priority_rank(priority), request_date, request_id)
+    WHERE status IN ('Pending', 'In Progress');
+CREATE INDEX IF NOT EXISTS idx_service_jobs_unassigned
+    ON vehicle_service.service_jobs (request_id)
+    WHERE employee_id IS NULL AND job_status = 'In Progress';
+
+
+-- 22. JOB ANALYTICS INDEXES
+-- GET /api/analytics/jobs reads the jobs overlapping a window: completed
+-- jobs through idx_service_jobs_board_end_time (section 19), jobs still
+-- open (few, however long the history) through this one.
+CREATE INDEX IF NOT EXISTS idx_service_jobs_open_start_time
+    ON vehicle_service.service_jobs (start_time)
+    WHERE job_status <> 'Completed';
+
+
+-- 23. STATUS HISTORY
+-- Append-only log of every service request / job status change, written by
+-- row-level triggers inside the statement that changes the status.
+-- entity_type: 'R' = service request, 'J' = service job. Statuses are
+-- stored as small codes from status_codes; status_history decodes them.
+CREATE TABLE IF NOT EXISTS vehicle_service.status_codes(
+    code SMALLSERIAL PRIMARY KEY,
+    status VARCHAR(20) UNIQUE NOT NULL
+);
+
+INSERT INTO vehicle_service.status_codes (status) VALUES
+    ('Pending'), ('In Progress'), ('Completed'), ('Cancelled')
+ON CONFLICT (status) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS vehicle_service.status_events(
+    event_id BIGSERIAL PRIMARY KEY,
+    entity_type CHAR(1) NOT NULL CHECK (entity_type IN ('R', 'J')),
+    entity_id INT NOT NULL,
+    from_status SMALLINT REFERENCES vehicle_service.status_codes(code),
+    to_status SMALLINT NOT NULL REFERENCES vehicle_service.status_codes(code),
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- One entity's history / the event following a given one
+CREATE INDEX IF NOT EXISTS idx_status_events_entity
+    ON vehicle_service.status_events (entity_type, entity_id, event_id);
+-- Time-in-state reports over a date range
+CREATE INDEX IF NOT EXISTS idx_status_events_changed_at
+    ON vehicle_service.status_events (entity_type, changed_at);
+
+CREATE OR REPLACE VIEW vehicle_service.status_history AS
+    SELECT e.event_id, e.entity_type, e.entity_id,
+           f.status AS from_status, t.status AS to_status, e.changed_at
+    FROM vehicle_service.status_events e
+    LEFT JOIN vehicle_service.status_codes f ON f.code = e.from_status
+    JOIN vehicle_service.status_codes t ON t.code = e.to_status;
+
+-- Allowed status changes; an unchanged status is always allowed.
+-- Status-changing UPDATEs in the backend check this in their WHERE clause.
+CREATE TABLE IF NOT EXISTS vehicle_service.status_transitions(
+    entity_type CHAR(1) NOT NULL,
+    from_status VARCHAR(20) NOT NULL,
+    to_status VARCHAR(20) NOT NULL,
+    PRIMARY KEY (entity_type, from_status, to_status)
+);
+
+INSERT INTO vehicle_service.status_transitions (entity_type, from_status, to_status) VALUES
+    ('R', 'Pending', 'In Progress'),
+    ('R', 'Pending', 'Completed'),
+    ('R', 'Pending', 'Cancelled'),
+    ('R', 'In Progress', 'Pending'),
+    ('R', 'In Progress', 'Completed'),
+    ('R', 'In Progress', 'Cancelled'),
+    ('R', 'Completed', 'In Progress'),
+    ('R', 'Cancelled', 'Pending'),
+    ('J', 'In Progress', 'Completed'),
+    ('J', 'Completed', 'In Progress')
+ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION vehicle_service.status_transition_allowed(p_entity CHAR, p_from TEXT, p_to TEXT)
+RETURNS BOOLEAN AS $$
+    SELECT p_from IS NOT DISTINCT FROM p_to
+        OR EXISTS (SELECT 1 FROM vehicle_service.status_transitions
+                   WHERE entity_type = p_entity AND from_status = p_from AND to_status = p_to);
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION vehicle_service.status_code(p_status TEXT)
+RETURNS SMALLINT AS $$
+DECLARE
+    v_code SMALLINT;
+BEGIN
+    IF p_status IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT code INTO v_code FROM vehicle_service.status_codes WHERE status = p_status;
+    IF v_code IS NULL THEN
+        INSERT INTO vehicle_service.status_codes (status) VALUES (p_status)
+        ON CONFLICT (status) DO NOTHING;
+        SELECT code INTO v_code FROM vehicle_service.status_codes WHERE status = p_status;
+    END IF;
+    RETURN v_code;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger arguments: entity type, primary key column, status column.
+-- Bulk loads that write their own back-dated events turn it off for their
+-- transaction with SET LOCAL vehicle_service.skip_status_events = 'on'.
+CREATE OR REPLACE FUNCTION vehicle_service.record_status_event()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_new JSONB := to_jsonb(NEW);
+BEGIN
+    IF current_setting('vehicle_service.skip_status_events', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO vehicle_service.status_events (entity_type, entity_id, from_status, to_status)
+    VALUES (
+        TG_ARGV[0],
+        (v_new ->> TG_ARGV[1])::int,
+        CASE WHEN TG_OP = 'UPDATE' THEN vehicle_service.status_code(to_jsonb(OLD) ->> TG_ARGV[2]) END,
+        vehicle_service.status_code(v_new ->> TG_ARGV[2])
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_service_requests_status_insert ON vehicle_service.service_requests;
+CREATE TRIGGER trg_service_requests_status_insert
+    AFTER INSERT ON vehicle_service.service_requests
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.record_status_event('R', 'request_id', 'status');
+DROP TRIGGER IF EXISTS trg_service_requests_status_update ON vehicle_service.service_requests;
+CREATE TRIGGER trg_service_requests_status_update
+    AFTER UPDATE OF status ON vehicle_service.service_requests
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION vehicle_service.record_status_event('R', 'request_id', 'status');
+
+DROP TRIGGER IF EXISTS trg_service_jobs_status_insert ON vehicle_service.service_jobs;
+CREATE TRIGGER trg_service_jobs_status_insert
+    AFTER INSERT ON vehicle_service.service_jobs
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.record_status_event('J', 'job_id', 'job_status');
+DROP TRIGGER IF EXISTS trg_service_jobs_status_update ON vehicle_service.service_jobs;
+CREATE TRIGGER trg_service_jobs_status_update
+    AFTER UPDATE OF job_status ON vehicle_service.service_jobs
+    FOR EACH ROW WHEN (OLD.job_status IS DISTINCT FROM NEW.job_status)
+    EXECUTE FUNCTION vehicle_service.record_status_event('J', 'job_id', 'job_status');
+
+-- The log is append-only
+CREATE OR REPLACE FUNCTION vehicle_service.status_events_append_only()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'status_events is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_status_events_append_only ON vehicle_service.status_events;
+CREATE TRIGGER trg_status_events_append_only
+    BEFORE UPDATE OR DELETE ON vehicle_service.status_events
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.status_events_append_only();
+
+
+-- 24. STOCK MOVEMENTS
+-- Append-only ledger of every inventory quantity change, written by the
+-- backend in the same statement as the change. quantity is signed (+ in,
+-- - out); balance_after is the stock level right after the movement.
+-- part_id has no foreign key so a part's history outlives the part.
+-- Stock may not go negative: decrements are conditional UPDATEs
+-- (... WHERE quantity_in_stock >= n) and the CHECK backs them up.
+ALTER TABLE vehicle_service.inventory
+    DROP CONSTRAINT IF EXISTS inventory_stock_non_negative;
+ALTER TABLE vehicle_service.inventory
+    ADD CONSTRAINT inventory_stock_non_negative CHECK (quantity_in_stock >= 0);
+
+CREATE TABLE IF NOT EXISTS vehicle_service.stock_movements(
+    movement_id BIGSERIAL PRIMARY KEY,
+    part_id INT NOT NULL,
+    movement_type VARCHAR(12) NOT NULL
+        CHECK (movement_type IN ('receipt', 'consumption', 'return', 'adjustment')),
+    quantity INT NOT NULL CHECK (quantity <> 0),
+    balance_after INT NOT NULL,
+    job_id INT,
+    job_part_id INT,
+    note TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- One part's history, newest first
+CREATE INDEX IF NOT EXISTS idx_stock_movements_part
+    ON vehicle_service.stock_movements (part_id, movement_id);
+-- Parts consumed / returned by a job
+CREATE INDEX IF NOT EXISTS idx_stock_movements_job
+    ON vehicle_service.stock_movements (job_id)
+    WHERE job_id IS NOT NULL;
+-- Movements over a date range
+CREATE INDEX IF NOT EXISTS idx_stock_movements_created_at
+    ON vehicle_service.stock_movements (created_at);
+
+CREATE OR REPLACE FUNCTION vehicle_service.stock_movements_append_only()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'stock_movements is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stock_movements_append_only ON vehicle_service.stock_movements;
+CREATE TRIGGER trg_stock_movements_append_only
+    BEFORE UPDATE OR DELETE ON vehicle_service.stock_movements
+    FOR EACH ROW EXECUTE FUNCTION vehicle_service.stock_movements_append_only();
+
+-- Opening balances for parts already in stock
+INSERT INTO vehicle_service.stock_movements (part_id, movement_type, quantity, balance_after, note)
+SELECT i.part_id, 'receipt', i.quantity_in_stock, i.quantity_in_stock, 'Opening balance'
+FROM vehicle_service.inventory i
+WHERE i.quantity_in_stock > 0
+  AND NOT EXISTS (SELECT 1 FROM vehicle_service.stock_movements m WHERE m.part_id = i.part_id);
+
+
+-- 25. STRIPED STOCK FOR HOT PARTS
+-- Parts used by nearly every job can keep their stock split over
+-- stock_stripes sub-rows so concurrent jobs do not all queue on the one
+-- inventory row lock. For such a part the stock is
+-- inventory.quantity_in_stock + SUM(inventory_stock_stripes.quantity);
+-- inventory_levels shows that total and is what readers use.
+--
+-- take_stock() takes from the stripe picked by backend pid (skipping
+-- stripes other transactions hold, then waiting for the preferred one when
+-- all are busy) and only falls back to the part row when no single stripe
+-- has enough; the fallback folds every stripe into the part row, takes
+-- from it and spreads the rest over the stripes again.
+-- Lock order is always the part row, then its stripes by stripe number.
+-- Rebalance periodically with: python fold_stock.py (from the backend folder)
+ALTER TABLE vehicle_service.inventory
+ADD COLUMN IF NOT EXISTS stock_stripes SMALLINT NOT NULL DEFAULT 0
+    CHECK (stock_stripes BETWEEN 0 AND 64);
+
+CREATE TABLE IF NOT EXISTS vehicle_service.inventory_stock_stripes(
+    part_id INT NOT NULL REFERENCES vehicle_service.inventory(part_id) ON DELETE CASCADE,
+    stripe SMALLINT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+    PRIMARY KEY (part_id, stripe)
+);
+
+DROP TRIGGER IF EXISTS trg_inventory_stock_stripes_version ON vehicle_service.inventory_stock_stripes;
+CREATE TRIGGER trg_inventory_stock_stripes_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vehicle_service.inventory_stock_stripes
+    FOR EACH STATEMENT EXECUTE FUNCTION vehicle_service.bump_table_version();
+
+CREATE OR REPLACE VIEW vehicle_service.inventory_levels AS
+    SELECT i.part_id, i.part_name, i.part_code, i.brand, i.unit_price,
+           i.quantity_in_stock + COALESCE(s.quantity, 0) AS quantity_in_stock,
+           i.reorder_level, i.description, i.last_updated, i.image_url, i.quantity_label,
+           i.stock_stripes
+    FROM vehicle_service.inventory i
+    LEFT JOIN (
+        SELECT part_id, SUM(quantity)::int AS quantity
+        FROM vehicle_service.inventory_stock_stripes
+        GROUP BY part_id
+    ) s ON s.part_id = i.part_id;
+
+-- Move all striped stock into the part row. Returns the total stock,
+-- NULL when the part does not exist.
+CREATE OR REPLACE FUNCTION vehicle_service.fold_stock_stripes(p_part_id INT)
+RETURNS INT AS $$
+DECLARE
+    v_total INT;
+    v_striped INT;
+BEGIN
+    SELECT quantity_in_stock INTO v_total
+    FROM vehicle_service.inventory WHERE part_id = p_part_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM 1 FROM vehicle_service.inventory_stock_stripes
+    WHERE part_id = p_part_id ORDER BY stripe FOR UPDATE;
+    SELECT COALESCE(SUM(quantity), 0) INTO v_striped
+    FROM vehicle_service.inventory_stock_stripes WHERE part_id = p_part_id;
+
+    IF v_striped > 0 THEN
+        UPDATE vehicle_service.inventory_stock_stripes SET quantity = 0
+        WHERE part_id = p_part_id AND quantity > 0;
+        UPDATE vehicle_service.inventory SET quantity_in_stock = quantity_in_stock + v_striped
+        WHERE part_id = p_part_id
+        RETURNING quantity_in_stock INTO v_total;
+    END IF;
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Spread the part row's stock evenly over its stripes. Call after
+-- fold_stock_stripes() in the same transaction.
+CREATE OR REPLACE FUNCTION vehicle_service.spread_stock_stripes(p_part_id INT)
+RETURNS VOID AS $$
+DECLARE
+    v_stripes SMALLINT;
+    v_base INT;
+BEGIN
+    SELECT stock_stripes, quantity_in_stock INTO v_stripes, v_base
+    FROM vehicle_service.inventory WHERE part_id = p_part_id FOR UPDATE;
+    IF NOT FOUND OR v_stripes = 0 OR v_base = 0 THEN
+        RETURN;
+    END IF;
+
+    UPDATE vehicle_service.inventory_stock_stripes
+    SET quantity = quantity + v_base / v_stripes
+                   + CASE WHEN stripe < v_base % v_stripes THEN 1 ELSE 0 END
+    WHERE part_id = p_part_id;
+    UPDATE vehicle_service.inventory SET quantity_in_stock = 0 WHERE part_id = p_part_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fold and spread again so no stripe runs dry early. Returns the total stock.
+CREATE OR REPLACE FUNCTION vehicle_service.rebalance_stock_stripes(p_part_id INT)
+RETURNS INT AS $$
+DECLARE
+    v_total INT;
+BEGIN
+    v_total := vehicle_service.fold_stock_stripes(p_part_id);
+    PERFORM vehicle_service.spread_stock_stripes(p_part_id);
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Change a part's stripe count (0 turns striping off). Returns the total
+-- stock, NULL when the part does not exist.
+CREATE OR REPLACE FUNCTION vehicle_service.set_stock_stripes(p_part_id INT, p_stripes INT)
+RETURNS INT AS $$
+DECLARE
+    v_total INT;
+BEGIN
+    v_total := vehicle_service.fold_stock_stripes(p_part_id);
+    IF v_total IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    DELETE FROM vehicle_service.inventory_stock_stripes
+    WHERE part_id = p_part_id AND stripe >= p_stripes;
+    INSERT INTO vehicle_service.inventory_stock_stripes (part_id, stripe)
+    SELECT p_part_id, s FROM generate_series(0, p_stripes - 1) s
+    ON CONFLICT (part_id, stripe) DO NOTHING;
+    UPDATE vehicle_service.inventory SET stock_stripes = p_stripes, last_updated = CURRENT_TIMESTAMP
+    WHERE part_id = p_part_id;
+
+    PERFORM vehicle_service.spread_stock_stripes(p_part_id);
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Take p_quantity units of a part. Returns the stock left, NULL when the
+-- part does not exist or has not enough stock.
+CREATE OR REPLACE FUNCTION vehicle_service.take_stock(p_part_id INT, p_quantity INT)
+RETURNS INT AS $$
+DECLARE
+    v_stripes SMALLINT;
+    v_stripe SMALLINT;
+    v_left INT;
+BEGIN
+    SELECT stock_stripes INTO v_stripes FROM vehicle_service.inventory WHERE part_id = p_part_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF v_stripes > 0 THEN
+        -- This backend's stripe first, then the following ones
+        SELECT stripe INTO v_stripe
+        FROM vehicle_service.inventory_stock_stripes
+        WHERE part_id = p_part_id AND quantity >= p_quantity
+        ORDER BY (stripe - pg_backend_pid() % v_stripes + v_stripes) % v_stripes
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED;
+
+        IF FOUND THEN
+            UPDATE vehicle_service.inventory_stock_stripes SET quantity = quantity - p_quantity
+            WHERE part_id = p_part_id AND stripe = v_stripe;
+            SELECT quantity_in_stock INTO v_left
+            FROM vehicle_service.inventory_levels WHERE part_id = p_part_id;
+            RETURN v_left;
+        END IF;
+
+        -- Every stripe holding enough is busy: queue on the preferred one
+        -- (the row is re-checked once its holder commits)
+        SELECT stripe INTO v_stripe
+        FROM vehicle_service.inventory_stock_stripes
+        WHERE part_id = p_part_id AND quantity >= p_quantity
+        ORDER BY (stripe - pg_backend_pid() % v_stripes + v_stripes) % v_stripes
+        LIMIT 1
+        FOR UPDATE;
+
+        IF FOUND THEN
+            UPDATE vehicle_service.inventory_stock_stripes SET quantity = quantity - p_quantity
+            WHERE part_id = p_part_id AND stripe = v_stripe;
+            SELECT quantity_in_stock INTO v_left
+            FROM vehicle_service.inventory_levels WHERE part_id = p_part_id;
+            RETURN v_left;
+        END IF;
+
+        -- No single stripe holds enough: gather the stock in the part row
+        PERFORM vehicle_service.fold_stock_stripes(p_part_id);
+    END IF;
+
+    UPDATE vehicle_service.inventory
+    SET quantity_in_stock = quantity_in_stock - p_quantity, last_updated = CURRENT_TIMESTAMP
+    WHERE part_id = p_part_id AND quantity_in_stock >= p_quantity
+    RETURNING quantity_in_stock INTO v_left;
+
+    IF v_stripes > 0 THEN
+        PERFORM vehicle_service.spread_stock_stripes(p_part_id);
+    END IF;
+    RETURN v_left;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Put p_quantity units of a part back (into this backend's stripe when
+-- striped). Returns the stock after it, NULL when the part does not exist.
+CREATE OR REPLACE FUNCTION vehicle_service.put_stock(p_part_id INT, p_quantity INT)
+RETURNS INT AS $$
+DECLARE
+    v_stripes SMALLINT;
+    v_left INT;
+BEGIN
+    SELECT stock_stripes INTO v_stripes FROM vehicle_service.inventory WHERE part_id = p_part_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF v_stripes > 0 THEN
+        UPDATE vehicle_service.inventory_stock_stripes SET quantity = quantity + p_quantity
+        WHERE part_id = p_part_id AND stripe = pg_backend_pid() % v_stripes;
+        IF FOUND THEN
+            SELECT quantity_in_stock INTO v_left
+            FROM vehicle_service.inventory_levels WHERE part_id = p_part_id;
+            RETURN v_left;
+        END IF;
+    END IF;
+
+    UPDATE vehicle_service.inventory
+    SET quantity_in_stock = quantity_in_stock + p_quantity, last_updated = CURRENT_TIMESTAMP
+    WHERE part_id = p_part_id
+    RETURNING quantity_in_stock INTO v_left;
+    RETURN v_left;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- 26. JOB COMPLETION CREDIT
+-- Set by the job.completed task when it credits the employee's jobs_done,
+-- so a job reopened and completed again is not credited twice.
+ALTER TABLE vehicle_service.service_jobs
+ADD COLUMN IF NOT EXISTS completion_credited BOOLEAN NOT NULL DEFAULT FALSE;